@@ -47,6 +47,7 @@ app.layout = dbc.Container([
     html.Hr(),
 
     # hidden stores
+    dcc.Store(id="session-id", storage_type="session"),
     dcc.Store(id="stored-ocel", storage_type="session"),
     dcc.Store(id="stored-sku-configs", storage_type="session"),
 
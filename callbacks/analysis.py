@@ -1,28 +1,50 @@
-from dash import callback, Output, Input, State, html, dcc, dash_table
+from dash import callback, Output, Input, State, html, dcc, dash_table, no_update
 import pandas as pd
+import numpy as np
 import pm4py
 import plotly.express as px
 from collections import Counter
 import dash_bootstrap_components as dbc
 import json
 
-def ocel_summary_table(ocel):
+import os
+from datetime import datetime
+
+from simulation.ocel_stats import load_stats
+from simulation.dfg import read_flat_log, flatten_ocel, directly_follows, start_end_activities
+from simulation.relation_index import load_index
+from simulation.fragmentation import order_fragmentation, material_delays, summarize_orders, compare_runs
+from .ocel_cache import get_table, table_page, load_ocel, compressed_copy
+from .runs import session_runs, get_run
+
+def ocel_summary(ocel):
+    """
+    Summary statistics of a parsed pm4py OCEL, same layout as the stats the generator persists
+    with a run (simulation.ocel_stats). Only used for runs without persisted stats.
+    """
+    return {
+        "events": len(ocel.events),
+        "objects": len(ocel.objects),
+        "relations": len(ocel.relations),
+        "activities": ocel.events[ocel.event_activity].value_counts().to_dict(),
+        "object_types": ocel.objects[ocel.object_type_column].value_counts().to_dict(),
+        "activities_per_object_type": ocel.relations.groupby(ocel.object_type_column)[ocel.event_activity].nunique().to_dict(),
+    }
+
+def ocel_summary_table(summary):
     """
     Builds a dbc.Table with the same information from pm4py OCEL.get_summary(),
     but in structured format.
     """
-    # Compute summary stats
-    num_events = len(ocel.events)
-    num_objects = len(ocel.objects)
-    num_activities = ocel.events[ocel.event_activity].nunique()
-    num_object_types = ocel.objects[ocel.object_type_column].nunique()
-    num_event_object_rels = len(ocel.relations)
-
-    activities_occ = Counter(ocel.events[ocel.event_activity].value_counts().to_dict())
-    object_types_occ = Counter(ocel.objects[ocel.object_type_column].value_counts().to_dict())
-    unique_acts_per_obj_type = Counter(
-        ocel.relations.groupby(ocel.object_type_column)[ocel.event_activity].nunique().to_dict()
-    )
+    num_events = summary["events"]
+    num_objects = summary["objects"]
+    num_activities = len(summary["activities"])
+    num_object_types = len(summary["object_types"])
+    num_event_object_rels = summary["relations"]
+
+    activities_occ = Counter(summary["activities"])
+    object_types_occ = Counter(summary["object_types"])
+    unique_acts_per_obj_type = Counter(summary["activities_per_object_type"])
 
     # General stats table
     general_rows = [
@@ -76,48 +98,212 @@ def ocel_summary_table(ocel):
 
 
 @callback(
-    Output('ocel-table-container', 'children'),
+    Output('analysis-run', 'options'),
+    Output('analysis-run', 'value'),
+    Input('session-id', 'data'),
+    State('stored-ocel', 'data'),
+)
+def list_session_runs(session_id, ocel_handle):
+    runs = [run for run in session_runs(session_id) if run["status"] == "finished"] if session_id else []
+    options = [{"label": f"{run['label']} ({datetime.fromtimestamp(run['created']):%Y-%m-%d %H:%M}, {run['handle']['rows']} rows)",
+                "value": run["run"]} for run in runs]
+    current = (ocel_handle or {}).get("run")
+    return options, current if any(run["run"] == current for run in runs) else None
+
+@callback(
+    Output('stored-ocel', 'data', allow_duplicate=True),
+    Input('analysis-run', 'value'),
+    State('session-id', 'data'),
+    prevent_initial_call=True
+)
+def select_run(run_id, session_id):
+    run = get_run(run_id) if run_id else None
+    # only runs of the own session can be selected
+    if run is None or run["session"] != session_id:
+        return no_update
+    return run["handle"]
+
+@callback(
+    Output('ocel-table', 'columns'),
+    Output('ocel-table', 'page_current'),
+    Output('ocel-table-message', 'children'),
     Output('ocel-stats-container', 'children'),
     Input('show-ocel-button', 'n_clicks'),
     State('stored-ocel', 'data'),
     prevent_initial_call=True
 )
-def analyze_ocel(n_clicks, ocel_json):
-    if not ocel_json:
-        return html.P("No OCEL data available. Please run a simulation first."), None, None
+def analyze_ocel(n_clicks, ocel_handle):
+    if not ocel_handle or get_table(ocel_handle) is None:
+        return [], 0, html.P("No OCEL data available. Please run a simulation first."), None
+
+    # the rows are served page by page by update_ocel_table
+    columns = [{"name": i, "id": i} for i in ocel_handle["columns"]]
+    message = html.P(f"{ocel_handle['rows']} rows", className="text-muted")
+
+    ocel_path = ocel_handle.get("ocel_path")
+    if not ocel_path or not os.path.exists(ocel_path):
+        return columns, 0, message, html.P("The OCEL file of this run no longer exists.")
+    # stats persisted by the generator, the log is only parsed for runs without them
+    summary = load_stats(os.path.dirname(ocel_path)) or ocel_summary(load_ocel(ocel_path))
+    ocel_summary_component = ocel_summary_table(summary)
     
-    # Load OCEL DataFrame
-    ocel_df = pd.read_json(ocel_json, orient='split')
     
-    # Show OCEL table
-    table = dash_table.DataTable(
-        id='ocel-table',
-        data=ocel_df.to_dict('records'),
-        columns=[{"name": i, "id": i} for i in ocel_df.columns],
-        page_size=20,
-        filter_action="native",
+    return columns, 0, message, ocel_summary_component
+
+@callback(
+    Output('ocel-table', 'data'),
+    Output('ocel-table', 'page_count'),
+    Input('ocel-table', 'page_current'),
+    Input('ocel-table', 'page_size'),
+    Input('ocel-table', 'sort_by'),
+    Input('ocel-table', 'filter_query'),
+    Input('ocel-table', 'columns'),
+    State('stored-ocel', 'data'),
+)
+def update_ocel_table(page_current, page_size, sort_by, filter_query, columns, ocel_handle):
+    if not columns:
+        return [], 0
+    return table_page(ocel_handle, page_current, page_size, sort_by, filter_query)
+
+@callback(
+    Output("download-ocel", "data"),
+    Input("download-ocel-btn", "n_clicks"),
+    State("stored-ocel", "data"),
+    State("download-ocel-options", "value"),
+    prevent_initial_call=True
+)
+def download_ocel(n_clicks, ocel_handle, options):
+    ocel_path = (ocel_handle or {}).get("ocel_path")
+    if not ocel_path or not os.path.exists(ocel_path):
+        return no_update
+    # stream the merged file as is instead of parsing and re-serializing it
+    if "gzip" in (options or []):
+        return dcc.send_file(compressed_copy(ocel_path), filename="OCEL.json.gz")
+    return dcc.send_file(ocel_path, filename="OCEL.json")
+
+@callback(
+    Output("dfg-output", "children"),
+    Input("dfg-button", "n_clicks"),
+    State("dfg-log", "value"),
+    State("stored-ocel", "data"),
+    prevent_initial_call=True
+)
+def compute_dfg(n_clicks, log_kind, ocel_handle):
+    ocel_path = (ocel_handle or {}).get("ocel_path")
+    if not ocel_path or not os.path.exists(ocel_path):
+        return html.P("No OCEL data available. Please run a simulation first.")
+
+    if log_kind.startswith("ocel:"):
+        log = flatten_ocel(load_ocel(ocel_path), log_kind[len("ocel:"):])
+    else:
+        try:
+            log = read_flat_log(os.path.dirname(ocel_path), log_kind)
+        except FileNotFoundError as e:
+            return html.P(str(e))
+
+    dfg = directly_follows(log)
+    # waiting times in hours are easier to read than seconds
+    for column in ("mean_wait", "median_wait", "min_wait", "max_wait"):
+        dfg[column] = (dfg[column] / 3600).round(2)
+    dfg = dfg.rename(columns={column: column.replace("_wait", "_wait_h") for column in dfg.columns})
+    start, end = start_end_activities(log)
+
+    return html.Div([
+        html.P(f"{len(log)} events, {len(log.case_labels)} cases, {len(dfg)} directly-follows pairs. "
+               f"Start: {', '.join(f'{a} ({n})' for a, n in start.items())}. "
+               f"End: {', '.join(f'{a} ({n})' for a, n in end.items())}.", className="text-muted"),
+        dash_table.DataTable(
+            columns=[{"name": column.replace("_", " ").title(), "id": column} for column in dfg.columns],
+            data=dfg.to_dict("records"),
+            page_size=20,
+            sort_action="native",
+            style_table={'overflowX': 'auto'},
+            style_cell={'textAlign': 'left'}
+        )
+    ])
+
+@callback(
+    Output("lineage-output", "children"),
+    Input("lineage-button", "n_clicks"),
+    State("lineage-object", "value"),
+    State("stored-ocel", "data"),
+    prevent_initial_call=True
+)
+def trace_object(n_clicks, object_id, ocel_handle):
+    ocel_path = (ocel_handle or {}).get("ocel_path")
+    index = load_index(os.path.dirname(ocel_path)) if ocel_path else None
+    if index is None:
+        return html.P("No relation index available for this run.")
+    object_id = (object_id or "").strip()
+    try:
+        lineage = index.lineage(object_id)
+    except KeyError:
+        return html.P(f"Unknown object {object_id!r}.")
+
+    # an order is traced through its items, every other object through itself
+    is_order = len(index.objects_of_type([object_id], "Order")) > 0
+    roots = list(index.related(object_id)) if is_order else [object_id]
+    objects = sorted({str(o) for root in roots for o in index.lineage(root)} | {object_id})
+    event_ids = [index.lineage_events(root) for root in roots] + ([index.events_of(object_id)] if is_order else [])
+    events = index.describe_events(np.unique(np.concatenate(event_ids)))
+    events = events.sort_values("time", kind="stable")
+    events["time"] = events["time"].astype(str)
+
+    details = [html.P(f"Objects: {', '.join(objects)}", className="text-muted")]
+    if is_order:
+        details.append(html.P(f"Packages: {', '.join(map(str, index.packages_of(object_id))) or 'none'}", className="text-muted"))
+    return html.Div(details + [
+        dash_table.DataTable(
+            columns=[{"name": column.title(), "id": column} for column in events.columns],
+            data=events.to_dict("records"),
+            page_size=20,
+            style_table={'overflowX': 'auto'},
+            style_cell={'textAlign': 'left'}
+        )
+    ])
+
+def frame_table(df, page_size=10):
+    df = df.round(2)
+    return dash_table.DataTable(
+        columns=[{"name": str(column).replace("_", " ").title(), "id": str(column)} for column in df.columns],
+        data=df.astype(object).where(df.notna(), None).to_dict("records"),
+        page_size=page_size,
         sort_action="native",
         style_table={'overflowX': 'auto'},
-        style_cell={'textAlign': 'left', 'minWidth': '100px', 'width': '150px', 'maxWidth': '300px'}
+        style_cell={'textAlign': 'left'}
     )
-    
-    ocel = pm4py.read_ocel2_json("OCEL.json")
-    ocel_summary_component = ocel_summary_table(ocel)
-    
-    
-    return table, ocel_summary_component
 
 @callback(
-    Output("download-ocel", "data"),
-    Input("download-ocel-btn", "n_clicks"),
+    Output("fragmentation-output", "children"),
+    Input("fragmentation-button", "n_clicks"),
+    State("stored-ocel", "data"),
+    State("session-id", "data"),
     prevent_initial_call=True
 )
-def download_ocel(n_clicks):
-    with open('OCEL.json', 'r') as file:
-        ocel = json.load(file)
-    ocel_json = json.dumps(ocel)
-    # Return as downloadable file
-    return dcc.send_string(
-        ocel_json,
-        filename="OCEL.json"
-    )
\ No newline at end of file
+def analyze_fragmentation(n_clicks, ocel_handle, session_id):
+    ocel_path = (ocel_handle or {}).get("ocel_path")
+    index = load_index(os.path.dirname(ocel_path)) if ocel_path else None
+    if index is None:
+        return html.P("No relation index available for this run.")
+
+    orders = order_fragmentation(index)
+    summary = summarize_orders(orders)
+    fig = px.histogram(orders, x="days_to_last_delivery", color="splits", nbins=40,
+                       title="Days from Order to Last Delivery")
+
+    # every finished run of the session that was written with a relation index
+    runs = [run for run in session_runs(session_id) if run["status"] == "finished"] if session_id else []
+    outputs = {f"{run['label']} ({run['run'][:6]})": run["path"] for run in runs if load_index(run["path"]) is not None}
+    comparison = [html.H5("Runs of this Session"), frame_table(compare_runs(outputs))] if len(outputs) > 1 else []
+
+    return html.Div([
+        dbc.Table([html.Tbody([html.Tr([html.Td(key.replace("_", " ").title()), html.Td(f"{value:,.2f}")])
+                               for key, value in summary.items()])],
+                  bordered=True, striped=True, size="sm"),
+        dcc.Graph(figure=fig),
+        html.H5("Materials"),
+        frame_table(material_delays(index)),
+        html.H5("Orders"),
+        frame_table(orders.assign(placed=orders["placed"].astype(str))),
+        *comparison
+    ])
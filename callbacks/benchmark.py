@@ -5,7 +5,9 @@ import pandas as pd
 import time
 import os
 
-from simulation.benchmark import run_grid, summarize, FixedParams
+from simulation.benchmark import run_grid, summarize, FixedParams, phase_breakdown
+from simulation.scaling import scaling_report, predict_configs
+from simulation.benchmark_history import append_history, load_history, revisions, compare_revisions, summarize_revision, candidate_machine
 
 def parse_input(value):
     """Convert a Dash Input value to a list of ints."""
@@ -32,6 +34,8 @@ def parse_single_int(value, default=1):
     State("benchmark-skus", "value"),
     State("benchmark-splits", "value"),
     State("benchmark-repeats", "value"),
+    State("benchmark-workers", "value"),
+    State("benchmark-options", "value"),
     background=True,
     running=[
         (Output("run-benchmark", "disabled"), True, False),
@@ -51,19 +55,24 @@ def parse_single_int(value, default=1):
     progress=[Output("progress-bar", "value"), Output("progress-bar", "max")],
     prevent_initial_call=True
 )
-def run_benchmark(set_progress,n_clicks, days_val, skus_val, splits_val, repeats_val):
+def run_benchmark(set_progress,n_clicks, days_val, skus_val, splits_val, repeats_val, workers_val, options):
     days_list = parse_input(days_val)
     skus_list = parse_input(skus_val)
     splits_list = parse_input(splits_val)
     repeats = parse_single_int(repeats_val, default=1)
+    workers = parse_single_int(workers_val, default=1)
+    options = options or []
 
-    fixed = FixedParams(seed=1, delivery_func_name="constant", verbose=False, write_output=False)
+    fixed = FixedParams(seed=1, delivery_func_name="constant", verbose=False, write_output=False,
+                        profile="profile" in options, track_memory="memory" in options)
     print(set_progress)
-    results = run_grid(days_list, skus_list, splits_list, repeats, fixed, on_progress=set_progress)
+    results = run_grid(days_list, skus_list, splits_list, repeats, fixed, on_progress=set_progress,
+                       workers=workers, pin_cpus="pin" in options)
 
     summary = summarize(results)
+    revision = append_history(results, fixed, workers=workers, pin_cpus="pin" in options)
 
-    table = dbc.Table.from_dataframe(summary.round(3), striped=True, bordered=True, hover=True, size="sm")
+    table = dbc.Table.from_dataframe(summary[["days", "n_skus", "split_centre", "count", "mean", "std", "ci95"]].round(3), striped=True, bordered=True, hover=True, size="sm")
 
     fig = px.line(
             summary,
@@ -88,22 +97,75 @@ def run_benchmark(set_progress,n_clicks, days_val, skus_val, splits_val, repeats
     fig_splits = px.line(summary, x="split_centre", y="mean", color="days", line_group="n_skus",
                          markers=True, title="Runtime vs Splits")
 
-    plots = html.Div([
+    graphs = [
         dcc.Graph(id="benchmark-graph", figure=fig),
         dcc.Graph(id="days-graph", figure=fig_days),
         dcc.Graph(id="sku-graph", figure=fig_skus),
         dcc.Graph(id="splits-graph", figure=fig_splits),
-    ])
+    ]
+
+    # Plots 4-6: memory and output size next to runtime (only with memory tracking)
+    if "peak_traced_mb" in summary.columns:
+        memory = summary.melt(id_vars=["days", "n_skus", "split_centre"],
+                              value_vars=["peak_traced_mb", "peak_rss_mb", "output_mb"],
+                              var_name="metric", value_name="MB")
+        for dim, other, title in [("days", "n_skus", "Memory vs Days"),
+                                  ("n_skus", "days", "Memory vs SKUs"),
+                                  ("split_centre", "days", "Memory vs Splits")]:
+            fig_memory = px.line(memory, x=dim, y="MB", color=other, line_dash="metric",
+                                 markers=True, title=title)
+            graphs.append(dcc.Graph(figure=fig_memory))
+
+    # Plot 7: where the time goes per config (only with phase profiling)
+    if any(c.startswith("phase_") for c in summary.columns):
+        fig_phases = px.bar(phase_breakdown(summary), x="config", y="seconds", color="phase",
+                            title="Runtime per Phase", labels={"seconds": "Mean time (s)", "config": "Config"})
+        graphs.append(dcc.Graph(id="phases-graph", figure=fig_phases))
+
+    plots = html.Div(graphs)
+
+    scaling = scaling_report(summary)
+    scaling_table = dbc.Table.from_dataframe(scaling.round(3), striped=True, bordered=True, hover=True, size="sm")
 
     output_div = html.Div([
-        html.H5("Benchmark Summary"),
+        html.H5(f"Benchmark Summary (revision {revision})"),
         table,
+        html.H5("Empirical Scaling"),
+        html.P("Exponent k of metric ~ dimension^k with the other dimensions held fixed (split as split centre + 1); "
+               "mean is the runtime."),
+        scaling_table,
         html.Hr(),
         plots
     ])
 
     return output_div, results.to_json(date_format="iso", orient="split")
 
+@callback(
+    Output("predict-results", "children"),
+    Input("predict-benchmark", "n_clicks"),
+    State("benchmark-raw", "data"),
+    State("predict-days", "value"),
+    State("predict-skus", "value"),
+    State("predict-split", "value"),
+    prevent_initial_call=True
+)
+def predict_benchmark(n_clicks, raw_json, days, n_skus, split_centre):
+    if raw_json is None:
+        return html.P("Run a benchmark first.")
+
+    summary = summarize(pd.read_json(raw_json, orient="split"))
+    config = {"days": parse_single_int(days), "n_skus": parse_single_int(n_skus),
+              "split_centre": float(split_centre or 0)}
+    try:
+        prediction = predict_configs(summary, [config]).iloc[0]
+    except ValueError as e:
+        return html.P(str(e))
+
+    text = f"Predicted runtime: {prediction['predicted_mean']:.1f}s"
+    if "predicted_output_mb" in prediction:
+        text += f", output size: {prediction['predicted_output_mb']:.1f}MB"
+    return dbc.Alert(text, color="info")
+
 @callback(
     Output("download-benchmark", "data"),
     Input("download-btn", "n_clicks"),
@@ -116,4 +178,56 @@ def download_benchmark(n_clicks, raw_json):
         return no_update
 
     df = pd.read_json(raw_json, orient="split")
-    return dcc.send_data_frame(df.to_csv, "benchmark_results.csv")
\ No newline at end of file
+    return dcc.send_data_frame(df.to_csv, "benchmark_results.csv")
+
+@callback(
+    Output("history-baseline", "options"),
+    Output("history-candidate", "options"),
+    Input("refresh-history", "n_clicks"),
+    Input("benchmark-raw", "data"),
+)
+def refresh_history(n_clicks, raw_json):
+    options = revisions(load_history())
+    return options, options
+
+@callback(
+    Output("history-results", "children"),
+    Input("compare-history", "n_clicks"),
+    State("history-baseline", "value"),
+    State("history-candidate", "value"),
+    prevent_initial_call=True
+)
+def compare_history(n_clicks, baseline, candidate):
+    if not baseline or not candidate:
+        return html.P("Select a baseline and a candidate revision.")
+
+    history = load_history()
+    # runs of the candidate's machine only, cells are matched by config fingerprint
+    machine = candidate_machine(history, candidate)
+    comparison = compare_revisions(history, baseline, candidate, machine=machine)
+    if comparison.empty:
+        return html.P(f"No common benchmark configs for {baseline} and {candidate} on the candidate's machine.")
+
+    # the plot shows the shared config the candidate ran last
+    shared = history[(history["machine"] == machine) & history["config"].isin(comparison["config"])]
+    config = shared[shared["revision"] == candidate].sort_values("recorded_at")["config"].iloc[-1]
+    shared = shared[shared["config"] == config]
+    overlay = pd.concat([summarize_revision(shared, rev).assign(revision=rev) for rev in (baseline, candidate)])
+    fig = px.line(overlay, x="days", y="mean", error_y="ci95", color="n_skus", line_dash="revision",
+                  symbol="split_centre", markers=True, title=f"Runtime {baseline} vs {candidate}",
+                  labels={"mean": "Runtime (s)", "days": "Simulation Days", "n_skus": "# SKUs"})
+
+    n_regressions = int(comparison["regression"].sum())
+    n_improvements = int(comparison["improvement"].sum())
+    table = dbc.Table.from_dataframe(
+        comparison[["days", "n_skus", "split_centre", "config", "count_baseline", "count_candidate", "mean_baseline", "mean_candidate",
+                    "change", "regression", "improvement"]].round(3),
+        striped=True, bordered=True, hover=True, size="sm")
+
+    return html.Div([
+        dbc.Alert(f"{n_regressions} significant regression(s), {n_improvements} improvement(s) "
+                  f"out of {len(comparison)} configs",
+                  color="danger" if n_regressions else "success"),
+        dcc.Graph(id="history-graph", figure=fig),
+        table
+    ])
@@ -0,0 +1,250 @@
+# callbacks/ocel_cache.py
+import gzip, json, os, shutil, threading, uuid
+from collections import OrderedDict
+
+import diskcache
+import pandas as pd
+import pm4py
+
+# server side store of the OCEL tables of the runs, the browser only keeps the run handle
+OCEL_TABLE_DIR = "./cache/ocel_tables"
+OCEL_TABLE_SIZE_LIMIT = 2**31
+
+table_cache = diskcache.Cache(OCEL_TABLE_DIR, size_limit=OCEL_TABLE_SIZE_LIMIT, eviction_policy="least-recently-used")
+# tables (and their last filtered/sorted view) kept unpickled in this process, paging a table must not
+# deserialize it from table_cache on every request
+TABLE_MEMORY_ENTRIES = 4
+
+FILTER_OPERATORS = [
+    ["ge ", ">="],
+    ["le ", "<="],
+    ["lt ", "<"],
+    ["gt ", ">"],
+    ["ne ", "!="],
+    ["eq ", "="],
+    ["contains "],
+    ["datestartswith "],
+]
+
+# parsed pm4py OCELs of the runs shared by the Analysis callbacks, bounded by their DataFrame memory
+PARSED_OCEL_CACHE_BYTES = 2**30
+
+class ParsedOcelCache:
+    """
+    LRU cache of parsed OCELs keyed by file path. Entries are invalidated when the file changes
+    (mtime or size) and the least recently used ones are evicted once max_bytes is exceeded.
+    """
+    def __init__(self, max_bytes=PARSED_OCEL_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path):
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def ocel_bytes(ocel):
+        frames = [ocel.events, ocel.objects, ocel.relations, ocel.o2o, ocel.e2e, ocel.object_changes]
+        return int(sum(df.memory_usage(deep=True).sum() for df in frames if df is not None))
+
+    def get(self, path):
+        try:
+            key = self._key(path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(key[0])
+            if entry is None or entry[0] != key:
+                return None
+            self._entries.move_to_end(key[0])
+            return entry[1]
+
+    def put(self, path, ocel):
+        key = self._key(path)
+        size = self.ocel_bytes(ocel)
+        with self._lock:
+            old = self._entries.pop(key[0], None)
+            if old is not None:
+                self.total_bytes -= old[2]
+            self._entries[key[0]] = (key, ocel, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+        return ocel
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+parsed_ocels = ParsedOcelCache()
+
+class TableMemoryCache:
+    """
+    In-process LRU of the run tables in front of table_cache, keyed by run id. A run's table is stored once,
+    so entries never go stale, only deleted. Every entry also keeps the last filtered and sorted view of its table.
+    """
+    def __init__(self, max_entries=TABLE_MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, run_id):
+        with self._lock:
+            entry = self._entries.get(run_id)
+            if entry is not None:
+                self._entries.move_to_end(run_id)
+            return entry
+
+    def put(self, run_id, df):
+        entry = {"table": df, "view": (None, None)}
+        with self._lock:
+            self._entries[run_id] = entry
+            self._entries.move_to_end(run_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def view(self, entry, view_key):
+        """The entry's view for view_key, None if its last view was another one."""
+        with self._lock:
+            key, view = entry["view"]
+        return view if key == view_key else None
+
+    def set_view(self, entry, view_key, view):
+        with self._lock:
+            entry["view"] = (view_key, view)
+
+    def pop(self, run_id):
+        with self._lock:
+            return self._entries.pop(run_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+loaded_tables = TableMemoryCache()
+
+def load_ocel(path):
+    """Parsed OCEL of a run's OCEL.json, read from disk only on a cache miss."""
+    ocel = parsed_ocels.get(path)
+    if ocel is None:
+        ocel = parsed_ocels.put(path, pm4py.read_ocel2_json(path))
+    return ocel
+
+def compressed_copy(path):
+    """gzip copy of a file next to it, only rewritten when the source is newer."""
+    gz_path = path + ".gz"
+    if not os.path.exists(gz_path) or os.path.getmtime(gz_path) < os.path.getmtime(path):
+        with open(path, "rb") as src, gzip.open(gz_path + ".tmp", "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 2**20)
+        os.replace(gz_path + ".tmp", gz_path)
+    return gz_path
+
+def new_run_id():
+    return uuid.uuid4().hex[:12]
+
+def put_table(run_id, df: pd.DataFrame, ocel_path=None):
+    """Stores the table of a run and returns the handle kept in the browser."""
+    table_cache.set(run_id, df)
+    loaded_tables.put(run_id, df)
+    return {"run": run_id, "rows": len(df), "columns": list(df.columns), "ocel_path": ocel_path}
+
+def _table_entry(handle):
+    if not handle:
+        return None
+    entry = loaded_tables.get(handle["run"])
+    # a run deleted by any process (e.g. expired by a background worker) must not stay readable from memory
+    if entry is not None and handle["run"] not in table_cache:
+        loaded_tables.pop(handle["run"])
+        return None
+    if entry is None:
+        df = table_cache.get(handle["run"])
+        entry = loaded_tables.put(handle["run"], df) if df is not None else None
+    return entry
+
+def get_table(handle):
+    """Table of a run handle, None if it was never stored or has been evicted."""
+    entry = _table_entry(handle)
+    return entry["table"] if entry is not None else None
+
+def split_filter_part(filter_part):
+    """Parses one `{column} op value` term of a DataTable filter_query into (column, operator, value)."""
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find("{") + 1: name_part.rfind("}")]
+
+                value_part = value_part.strip()
+                v0 = value_part[0] if value_part else ""
+                if v0 and v0 == value_part[-1] and v0 in ("'", '"', "`"):
+                    value = value_part[1:-1].replace("\\" + v0, v0)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                # word operators need spaces after them in the filter string, but we don't want these later
+                return name, operator_type[0].strip(), value
+    return None, None, None
+
+def filter_table(df: pd.DataFrame, filter_query) -> pd.DataFrame:
+    if not filter_query:
+        return df
+    for filter_part in filter_query.split(" && "):
+        col_name, operator, filter_value = split_filter_part(filter_part)
+        if col_name not in df.columns:
+            continue
+        column = df[col_name]
+        if operator in ("eq", "ne", "lt", "le", "gt", "ge"):
+            if isinstance(filter_value, float):
+                column = pd.to_numeric(column, errors="coerce")
+            else:
+                column, filter_value = column.astype(str), str(filter_value)
+            df = df.loc[getattr(column, operator)(filter_value)]
+        elif operator == "contains":
+            df = df.loc[column.astype(str).str.contains(str(filter_value), regex=False)]
+        elif operator == "datestartswith":
+            df = df.loc[column.astype(str).str.startswith(str(filter_value))]
+    return df
+
+def sort_table(df: pd.DataFrame, sort_by) -> pd.DataFrame:
+    sort_by = [col for col in (sort_by or []) if col["column_id"] in df.columns]
+    if not sort_by:
+        return df
+    # object columns hold strings and the object lists of the extended table, compare them as text
+    return df.sort_values([col["column_id"] for col in sort_by],
+                          ascending=[col["direction"] == "asc" for col in sort_by],
+                          key=lambda column: column.astype(str) if column.dtype == object else column)
+
+def serialize_cell(x):
+    if isinstance(x, (dict, list)):
+        return json.dumps(x)
+    elif x is None or x is pd.NaT or (isinstance(x, float) and x != x):
+        return ''
+    else:
+        return str(x)
+
+def table_page(handle, page_current, page_size, sort_by=None, filter_query=None):
+    """
+    One page of the run's table after the DataTable filter and sort, evaluated on the server.
+    Returns (records, page_count).
+    """
+    entry = _table_entry(handle)
+    if entry is None:
+        return [], 0
+    # paging through the same view reuses it, only a new filter or sort evaluates the table again
+    view_key = (filter_query or "", json.dumps(sort_by or [], sort_keys=True))
+    df = loaded_tables.view(entry, view_key)
+    if df is None:
+        df = sort_table(filter_table(entry["table"], filter_query), sort_by)
+        loaded_tables.set_view(entry, view_key, df)
+    page_current, page_size = page_current or 0, page_size or 20
+    page = df.iloc[page_current * page_size:(page_current + 1) * page_size]
+    return page.map(serialize_cell).to_dict("records"), max(1, -(-len(df) // page_size))
@@ -0,0 +1,114 @@
+# callbacks/runs.py
+import os, re, shutil, time, uuid
+
+import diskcache
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from .ocel_cache import table_cache, loaded_tables, new_run_id
+
+# run artifacts live in RUNS_ROOT/<session>/<run>, so concurrent sessions, tabs and workers never share a directory
+RUNS_ROOT = "./runs"
+RUN_TTL_SECONDS = 24 * 3600
+
+# run id -> run record, shared by all web and background workers
+run_registry = diskcache.Cache("./cache/run_registry")
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+def _process_started(pid):
+    """Start time of a process, tells a live worker apart from a new process that got its pid; None if there is none."""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).create_time()
+        except psutil.Error:
+            return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass
+    return 0.0
+
+def _safe(name):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(name or "run"))[:64]
+
+def create_run(session_id, label):
+    """Registers a new run of a session, owned by the calling (background worker) process, and creates its empty output directory."""
+    run_id = new_run_id()
+    path = os.path.join(RUNS_ROOT, _safe(session_id), f"{run_id}_{_safe(label)}")
+    os.makedirs(path)
+    run_registry.set(run_id, {
+        "run": run_id,
+        "session": session_id,
+        "label": label,
+        "path": path,
+        "created": time.time(),
+        "status": "running",
+        "handle": None,
+        "pid": os.getpid(),
+        "pid_started": _process_started(os.getpid()),
+    })
+    return run_id, path
+
+def update_run(run_id, **fields):
+    with run_registry.transact():
+        record = run_registry.get(run_id)
+        if record is not None:
+            record.update(fields)
+            run_registry.set(run_id, record)
+    return record
+
+def is_active(record):
+    """Whether a run is still running, i.e. its worker process is alive."""
+    if record["status"] != "running" or record.get("pid") is None:
+        return False
+    return _process_started(record["pid"]) == record["pid_started"]
+
+def _resolve(run_id):
+    # a cancelled background callback is killed, so a running run whose worker is gone was cancelled
+    # (or its worker died), it never gets to record that itself
+    with run_registry.transact():
+        record = run_registry.get(run_id)
+        if record is not None and record["status"] == "running" and not is_active(record):
+            record["status"] = "cancelled"
+            run_registry.set(run_id, record)
+    return record
+
+def get_run(run_id):
+    return _resolve(run_id)
+
+def session_runs(session_id):
+    """Runs of a session, newest first."""
+    runs = [_resolve(key) for key in run_registry.iterkeys()]
+    return sorted((run for run in runs if run and run["session"] == session_id), key=lambda run: -run["created"])
+
+def delete_run(run_id):
+    record = run_registry.pop(run_id, None)
+    table_cache.delete(run_id)
+    loaded_tables.pop(run_id)
+    if record is not None:
+        shutil.rmtree(record["path"], ignore_errors=True)
+        session_dir = os.path.dirname(record["path"])
+        if os.path.isdir(session_dir) and not os.listdir(session_dir):
+            os.rmdir(session_dir)
+    return record
+
+def cleanup_expired(ttl=RUN_TTL_SECONDS, now=None):
+    """
+    Deletes the directories, cached tables and registry entries of all runs older than ttl seconds,
+    except runs that are still running.
+    """
+    now = now or time.time()
+    expired = []
+    for key in run_registry.iterkeys():
+        record = _resolve(key)
+        if record is not None and record["created"] < now - ttl and not is_active(record):
+            expired.append(key)
+    for run_id in expired:
+        delete_run(run_id)
+    return expired
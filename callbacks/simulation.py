@@ -1,19 +1,48 @@
-from dash import Input, Output, State, callback, html,  MATCH, ALL, ctx, callback_context
+from dash import Input, Output, State, callback, html,  MATCH, ALL, ctx, callback_context, no_update
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 from datetime import datetime
-import os, shutil
+import os
 import json
+import sqlite3
+import xml.etree.ElementTree as ElementTree
 import pm4py
 from simulation.warehouse import Warehouse
-from simulation.simulation import Simulation
+from simulation.simulation import Simulation, INVENTORY_FILENAME
+from simulation.downsampling import MultiResolutionSeries
+from simulation.checkpoint import register_functions
+from simulation.estimator import estimate_run, over_budget, BudgetExceeded, DEFAULT_BUDGET
+from simulation.ocel_import import cached_import
+from simulation.demand import make_demand
+from .ocel_cache import put_table, load_ocel
+from .runs import new_session_id, create_run, update_run, cleanup_expired
 import numpy as np
+import plotly.graph_objs as go
+from functools import lru_cache
+
+# points per line sent to the browser, the levels of the run are sliced to the zoomed range
+INVENTORY_PLOT_POINTS = 2000
+# logs the Import card may read, given relative to this directory
+IMPORT_ROOT = os.environ.get("FROG_IMPORT_DIR", "./imports")
 
 delivery_functions = {
     'constant': lambda x: 1,
     'quadratic': lambda x: x**2,
     'logarithmic': lambda x: -np.log(x)
 }
+register_functions(__name__, 'delivery_functions', delivery_functions)
+
+@callback(
+    Output("session-id", "data"),
+    Input("session-id", "modified_timestamp"),
+    State("session-id", "data"),
+)
+def ensure_session_id(modified_timestamp, session_id):
+    # one id per browser tab session, namespaces the run artifacts
+    if session_id:
+        raise PreventUpdate
+    return new_session_id()
+
 @callback(
     Output("stored-sku-configs", "data"),
     Input("add-sku-button", "n_clicks"),
@@ -243,65 +272,222 @@ def render_sku_card(sku):
     State('sim-days', 'value'),
     State('seed', 'value'),
     State('output-label', 'value'),
+    State('session-id', 'data'),
+    State('demand-model', 'value'),
+    State('demand-correlation', 'value'),
+    background=True,
+    running=[
+        (Output('run-button', 'disabled'), True, False),
+        (Output('cancel-simulation', 'disabled'), False, True),
+        (
+            Output('simulation-progress', 'style'),
+            {'visibility': 'visible'},
+            {'visibility': 'hidden'},
+        ),
+    ],
+    cancel=Input('cancel-simulation', 'n_clicks'),
+    progress=[Output('simulation-progress', 'value'), Output('simulation-progress', 'max'),
+              Output('simulation-live-kpis', 'children')],
     prevent_initial_call=True
 )
-def run_simulation(n_clicks, sku_configs, start_date, days, seed, output_label):
+def run_simulation(set_progress, n_clicks, sku_configs, start_date, days, seed, output_label, session_id, demand_model=None, demand_correlation=None):
     if not n_clicks:
-        return ""
-
+        return "", None
 
-    #clear output
-    try:
-        shutil.rmtree(output_label)
-    except OSError as e:
-        print("Error: %s - %s." % (e.filename, e.strerror))
-    os.makedirs(output_label)
-   
     if not sku_configs:
         return html.P("No item configs provided."), None
 
-    # Map string delivery funcs to actual lambdas
-    for sku in sku_configs:
-        print(sku)
-        sku["delivery_func"] = delivery_functions[sku["delivery_func"]]
-
-    warehouse = Warehouse(sku_configs)
-
-    # Build config
-    sim_config = {
-        'warehouse' : warehouse,
-        'start_date': datetime.fromisoformat(start_date),
-        'days': days,
-        'seed': seed,
-        'output': output_label
-    }
-
-
-    simulation = Simulation( config=sim_config)
-    simulation.run()
-    global_results = simulation.evaluate_globally(report=True)
-    global_table = results_table(global_results, "Global Simulation Results")
-    sku_tables = []
-    for sku in warehouse.SKUs.keys():
-        sku_results = simulation.evaluate_skus(sku, report=True)
-        sku_tables.append(results_table(sku_results, f"Item {sku} Results"))    
-
-    children_layout = html.Div([
-        html.H4("Simulation Completed", className="mb-4"),
-        global_table,
-        html.Hr(),
-        html.Div(sku_tables)
-    ])
+    # every run writes into its own directory of the session, expired runs of all sessions are removed
+    cleanup_expired()
+    run_id, output = create_run(session_id or "anonymous", output_label)
+
+    try:
+        # Map string delivery funcs to actual lambdas
+        for sku in sku_configs:
+            sku["delivery_func"] = delivery_functions[sku["delivery_func"]]
 
-    return children_layout, get_ocel(f'{output_label}/')
+        def report_progress(sim):
+            set_progress((sim.current_day, sim.days, live_kpi_table(sim.live_kpis())))
+
+        try:
+            warehouse = Warehouse(sku_configs)
+            sim_config = {
+                'warehouse' : warehouse,
+                'start_date': datetime.fromisoformat(start_date),
+                'days': days,
+                'seed': seed,
+                'output': output,
+                'budget': DEFAULT_BUDGET,
+                # runs over budget are refused before they write anything, see run_simulation
+                'budget_action': 'refuse',
+                'demand': make_demand(demand_model, correlation=demand_correlation),
+            }
+            simulation = Simulation( config=sim_config)
+        except ValueError as e:
+            # e.g. a kpi_trim of 0.5 or a negative demand correlation that is impossible for this many items
+            update_run(run_id, status="failed")
+            return html.P(f"Invalid simulation config: {e}"), None
+        # about 100 progress updates per run, each one is a round trip through the callback manager
+        try:
+            simulation.run(on_progress=report_progress, progress_every=max(1, days // 100))
+        except BudgetExceeded as e:
+            update_run(run_id, status="refused")
+            return dbc.Alert(str(e), color="warning"), None
+        global_results = simulation.evaluate_globally(report=True)
+        global_table = results_table(global_results, "Global Simulation Results")
+        sku_tables = []
+        for sku in warehouse.SKUs.keys():
+            sku_results = simulation.evaluate_skus(sku, report=True)
+            sku_tables.append(results_table(sku_results, f"Item {sku} Results"))    
+
+        lead_times = simulation.evaluate_lead_times().round(2)
+        lead_time_table = dbc.Card(
+            dbc.CardBody([
+                html.H5("Lead Times (days, completed order lines)", className="card-title"),
+                dbc.Table.from_dataframe(lead_times, bordered=True, striped=True, hover=True, size="sm")
+            ]),
+            className="mb-3"
+        )
+
+        children_layout = html.Div([
+            html.H4("Simulation Completed", className="mb-4"),
+            global_table,
+            lead_time_table,
+            html.Hr(),
+            html.Div(sku_tables)
+        ])
+
+        ocel_path = os.path.join(output, "OCEL.json")
+        ocel = get_ocel(output, ocel_path)
+        handle = put_table(run_id, ocel.get_extended_table(), ocel_path)
+        update_run(run_id, status="finished", handle=handle)
+        return children_layout, handle
+    except Exception:
+        # a cancelled run is killed and never gets here, runs.get_run reports it as cancelled
+        update_run(run_id, status="failed")
+        raise
+
+@lru_cache(maxsize=16)
+def load_inventory_levels(path, mtime):
+    # mtime is part of the key so a rewritten run is loaded again
+    return MultiResolutionSeries.load(path)
+
+def inventory_figure(levels, x_range=None, max_points=INVENTORY_PLOT_POINTS):
+    x_min, x_max = x_range or (None, None)
+    fig = go.Figure()
+    for name, label in (('on_hand', 'Inventory On hand'), ('total', 'Total Inventory')):
+        x, y = levels.series_for_range(name, x_min, x_max, max_points)
+        fig.add_trace(go.Scattergl(x=x, y=y, mode='lines', name=label))
+    fig.update_layout(title='Inventory Level Over Time', xaxis_title='Day', yaxis_title='Inventory',
+                      uirevision='inventory', margin=dict(t=40, b=40))
+    if x_range:
+        fig.update_xaxes(range=list(x_range))
+    return fig
+
+def relayout_x_range(relayout_data):
+    """x axis range of a Graph relayoutData, None for autorange, raises PreventUpdate if the x axis did not change."""
+    relayout_data = relayout_data or {}
+    if relayout_data.get('xaxis.autorange'):
+        return None
+    if 'xaxis.range[0]' in relayout_data:
+        return relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    if 'xaxis.range' in relayout_data:
+        return tuple(relayout_data['xaxis.range'])
+    raise PreventUpdate
 
-def get_ocel(path):
+@callback(
+    Output('inventory-graph', 'figure'),
+    Output('inventory-graph', 'style'),
+    Input('inventory-graph', 'relayoutData'),
+    Input('stored-ocel', 'data'),
+)
+def update_inventory_graph(relayout_data, handle):
+    path = os.path.join(os.path.dirname(handle['ocel_path']), INVENTORY_FILENAME) if handle and handle.get('ocel_path') else None
+    if path is None or not os.path.exists(path):
+        return go.Figure(), {'display': 'none'}
+    # a new run shows its whole horizon, zooming serves the finest level that fits the range
+    x_range = relayout_x_range(relayout_data) if ctx.triggered_id == 'inventory-graph' else None
+    levels = load_inventory_levels(path, os.path.getmtime(path))
+    return inventory_figure(levels, x_range), {'display': 'block'}
+
+def import_log_path(name):
+    """Real path of a log in IMPORT_ROOT, None for anything outside it (absolute paths, .., symlinks out of it)."""
+    if not name:
+        return None
+    root = os.path.realpath(IMPORT_ROOT)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None
+    return path
+
+@callback(
+    Output("stored-sku-configs", "data", allow_duplicate=True),
+    Output('start-date', 'date'),
+    Output('sim-days', 'value'),
+    Output('import-log-output', 'children'),
+    Input('import-log-button', 'n_clicks'),
+    State('import-log-path', 'value'),
+    background=True,
+    running=[(Output('import-log-button', 'disabled'), True, False)],
+    prevent_initial_call=True
+)
+def import_log(n_clicks, name):
+    path = import_log_path(name)
+    if path is None:
+        return no_update, no_update, no_update, html.P("No such log in the import directory.")
+    try:
+        imported = cached_import(path)
+    except (OSError, ValueError, KeyError, sqlite3.Error, ElementTree.ParseError) as e:
+        # the reason goes to the server log only, it may name server paths
+        print(f"Import of {path} failed: {e!r}")
+        return no_update, no_update, no_update, html.P("The log could not be imported, is it an OCEL 2.0 JSON, XML or SQLite file?")
+    if not len(imported.materials):
+        return no_update, no_update, no_update, html.P("The log has no order lines with a material.")
+
+    sku_configs = imported.sku_configs()
+    days = imported.days
+    return sku_configs, str(days[0]), len(days), dbc.Alert(
+        f"Imported {len(imported.line_placed)} order lines and {len(imported.shipment_line)} shipments "
+        f"of {len(sku_configs)} materials over {len(days)} days.", color="success")
+
+@callback(
+    Output('estimate-output', 'children'),
+    Input('estimate-button', 'n_clicks'),
+    State('stored-sku-configs', 'data'),
+    State('sim-days', 'value'),
+    State('seed', 'value'),
+    State('demand-model', 'value'),
+    State('demand-correlation', 'value'),
+    prevent_initial_call=True
+)
+def estimate_simulation(n_clicks, sku_configs, days, seed=None, demand_model=None, demand_correlation=None):
+    if not sku_configs or not days:
+        return html.P("No item configs provided.")
+
+    try:
+        estimate = estimate_run({'days': days, 'seed': seed,
+                                 'demand': make_demand(demand_model, correlation=demand_correlation)},
+                                sku_configs=sku_configs)
+    except ValueError as e:
+        return html.P(f"Invalid simulation config: {e}")
+    method = estimate.pop("method")
+    messages = over_budget(estimate, DEFAULT_BUDGET)
+    return html.Div([
+        results_table({key: round(value) if key != "output_mb" else value for key, value in estimate.items()},
+                      f"Estimated Output ({method})"),
+        dbc.Alert("; ".join(messages) if messages else "Within the output budget.",
+                  color="warning" if messages else "success")
+    ])
+
+def get_ocel(path, ocel_path="OCEL.json"):
+    """Merges the per order OCEL files of a run into ocel_path and returns the parsed OCEL."""
     complete_ocel_json = {}
     complete_ocel_json["objects"] = []
     complete_ocel_json["events"] =[]
     o_count = 0
    
-    json_files = [pos_json for pos_json in os.listdir(path) if pos_json.endswith('.json')]
+    json_files = [pos_json for pos_json in os.listdir(path)
+                  if pos_json.startswith('OrderProcess_') and pos_json.endswith('.json')]
     with open(os.path.join(path,json_files[0])) as init_js:
         json_text = json.load(init_js)
         complete_ocel_json["objectTypes"]= json_text["objectTypes"]
@@ -317,24 +503,16 @@ def get_ocel(path):
     # Serializing json
     json_object = json.dumps(complete_ocel_json)
 
-    # Writing to sample.json
-    with open("OCEL.json", "w") as outfile:
+    with open(ocel_path, "w") as outfile:
         outfile.write(json_object)
 
-    ocel = pm4py.read_ocel2_json("OCEL.json").get_extended_table()
-    #ocel.columns = [col.split(':')[-1] for col in ocel.columns]
-    def serialize_cell(x):
-        if isinstance(x, (dict, list)):
-            return json.dumps(x)
-        elif x is None:
-            return ''
-        else:
-            return str(x)
-
-    for col in ocel.columns:
-        ocel[col] = ocel[col].apply(serialize_cell)
+    return load_ocel(ocel_path)
 
-    return ocel.to_json(date_format='iso', orient='split')
+def live_kpi_table(kpis):
+    """Compact single row view of Simulation.live_kpis() shown while the run is in progress."""
+    header = html.Thead(html.Tr([html.Th(str(key).replace('_', ' ').title()) for key in kpis]))
+    row = html.Tr([html.Td(f"{value:.2%}" if key == 'service_level' else f"{value:,.0f}") for key, value in kpis.items()])
+    return dbc.Table([header, html.Tbody([row])], bordered=True, size="sm", className="mb-0")
 
 def results_table(data_dict, title):
         table_header = [html.Thead(html.Tr([html.Th("Metric"), html.Th("Value")]))]
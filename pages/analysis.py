@@ -13,23 +13,110 @@ dash.register_page(__name__, path="/analysis")
 layout = dbc.Container([
     html.H2("OCEL Analysis", className="mb-4"),
 
+    # Runs of this session
+    dbc.Row([
+        dbc.Col([
+            dbc.Label("Run"),
+            dcc.Dropdown(id="analysis-run", placeholder="Latest run of this session", clearable=False),
+        ], md=6)
+    ], className="mb-3"),
+
     # Action bar
     dbc.Row([
         dbc.Col([
             dbc.Button("Show OCEL Table & Stats", id='show-ocel-button', color='secondary', className="me-2"),
             dbc.Button("Download OCEL", id="download-ocel-btn", color="primary"),
             dcc.Download(id="download-ocel")
-        ], width="auto")
+        ], width="auto"),
+        dbc.Col([
+            dbc.Checklist(
+                id="download-ocel-options",
+                options=[{"label": "Compress download (gzip)", "value": "gzip"}],
+                value=[],
+                switch=True
+            ),
+        ], width="auto", className="d-flex align-items-center")
     ], className="mb-4"),
 
     # Output
     dbc.Card([
         dbc.CardHeader("OCEL Data"),
         dbc.CardBody([
-            html.Div(id="ocel-table-container", className="mb-3"),
+            html.Div([
+                html.Div(id="ocel-table-message"),
+                # paging, filtering and sorting run on the server (callbacks.analysis.update_ocel_table)
+                dash_table.DataTable(
+                    id='ocel-table',
+                    columns=[],
+                    data=[],
+                    page_current=0,
+                    page_size=20,
+                    page_action="custom",
+                    filter_action="custom",
+                    filter_query="",
+                    sort_action="custom",
+                    sort_mode="multi",
+                    sort_by=[],
+                    style_table={'overflowX': 'auto'},
+                    style_cell={'textAlign': 'left', 'minWidth': '100px', 'width': '150px', 'maxWidth': '300px'}
+                ),
+            ], id="ocel-table-container", className="mb-3"),
             html.Div(id="ocel-stats-container")
         ])
     ], className="mb-4"),
 
+    # Directly-follows relation of the flat logs or of one object type of the OCEL
+    dbc.Card([
+        dbc.CardHeader("Directly-Follows Graph"),
+        dbc.CardBody([
+            dbc.Row([
+                dbc.Col([
+                    dcc.Dropdown(
+                        id="dfg-log",
+                        options=[
+                            {"label": "Items (divergence log)", "value": "div_items"},
+                            {"label": "Orders (divergence log)", "value": "div_order"},
+                            {"label": "Items per package (convergence log)", "value": "conv"},
+                            {"label": "OCEL flattened on Item", "value": "ocel:Item"},
+                            {"label": "OCEL flattened on Order", "value": "ocel:Order"},
+                            {"label": "OCEL flattened on Package", "value": "ocel:Package"},
+                        ],
+                        value="div_items",
+                        clearable=False
+                    ),
+                ], md=6),
+                dbc.Col([
+                    dbc.Button("Compute Directly-Follows", id="dfg-button", color="secondary"),
+                ], width="auto"),
+            ], className="mb-3"),
+            html.Div(id="dfg-output")
+        ])
+    ], className="mb-4"),
+
+    # Events and packages of an object and its split descendants, answered from the run's relation index
+    dbc.Card([
+        dbc.CardHeader("Object Lineage"),
+        dbc.CardBody([
+            dbc.Row([
+                dbc.Col([
+                    dbc.Input(id="lineage-object", type="text", placeholder="Object id, e.g. order_3 or item_3_0"),
+                ], md=6),
+                dbc.Col([
+                    dbc.Button("Trace Object", id="lineage-button", color="secondary"),
+                ], width="auto"),
+            ], className="mb-3"),
+            html.Div(id="lineage-output")
+        ])
+    ], className="mb-4"),
+
+    # Split and delivery fragmentation of the selected run and of all runs of the session
+    dbc.Card([
+        dbc.CardHeader("Delivery Fragmentation"),
+        dbc.CardBody([
+            dbc.Button("Analyze Fragmentation", id="fragmentation-button", color="secondary", className="mb-3"),
+            html.Div(id="fragmentation-output")
+        ])
+    ], className="mb-4"),
+
     dcc.Store(id="stored-ocel", storage_type="session")
 ])
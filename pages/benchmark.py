@@ -33,6 +33,23 @@ layout = dbc.Container([
                     dbc.Label("Repeats per config"),
                     dbc.Input(id="benchmark-repeats", type="number", value=3),
                 ], md=4),
+                dbc.Col([
+                    dbc.Label("Parallel workers"),
+                    dbc.Input(id="benchmark-workers", type="number", value=1, min=1),
+                ], md=4),
+                dbc.Col([
+                    dbc.Label("Options"),
+                    dbc.Checklist(
+                        id="benchmark-options",
+                        options=[
+                            {"label": "Profile simulation phases", "value": "profile"},
+                            {"label": "Track memory", "value": "memory"},
+                            {"label": "Pin workers to CPUs", "value": "pin"},
+                        ],
+                        value=[],
+                        switch=True
+                    ),
+                ], md=4),
             ]),
         ])
     ], className="mb-4"),
@@ -61,6 +78,53 @@ layout = dbc.Container([
         ])
     ], className="mb-4"),
 
+    # Extrapolation from the last benchmark run
+    dbc.Card([
+        dbc.CardHeader("Predict Unbenchmarked Config"),
+        dbc.CardBody([
+            dbc.Row([
+                dbc.Col([
+                    dbc.Label("Days"),
+                    dbc.Input(id="predict-days", type="number", value=10000, min=1),
+                ], md=3),
+                dbc.Col([
+                    dbc.Label("Items"),
+                    dbc.Input(id="predict-skus", type="number", value=200, min=1),
+                ], md=3),
+                dbc.Col([
+                    dbc.Label("Split centre"),
+                    dbc.Input(id="predict-split", type="number", value=5, min=0),
+                ], md=3),
+                dbc.Col([
+                    dbc.Button("Predict", id="predict-benchmark", color="primary", className="mt-4"),
+                ], md=3),
+            ], className="mb-3"),
+            html.Div(id="predict-results")
+        ])
+    ], className="mb-4"),
+
+    # History: overlay two revisions
+    dbc.Card([
+        dbc.CardHeader("Benchmark History"),
+        dbc.CardBody([
+            dbc.Row([
+                dbc.Col([
+                    dbc.Label("Baseline revision"),
+                    dcc.Dropdown(id="history-baseline"),
+                ], md=4),
+                dbc.Col([
+                    dbc.Label("Candidate revision"),
+                    dcc.Dropdown(id="history-candidate"),
+                ], md=4),
+                dbc.Col([
+                    dbc.Button("Refresh", id="refresh-history", color="secondary", className="me-2 mt-4"),
+                    dbc.Button("Compare", id="compare-history", color="primary", className="mt-4"),
+                ], md=4),
+            ], className="mb-3"),
+            html.Div(id="history-results")
+        ])
+    ], className="mb-4"),
+
     dcc.Store(id="benchmark-raw"),
     dcc.Download(id="download-benchmark")
 ],)
\ No newline at end of file
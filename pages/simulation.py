@@ -35,8 +35,38 @@ layout = dbc.Container([
                 dbc.Col([
                     dbc.Label("Output Label"),
                     dbc.Input(id='output-label', type='text', value="experiment")
-                ], md=6),
+                ], md=4),
+                dbc.Col([
+                    dbc.Label("Demand Model"),
+                    dcc.Dropdown(id='demand-model', value=None, placeholder="Normal per item", options=[
+                        {'label': 'Normal (vectorized)', 'value': 'normal'},
+                        {'label': 'Trend (+10% per year)', 'value': 'trend'},
+                        {'label': 'Seasonal (yearly, +-20%)', 'value': 'seasonal'},
+                        {'label': 'Intermittent (Croston)', 'value': 'intermittent'},
+                    ])
+                ], md=4),
+                dbc.Col([
+                    dbc.Label("Demand Correlation"),
+                    dbc.Input(id='demand-correlation', type='number', min=-0.99, max=0.99, step=0.05, placeholder="independent")
+                ], md=4),
+            ]),
+        ])
+    ], className="mb-4"),
+
+    # Item configs seeded from an existing OCEL 2.0 log in the server's import directory
+    dbc.Card([
+        dbc.CardHeader("Import Log"),
+        dbc.CardBody([
+            dbc.Row([
+                dbc.Col([
+                    dbc.Label("OCEL 2.0 file (JSON, XML or SQLite) in the import directory"),
+                    dbc.Input(id='import-log-path', type='text', placeholder="erp_extract.sqlite")
+                ], md=8),
+                dbc.Col([
+                    dbc.Button("Import", id='import-log-button', color='primary', className="mt-4"),
+                ], md=4),
             ]),
+            html.Div(id='import-log-output', className="mt-2"),
         ])
     ], className="mb-4"),
 
@@ -52,14 +82,28 @@ layout = dbc.Container([
     # Actions
     dbc.Row([
         dbc.Col([
-            dbc.Button("Run Simulation", id='run-button', color='success', size="lg"),
+            dbc.Button("Run Simulation", id='run-button', color='success', size="lg", className="me-2"),
+            dbc.Button("Cancel Simulation", id='cancel-simulation', color='danger', size="lg", className="me-2", disabled=True),
+            dbc.Button("Estimate Output", id='estimate-button', color='secondary', size="lg"),
         ], width="auto")
     ], className="mb-4"),
 
+    # Progress of a running simulation, filled by the background callback
+    dbc.Row([
+        dbc.Col([
+            dbc.Progress(id='simulation-progress', value=0, max=1, style={'visibility': 'hidden'}),
+            html.Div(id='simulation-live-kpis', className="mt-2"),
+        ], md=12)
+    ], className="mb-4"),
+
+    html.Div(id='estimate-output', className="mb-4"),
+
     # Output
     dbc.Card([
         dbc.CardHeader("Simulation Results"),
         dbc.CardBody([
+            # inventory over time, served from the downsampled levels of the run and refined on zoom
+            dcc.Graph(id='inventory-graph', style={'display': 'none'}),
             html.Div(id='simulation-output')
         ])
     ], className="mb-4"),
@@ -6,6 +6,9 @@ from datetime import datetime, timedelta
 import json
 import os
 
+from .ocel_records import EventRecord, ObjectRecord, records_to_ocel_json
+from .profiling import NullProfiler
+
 def convert_int64_to_int(obj):
     """
     Recursively converts numpy.int64 values to regular Python int.
@@ -249,7 +252,8 @@ def distribute_values(func, time_slots, target_sum, verbose=False):
 
 
 # Function to generate OCEL event log
-def generate_ocel_event_log(start_date, items, iteration, output, company="company_1", verbose=False):
+def generate_ocel_event_log(start_date, items, iteration, output, company="company_1", verbose=False, profiler=None, stats=None, index=None):
+    profiler = profiler or NullProfiler()
 
     global_rng = np.random.default_rng()
 
@@ -416,20 +420,11 @@ def generate_ocel_event_log(start_date, items, iteration, output, company="compa
     send_invoice_timestamp = place_order_timestamp + generate_random_timedelta(1, 3)  # 1-3 days for invoice
     receive_payment_timestamp = send_invoice_timestamp + generate_random_timedelta(1, 7)  # 1-7 days for payment
 
-    order_object = {
-        "id": order_id,
-        "type": "Order",
-        "attributes": [
-        ],
-        "relationships": []
-    }
-
-    # Iterate over items
-    for key in items:
-        order_object["relationships"].append({
-            "objectId": items[key]['initial_item_name'],
-            "qualifier": "Item of Order"
-        })
+    order_object = ObjectRecord(
+        id=order_id,
+        type="Order",
+        relationships=[(items[key]['initial_item_name'], "Item of Order") for key in items]
+    )
 
     # Append the Order object to the list of objects
     objects.append(order_object)
@@ -437,10 +432,7 @@ def generate_ocel_event_log(start_date, items, iteration, output, company="compa
     item_relationships = []
 
     for key, item in items.items():
-        item_relationships.append({
-            "objectId": items[key]['initial_item_name'],
-            "qualifier": "Initial item of order"
-        })
+        item_relationships.append((items[key]['initial_item_name'], "Initial item of order"))
 
     for key, item in items.items():
         # New order entries for traditional process mining
@@ -482,63 +474,27 @@ def generate_ocel_event_log(start_date, items, iteration, output, company="compa
 
     # Create events for the log
     events = [
-        {
-            "id": f"e_{iteration}_1_{company}",
-            "type": "Place Order",
-            "time": place_order_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-            "attributes": [
-                {
-                    "name": "company",
-                    "value": company
-                }
-
-            ],
-            "relationships": [
-                {
-                    "objectId": order_id,
-                    "qualifier": "Regular placement of order"
-                }
-            ] + item_relationships,
-        },
-        {
-            "id": f"e_{iteration}_2_{company}",
-            "type": "Send Invoice",
-            "time": send_invoice_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-            "attributes": [
-                {
-                    "name": "company",
-                    "value": company
-                }
-            ],
-            "relationships": [
-                {
-                    "objectId": order_id,
-                    "qualifier": "Regular placement of order"
-                }
-            ],
-
-        },
-        {
-            "id": f"e_{iteration}_3_{company}",
-            "type": "Receive Payment",
-            "time": receive_payment_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-            "attributes": [
-                {
-                    "name": "company",
-                    "value": company
-                },
-                {
-                    "name": "payment_method",
-                    "value": np.random.choice(payment_methods)
-                }
-            ],
-            "relationships": [
-                {
-                    "objectId": order_id,
-                    "qualifier": "Regular placement of order"
-                }
-            ],
-        }
+        EventRecord(
+            id=f"e_{iteration}_1_{company}",
+            activity="Place Order",
+            time=place_order_timestamp,
+            attributes=[("company", company)],
+            relationships=[(order_id, "Regular placement of order")] + item_relationships
+        ),
+        EventRecord(
+            id=f"e_{iteration}_2_{company}",
+            activity="Send Invoice",
+            time=send_invoice_timestamp,
+            attributes=[("company", company)],
+            relationships=[(order_id, "Regular placement of order")]
+        ),
+        EventRecord(
+            id=f"e_{iteration}_3_{company}",
+            activity="Receive Payment",
+            time=receive_payment_timestamp,
+            attributes=[("company", company), ("payment_method", np.random.choice(payment_methods))],
+            relationships=[(order_id, "Regular placement of order")]
+        )
     ]
 
     # Now add the "Check Availability" events based on the distributed days
@@ -616,23 +572,13 @@ def generate_ocel_event_log(start_date, items, iteration, output, company="compa
                 items[key]['del_amount'] += items[key]['check_availability_days'][day]
 
                 # Add the "Check Availability" event
-                events.append({
-                    "id": f"e_{iteration}_{day}_4_{company}_{key}",
-                    "type": "Check Availability",
-                    "time": item_check_availability_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-                    "attributes": [
-                        {
-                            "name": "checker",
-                            "value": np.random.choice(warehouse_employees)
-                        }
-                    ],
-                    "relationships": [
-                        {
-                            "objectId": items[key]['last_item_id'],
-                            "qualifier": "Regular availability check of items"
-                        }
-                    ]
-                })
+                events.append(EventRecord(
+                    id=f"e_{iteration}_{day}_4_{company}_{key}",
+                    activity="Check Availability",
+                    time=item_check_availability_timestamp,
+                    attributes=[("checker", np.random.choice(warehouse_employees))],
+                    relationships=[(items[key]['last_item_id'], "Regular availability check of items")]
+                ))
 
                 # Debugging print statement to track the process
                 if verbose:
@@ -652,33 +598,18 @@ def generate_ocel_event_log(start_date, items, iteration, output, company="compa
                     if verbose:
                         print(f"Split Item triggered! New item IDs: {items[key]['new_item_id_1']}, {items[key]['new_item_id_2']}")
 
-                    item_object = {
-                        "id": items[key]['last_item_id'],
-                        "type": "Item",
-                        "attributes": [
-                            {
-                                "name": "amount",
-                                "time": item_split_item_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-                                "value": items[key]['amount'] - items[key]['del_amount'] + items[key]['check_availability_days'][day]
-                            },
-                            {
-                                "name": "material_id",
-                                "time": item_split_item_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-                                "value": key
-                            }
+                    item_object = ObjectRecord(
+                        id=items[key]['last_item_id'],
+                        type="Item",
+                        attributes=[
+                            ("amount", items[key]['amount'] - items[key]['del_amount'] + items[key]['check_availability_days'][day], item_split_item_timestamp),
+                            ("material_id", key, item_split_item_timestamp)
                         ],
-                        "relationships":
-                            [
-                                {
-                                    "objectId": items[key]['new_item_id_1'],
-                                    "qualifier": "Split item out stock"
-                                },
-                                {
-                                    "objectId": items[key]['new_item_id_2'],
-                                    "qualifier": "Split item deliver"
-                                }
-                            ]
-                    }
+                        relationships=[
+                            (items[key]['new_item_id_1'], "Split item out stock"),
+                            (items[key]['new_item_id_2'], "Split item deliver")
+                        ]
+                    )
 
                     # Append the Order object to the list of objects
                     objects.append(item_object)
@@ -705,59 +636,30 @@ def generate_ocel_event_log(start_date, items, iteration, output, company="compa
                                                            ignore_index=True)
 
 
-                    events.append({
-                        "id": f"e_{iteration}_{day}_5_{company}_{key}",
-                        "type": "Split Item",
-                        "time": item_split_item_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-                        "attributes": [
-                            {
-                                "name": "spliter",
-                                "value": np.random.choice(warehouse_employees)
-                            }
-                        ],
-                        "relationships": [
-                            {
-                                "objectId": items[key]['last_item_id'],
-                                "qualifier": "Split of available items for delivery"
-                            },
-                            {
-                                "objectId": items[key]['new_item_id_1'],
-                                "qualifier": "Split item out of stock"
-                            },
-                            {
-                                "objectId": items[key]['new_item_id_2'],
-                                "qualifier": "Split item for delivery"
-                            }
+                    events.append(EventRecord(
+                        id=f"e_{iteration}_{day}_5_{company}_{key}",
+                        activity="Split Item",
+                        time=item_split_item_timestamp,
+                        attributes=[("spliter", np.random.choice(warehouse_employees))],
+                        relationships=[
+                            (items[key]['last_item_id'], "Split of available items for delivery"),
+                            (items[key]['new_item_id_1'], "Split item out of stock"),
+                            (items[key]['new_item_id_2'], "Split item for delivery")
                         ]
-                    })
-
-                    item_object_del = {
-                        "id": items[key]['new_item_id_2'],
-                        "type": "Item",
-                        "attributes": [
-                            {
-                                "name": "amount",
-                                "time": item_split_item_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-                                "value": items[key]['check_availability_days'][day]
-                            },
-                            {
-                                "name": "material_id",
-                                "time": item_split_item_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-                                "value": key
-                            }
+                    ))
+
+                    item_object_del = ObjectRecord(
+                        id=items[key]['new_item_id_2'],
+                        type="Item",
+                        attributes=[
+                            ("amount", items[key]['check_availability_days'][day], item_split_item_timestamp),
+                            ("material_id", key, item_split_item_timestamp)
                         ],
-                        "relationships":
-                            [
-                                {
-                                    "objectId": items[key]['last_item_id'],
-                                    "qualifier": "Split out of item"
-                                },
-                                {
-                                    "objectId": items[key]['new_item_id_1'],
-                                    "qualifier": "Split item out of stock"
-                                }
-                            ]
-                    }
+                        relationships=[
+                            (items[key]['last_item_id'], "Split out of item"),
+                            (items[key]['new_item_id_1'], "Split item out of stock")
+                        ]
+                    )
 
                     # Append the Order object to the list of objects
                     objects.append(item_object_del)
@@ -769,25 +671,14 @@ def generate_ocel_event_log(start_date, items, iteration, output, company="compa
 
                     items[key]['item_for_Package'] = items[key]['last_item_id']
 
-                    item_object = {
-                        "id": items[key]['last_item_id'],
-                        "type": "Item",
-                        "attributes": [
-                            {
-                                "name": "amount",
-                                "time": item_split_item_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-                                "value": items[key]['amount'] - items[key]['del_amount'] + items[key]['check_availability_days'][day]
-                            },
-                            {
-                                "name": "material_id",
-                                "time": item_split_item_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-                                "value": key
-                            }
-                        ],
-                        "relationships":
-                            [
-                            ]
-                    }
+                    item_object = ObjectRecord(
+                        id=items[key]['last_item_id'],
+                        type="Item",
+                        attributes=[
+                            ("amount", items[key]['amount'] - items[key]['del_amount'] + items[key]['check_availability_days'][day], item_split_item_timestamp),
+                            ("material_id", key, item_split_item_timestamp)
+                        ]
+                    )
 
                     # Append the Order object to the list of objects
                     objects.append(item_object)
@@ -829,24 +720,13 @@ def generate_ocel_event_log(start_date, items, iteration, output, company="compa
                                                      ignore_index=True)
 
                     # If a Split Item occurred, use the new item_id_2 for Pick Item
-                    events.append({
-                        "id": f"e_{iteration}_{day}_6_{company}_{key}",
-                        "type": "Pick Item",
-                        "time": item_pick_item_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-
-                        "attributes": [
-                            {
-                                "name": "picker",
-                                "value": np.random.choice(warehouse_employees)
-                            }
-                        ],
-                        "relationships": [
-                            {
-                                "objectId": items[key]['item_for_Package'],
-                                "qualifier": "Regular pick of item"
-                            }
-                        ]
-                    })
+                    events.append(EventRecord(
+                        id=f"e_{iteration}_{day}_6_{company}_{key}",
+                        activity="Pick Item",
+                        time=item_pick_item_timestamp,
+                        attributes=[("picker", np.random.choice(warehouse_employees))],
+                        relationships=[(items[key]['item_for_Package'], "Regular pick of item")]
+                    ))
                     if verbose:
                         print(f"Pick Item activity for {items[key]['new_item_id_2']} after Split Item at {item_pick_item_timestamp}")
                 else:
@@ -884,41 +764,22 @@ def generate_ocel_event_log(start_date, items, iteration, output, company="compa
                                                       ignore_index=True)
 
                     # If no Split Item occurred, use the item_id from Check Availability for Pick Item
-                    events.append({
-                        "id": f"e_{iteration}_{day}_7_{company}_{key}",
-                        "type": "Pick Item",
-                        "time": item_pick_item_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-                        "attributes": [
-                            {
-                                "name": "picker",
-                                "value": np.random.choice(warehouse_employees)
-                            }
-                        ],
-                        "relationships": [
-                            {
-                                "objectId": items[key]['item_for_Package'],
-                                "qualifier": "Regular pick of item"
-                            }
-                        ]
-                    })
+                    events.append(EventRecord(
+                        id=f"e_{iteration}_{day}_7_{company}_{key}",
+                        activity="Pick Item",
+                        time=item_pick_item_timestamp,
+                        attributes=[("picker", np.random.choice(warehouse_employees))],
+                        relationships=[(items[key]['item_for_Package'], "Regular pick of item")]
+                    ))
                     if verbose:
                         print(f"Pick Item activity for {items[key]['last_item_id']} after Check Availability at {item_pick_item_timestamp}")
 
         package_id = generate_package_id_by_date(pack_items_timestamp)
-        package_object = {
-            "id": package_id,
-            "type": "Package",
-            "attributes": [],
-            "relationships":
-                [
-                ]
-        }
-        for key in items:
-            if day < items[key]['del_days']:
-                package_object["relationships"].append({
-                    "objectId": items[key]['item_for_Package'],
-                    "qualifier": "Package of item"
-                })
+        package_object = ObjectRecord(
+            id=package_id,
+            type="Package",
+            relationships=[(items[key]['item_for_Package'], "Package of item") for key in items if day < items[key]['del_days']]
+        )
 
         # Append the Package object to the list of objects
         objects.append(package_object)
@@ -932,10 +793,7 @@ def generate_ocel_event_log(start_date, items, iteration, output, company="compa
 
         for key, item in items.items():
             if day < item['del_days']:
-                relationships.append({
-                    "objectId": items[key]['item_for_Package'],
-                    "qualifier": "Regular pack of item"
-                })
+                relationships.append((items[key]['item_for_Package'], "Regular pack of item"))
 
                 # New entry for traditional process mining
                 pack_entry = {
@@ -960,23 +818,13 @@ def generate_ocel_event_log(start_date, items, iteration, output, company="compa
                                                ignore_index=True)
 
         # Add the "Pack Items" activity
-        events.append({
-            "id": f"e_{iteration}_{day}_8_{company}",
-            "type": "Pack Items",
-            "time": pack_items_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-            "attributes": [
-                {
-                    "name": "packer",
-                    "value": np.random.choice(warehouse_employees)
-                }
-            ],
-            "relationships": relationships + [
-                {
-                    "objectId": package_id,
-                    "qualifier": "Package of items"
-                }
-            ]
-        })
+        events.append(EventRecord(
+            id=f"e_{iteration}_{day}_8_{company}",
+            activity="Pack Items",
+            time=pack_items_timestamp,
+            attributes=[("packer", np.random.choice(warehouse_employees))],
+            relationships=relationships + [(package_id, "Package of items")]
+        ))
 
 
         if verbose:
@@ -1017,23 +865,13 @@ def generate_ocel_event_log(start_date, items, iteration, output, company="compa
                                                ignore_index=True)
 
         # Add the "Store Package" activity
-        events.append({
-            "id": f"e_{iteration}_{day}_9_{company}",
-            "type": "Store Package",
-            "time": store_package_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-            "attributes": [
-                {
-                    "name": "storer",
-                    "value": np.random.choice(warehouse_employees)
-                }
-            ],
-            "relationships": [
-                {
-                    "objectId": package_id,
-                    "qualifier": "Regular store of package"
-                }
-            ]
-        })
+        events.append(EventRecord(
+            id=f"e_{iteration}_{day}_9_{company}",
+            activity="Store Package",
+            time=store_package_timestamp,
+            attributes=[("storer", np.random.choice(warehouse_employees))],
+            relationships=[(package_id, "Regular store of package")]
+        ))
         if verbose:
             print(f"Store Package activity for {package_id} at {store_package_timestamp}")
 
@@ -1072,23 +910,13 @@ def generate_ocel_event_log(start_date, items, iteration, output, company="compa
                                                ignore_index=True)
 
         # Add the "Load Package" activity
-        events.append({
-            "id": f"e_{iteration}_{day}_10_{company}",
-            "type": "Load Package",
-            "time": load_package_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-            "attributes": [
-                {
-                    "name": "loader",
-                    "value": np.random.choice(warehouse_employees)
-                }
-            ],
-            "relationships": [
-                {
-                    "objectId": package_id,
-                    "qualifier": "Regular load of package"
-                }
-            ]
-        })
+        events.append(EventRecord(
+            id=f"e_{iteration}_{day}_10_{company}",
+            activity="Load Package",
+            time=load_package_timestamp,
+            attributes=[("loader", np.random.choice(warehouse_employees))],
+            relationships=[(package_id, "Regular load of package")]
+        ))
         if verbose:
             print(f"Load Package activity for {package_id} at {load_package_timestamp}")
 
@@ -1131,41 +959,36 @@ def generate_ocel_event_log(start_date, items, iteration, output, company="compa
                                                ignore_index=True)
 
         # Add the "Deliver Package" activity
-        events.append({
-            "id": f"e_{iteration}_{day}_11_{company}",
-            "type": "Deliver Package",
-            "time": deliver_package_timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
-            "attributes": [
-                {
-                    "name": "logistics_company",
-                    "value": np.random.choice(shipping_companies)
-                }
-            ],
-            "relationships": [
-                {
-                    "objectId": package_id,
-                    "qualifier": "Regular deliver of package"
-                }
-            ]
-        })
+        events.append(EventRecord(
+            id=f"e_{iteration}_{day}_11_{company}",
+            activity="Deliver Package",
+            time=deliver_package_timestamp,
+            attributes=[("logistics_company", np.random.choice(shipping_companies))],
+            relationships=[(package_id, "Regular deliver of package")]
+        ))
         if verbose:
             print(f"Deliver Package activity for {package_id} at {deliver_package_timestamp}")
 
-    ocel_log = {
-        "objectTypes": object_types,
-        "eventTypes": event_types,
-        "objects": objects,
-        "events": events
-    }
+    profiler.count("events", len(events))
+    profiler.count("objects", len(objects))
+    ocel_filename = f"OrderProcess_{start_date.strftime('%Y-%m-%d')}.json"
+    if stats is not None:
+        stats.add(ocel_filename, objects, events)
+    if index is not None:
+        index.add(ocel_filename, objects, events)
+
+    with profiler.span("write_files"):
+        # The records are only turned into OCEL JSON dicts here, right before serialization
+        ocel_log = records_to_ocel_json(object_types, event_types, objects, events)
 
-    # Save the OCEL log as a JSON file
-    save_ocel_log_to_json(ocel_log, start_date, output, verbose, )
+        # Save the OCEL log as a JSON file
+        save_ocel_log_to_json(ocel_log, start_date, output, verbose, )
 
-    save_dataframe_to_csv(divergence_event_log_items, f"OrderProcess_{start_date}_div_items.csv", f'{output}/div_items')
+        save_dataframe_to_csv(divergence_event_log_items, f"OrderProcess_{start_date}_div_items.csv", f'{output}/div_items')
 
-    save_dataframe_to_csv(divergence_event_log_order, f"OrderProcess_{start_date}_div_order.csv", f'{output}/div_order')
+        save_dataframe_to_csv(divergence_event_log_order, f"OrderProcess_{start_date}_div_order.csv", f'{output}/div_order')
 
-    save_dataframe_to_csv(convergence_event_log, f"OrderProcess_{start_date}_conv.csv", f'{output}/conv')
+        save_dataframe_to_csv(convergence_event_log, f"OrderProcess_{start_date}_conv.csv", f'{output}/conv')
 
     return ocel_log
 
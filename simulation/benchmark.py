@@ -1,5 +1,7 @@
 # benchmark_runtime.py
-import os, shutil, time, itertools, statistics as st, uuid
+import argparse, os, shutil, sys, time, itertools, statistics as st, uuid
+import threading, tracemalloc, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dataclasses import dataclass
 from typing import List, Dict, Iterable
 import numpy as np
@@ -8,12 +10,23 @@ import json
 
 from .warehouse import Warehouse
 from .simulation import Simulation
+from .checkpoint import register_functions
+from .OCEL_FormatGenerator import used_ids
+from . import curve_fitting
+from .scaling import scaling_report, predict_configs
+from .benchmark_history import ci95, append_history, load_history, compare_revisions, candidate_machine, HISTORY_PATH
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
 
 DELIVERY_FUNCS = {
     "constant": lambda x: 1,
     "quadratic": lambda x: x**2,
     "logarithmic": lambda x: -np.log(x) if x > 0 else 0.0
 }
+register_functions(__name__, "DELIVERY_FUNCS", DELIVERY_FUNCS)
 
 @dataclass
 class FixedParams:
@@ -25,6 +38,8 @@ class FixedParams:
     write_output: bool = False
     mean_daily_demand: float = 50.0   
     std_daily_demand: float = 1.0
+    profile: bool = False
+    track_memory: bool = False
 
 def make_sku_configs(
     n_skus: int,
@@ -61,7 +76,7 @@ def build_ocel(path):
     complete_ocel_json["events"] =[]
     o_count = 0
    
-    json_files = [pos_json for pos_json in os.listdir(path) if pos_json.endswith('.json')]
+    json_files = [pos_json for pos_json in os.listdir(path) if pos_json.startswith('OrderProcess_') and pos_json.endswith('.json')]
     with open(os.path.join(path,json_files[0])) as init_js:
         json_text = json.load(init_js)
         complete_ocel_json["objectTypes"]= json_text["objectTypes"]
@@ -79,6 +94,50 @@ def build_ocel(path):
     with open(f"{path}/OCEL.json", "w") as outfile:
         outfile.write(json_object)
 
+def current_rss() -> int:
+    """Resident set size of this process in bytes (psutil, /proc or the getrusage peak as fallback)."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class RSSSampler:
+    """Polls the RSS in a background thread and keeps the peak seen while running."""
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.start_rss = current_rss()
+        self.peak_rss = self.start_rss
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, current_rss())
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> int:
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, current_rss())
+        return self.peak_rss
+
+def directory_size(path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
 def run_once(days: int, n_skus: int, split_centre: float, fixed: FixedParams) -> Dict:
     wh = Warehouse(
         make_sku_configs(
@@ -100,64 +159,152 @@ def run_once(days: int, n_skus: int, split_centre: float, fixed: FixedParams) ->
         "start_date": pd.Timestamp.now().to_pydatetime(),
         "days": days,
         "seed": fixed.seed,
-        "output": out_dir 
+        "output": out_dir,
+        "profile": fixed.profile
     }
 
     sim = Simulation(config=sim_cfg)
 
+    # tracemalloc slows the run down, so runtimes of memory tracked runs are not comparable to plain ones
+    if fixed.track_memory:
+        sampler = RSSSampler().start()
+        tracemalloc.start()
+
     t0 = time.perf_counter()
     sim.run()
     sim.evaluate_globally(report=False)
     for sku in wh.SKUs.keys():
         sim.evaluate_skus(sku, report=False)
     if fixed.build_ocel:
-        build_ocel(out_dir)
+        with sim.profiler.span("build_ocel"):
+            build_ocel(out_dir)
     t1 = time.perf_counter()
 
-    if not fixed.write_output and os.path.isdir(out_dir):
-        shutil.rmtree(out_dir, ignore_errors=True)
-
-    return {
+    result = {
         "days": days,
         "n_skus": n_skus,
         "split_centre": split_centre,
-        "run_time": t1 - t0
+        "run_time": t1 - t0,
+        "output_mb": directory_size(out_dir) / 2**20
     }
 
+    if fixed.track_memory:
+        _, peak_traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_rss = sampler.stop()
+        result["peak_traced_mb"] = peak_traced / 2**20
+        result["peak_rss_mb"] = peak_rss / 2**20
+        result["rss_growth_mb"] = (peak_rss - sampler.start_rss) / 2**20
+
+    if not fixed.write_output and os.path.isdir(out_dir):
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    phases = sim.evaluate_phases()
+    for phase, seconds in phases["phase_times"].items():
+        result[f"phase_{phase}"] = seconds
+    for counter, value in phases["counters"].items():
+        result[f"count_{counter}"] = value
+    return result
+
+def run_isolated(days: int, n_skus: int, split_centre: float, fixed: FixedParams) -> Dict:
+    """
+    run_once with the module level state reset (generated ids, fit cache, global seed),
+    so a run behaves the same no matter which runs the process executed before.
+    """
+    for ids in used_ids.values():
+        ids.clear()
+    curve_fitting._fit_cache.clear()
+    np.random.seed(fixed.seed)
+    return run_once(days, n_skus, split_centre, fixed)
+
+def _init_worker(cpu_queue, warmup):
+    if cpu_queue is not None:
+        os.sched_setaffinity(0, {cpu_queue.get()})
+    if warmup is not None:
+        run_isolated(*warmup)
+
+def _print_config_means(rows, repeats):
+    for i in range(0, len(rows), repeats):
+        r = rows[i]
+        print(f"[{r['days']}d, {r['n_skus']} SKUs, split={r['split_centre']}] "
+              f"-> {st.mean(row['run_time'] for row in rows[i:i + repeats]):.3f}s avg over {repeats} runs")
+
 def run_grid(days_list: Iterable[int], skus_list: Iterable[int], split_list: Iterable[float],
-             repeats: int, fixed: FixedParams, on_progress=None) -> pd.DataFrame:
-    rows = []
-    total_runs = len(days_list) * len(skus_list) * len(split_list) * repeats
-    run_count = 0
-    _ = run_once(days_list[0], skus_list[0], split_list[0], fixed)  # warmup
+             repeats: int, fixed: FixedParams, on_progress=None, workers: int = 1,
+             pin_cpus: bool = False) -> pd.DataFrame:
+    """
+    Runs every (days, n_skus, split_centre, repeat) combination.
+    With workers > 1 the runs are spread over a process pool, optionally pinning each worker to its own CPU
+    to reduce timing noise. Rows are returned in grid order regardless of completion order.
+    """
+    tasks = [(days, n_skus, split_centre, r)
+             for days, n_skus, split_centre in itertools.product(days_list, skus_list, split_list)
+             for r in range(repeats)]
+    total_runs = len(tasks)
+    warmup = (days_list[0], skus_list[0], split_list[0], fixed)
 
-    for days, n_skus, split_centre in itertools.product(days_list, skus_list, split_list):
-        reps = []
-        for r in range(repeats):
-            res = run_once(days, n_skus, split_centre, fixed)
+    if workers <= 1:
+        rows = []
+        _ = run_isolated(*warmup)  # warmup
+        for days, n_skus, split_centre, r in tasks:
+            res = run_isolated(days, n_skus, split_centre, fixed)
             res["repeat"] = r
             rows.append(res)
-            reps.append(res["run_time"])
+
+            if on_progress is not None:
+                on_progress((str(len(rows)), str(total_runs)))
+        _print_config_means(rows, repeats)
+        return pd.DataFrame(rows)
+
+    cpu_queue = None
+    ctx = multiprocessing.get_context()
+    if pin_cpus and hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+        cpu_queue = ctx.Queue()
+        for i in range(workers):
+            cpu_queue.put(cpus[i % len(cpus)])
+
+    rows = [None] * total_runs
+    run_count = 0
+    # every worker warms up once in its initializer
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(cpu_queue, warmup)) as executor:
+        futures = {executor.submit(run_isolated, days, n_skus, split_centre, fixed): (i, r)
+                   for i, (days, n_skus, split_centre, r) in enumerate(tasks)}
+        for future in as_completed(futures):
+            i, r = futures[future]
+            res = future.result()
+            res["repeat"] = r
+            rows[i] = res
             run_count += 1
 
             if on_progress is not None:
                 on_progress((str(run_count), str(total_runs)))
-        print(f"[{days}d, {n_skus} SKUs, split={split_centre}] "
-              f"-> {st.mean(reps):.3f}s avg over {repeats} runs")
-        
-    
+
+    _print_config_means(rows, repeats)
     return pd.DataFrame(rows)
 
 def summarize(df: pd.DataFrame) -> pd.DataFrame:
     g = df.groupby(["days", "n_skus", "split_centre"])
     out = g["run_time"].agg(["count", "mean", "std"]).reset_index()
-    out["ci95"] = out.apply(
-        lambda r: 1.96 * (r["std"] / (r["count"] ** 0.5)) if r["count"] > 1 and r["std"] == r["std"] else 0.0,
-        axis=1
-    )
+    out["ci95"] = [ci95(std, count) for std, count in zip(out["std"], out["count"])]
+    # mean of the output size and the optional memory, per phase timing and counter columns
+    extra_cols = [c for c in df.columns if c not in ("days", "n_skus", "split_centre", "run_time", "repeat")]
+    if extra_cols:
+        out = out.merge(g[extra_cols].mean().reset_index(), on=["days", "n_skus", "split_centre"])
     return out
 
-def main():
+def phase_breakdown(summary: pd.DataFrame) -> pd.DataFrame:
+    """Long format (config, phase, seconds) of the phase columns of a summary, for stacked charts."""
+    phase_cols = [c for c in summary.columns if c.startswith("phase_")]
+    long = summary.melt(id_vars=["days", "n_skus", "split_centre"], value_vars=phase_cols,
+                        var_name="phase", value_name="seconds")
+    long["phase"] = long["phase"].str.removeprefix("phase_")
+    long["config"] = long.apply(lambda r: f"{r['days']}d/{r['n_skus']} SKUs/split {r['split_centre']}", axis=1)
+    return long
+
+def run(history_path=HISTORY_PATH, workers=1, pin_cpus=False):
+    """Runs the grid sequentially by default, workers > 1 (0 for one per CPU) spreads it over a process pool."""
     days_list = [250, 500, 1000, 2000]
     skus_list = [1, 5, 10, 20]
     split_list = [0, 1, 2, 5]  
@@ -165,13 +312,78 @@ def main():
 
     fixed = FixedParams(seed=1, delivery_func_name="constant", split_std=1.0, verbose=False, write_output=False)
 
-    df = run_grid(days_list, skus_list, split_list, repeats, fixed)
+    workers = workers or os.cpu_count() or 1
+    df = run_grid(days_list, skus_list, split_list, repeats, fixed, workers=workers, pin_cpus=pin_cpus)
     df.to_csv("benchmark_runs_raw.csv", index=False)
     summary = summarize(df)
     summary.to_csv("benchmark_runs_summary.csv", index=False)
+    revision = append_history(df, fixed, history_path, workers=workers, pin_cpus=pin_cpus)
+    print(f"Appended {len(df)} runs of revision {revision} to {history_path}")
 
     print("\n=== Pivot (mean runtime in seconds) ===")
     print(summary.pivot_table(index=["days"], columns=["n_skus"], values="mean").round(3))
 
+    print("\n=== Scaling (mean = runtime) ===")
+    print(scaling_report(summary).round(3).to_string(index=False))
+
+def predict(days, n_skus, split_centre, summary_path="benchmark_runs_summary.csv"):
+    """Extrapolates runtime and output size of a config from the last benchmark summary."""
+    summary = pd.read_csv(summary_path)
+    prediction = predict_configs(summary, [{"days": days, "n_skus": n_skus, "split_centre": split_centre}]).iloc[0]
+    print(f"[{days}d, {n_skus} SKUs, split={split_centre}] -> ~{prediction['predicted_mean']:.1f}s"
+          + (f", ~{prediction['predicted_output_mb']:.1f}MB output" if "predicted_output_mb" in prediction else ""))
+    return prediction
+
+def compare(baseline, candidate, history_path=HISTORY_PATH, metric="run_time", same_machine=True) -> bool:
+    """Prints the comparison of two revisions of the history, returns True if any grid cell regressed."""
+    history = load_history(history_path)
+    machine = None
+    if same_machine:
+        # compare on the machine the candidate was measured on
+        machine = candidate_machine(history, candidate)
+    result = compare_revisions(history, baseline, candidate, metric=metric, machine=machine)
+    if result.empty:
+        print(f"No common grid cells for {baseline} and {candidate} in {history_path}")
+        return False
+
+    cols = ["days", "n_skus", "split_centre", "config", "count_baseline", "count_candidate", "mean_baseline", "ci95_baseline", "mean_candidate", "ci95_candidate", "change"]
+    with pd.option_context("display.width", 200, "display.max_rows", None):
+        print(result[cols].round(4).to_string(index=False))
+    regressions = result[result["regression"]]
+    print(f"\n{len(regressions)} regression(s), {int(result['improvement'].sum())} improvement(s) "
+          f"out of {len(result)} grid cells ({metric}, {baseline} -> {candidate})")
+    return not regressions.empty
+
+def main():
+    parser = argparse.ArgumentParser(description="FrOG scalability benchmark")
+    parser.add_argument("--history", default=HISTORY_PATH, help="append-only benchmark history (JSON lines)")
+    sub = parser.add_subparsers(dest="command")
+    grid = sub.add_parser("run", help="run the benchmark grid and append it to the history (default)")
+    grid.add_argument("--workers", type=int, default=1,
+                      help="processes running the grid, 0 for one per CPU (default 1, concurrent runs share caches and memory bandwidth)")
+    grid.add_argument("--pin-cpus", action="store_true", help="pin each worker process to its own CPU")
+    cmp = sub.add_parser("compare", help="flag significant regressions of a revision against a baseline")
+    cmp.add_argument("--baseline", required=True)
+    cmp.add_argument("--candidate", required=True)
+    cmp.add_argument("--metric", default="run_time")
+    cmp.add_argument("--all-machines", action="store_true", help="compare on every machine, not only the candidate's")
+    pred = sub.add_parser("predict", help="extrapolate runtime and output size from benchmark_runs_summary.csv")
+    pred.add_argument("--days", type=int, required=True)
+    pred.add_argument("--skus", type=int, required=True)
+    pred.add_argument("--split", type=float, default=0)
+    pred.add_argument("--summary", default="benchmark_runs_summary.csv")
+    args = parser.parse_args()
+
+    if args.command == "predict":
+        predict(args.days, args.skus, args.split, args.summary)
+        return
+    if args.command == "compare":
+        regressed = compare(args.baseline, args.candidate, args.history, args.metric, not args.all_machines)
+        sys.exit(1 if regressed else 0)
+    if args.command == "run":
+        run(args.history, args.workers, args.pin_cpus)
+    else:
+        run(args.history)
+
 if __name__ == "__main__":
     main()
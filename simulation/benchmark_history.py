@@ -0,0 +1,110 @@
+# benchmark_history.py
+import hashlib, json, os, platform, subprocess
+from dataclasses import asdict
+from datetime import datetime
+from typing import Dict, Optional
+
+import pandas as pd
+
+HISTORY_PATH = "benchmark_history.jsonl"
+GRID_KEYS = ["days", "n_skus", "split_centre"]
+# only runs of the same machine and config are comparable
+COMPARE_KEYS = GRID_KEYS + ["machine", "config"]
+
+def ci95(std, count):
+    """Half width of the normal approximation 95% confidence interval of a mean."""
+    return 1.96 * (std / (count ** 0.5)) if count > 1 and std == std else 0.0
+
+def git_revision(path: str = ".") -> str:
+    """Short HEAD revision of the repository, suffixed with -dirty if tracked files are modified."""
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=path, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=path,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return f"{rev}-dirty" if dirty else rev
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def machine_info() -> Dict:
+    return {
+        "system": platform.system(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+def _short_hash(data: Dict) -> str:
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()[:10]
+
+def machine_fingerprint() -> str:
+    return _short_hash(machine_info())
+
+def config_fingerprint(fixed, workers=1, pin_cpus=False) -> str:
+    data = asdict(fixed)
+    # parallel runs share the machine and time differently, sequential runs keep their earlier fingerprint
+    if workers > 1:
+        data.update(workers=workers, pin_cpus=bool(pin_cpus))
+    return _short_hash(data)
+
+def append_history(df: pd.DataFrame, fixed, path: str = HISTORY_PATH, revision: Optional[str] = None,
+                   workers: int = 1, pin_cpus: bool = False) -> str:
+    """
+    Appends the raw rows of a benchmark run to the JSON lines history, keyed by git revision,
+    machine fingerprint and config fingerprint (FixedParams and the parallelism of run_grid).
+    Existing entries are never rewritten.
+    """
+    revision = revision or git_revision(os.path.dirname(os.path.abspath(__file__)))
+    meta = {
+        "revision": revision,
+        "machine": machine_fingerprint(),
+        "config": config_fingerprint(fixed, workers, pin_cpus),
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    with open(path, "a") as f:
+        for row in df.to_dict("records"):
+            f.write(json.dumps({**meta, **row}, default=float) + "\n")
+    return revision
+
+def load_history(path: str = HISTORY_PATH) -> pd.DataFrame:
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=["revision", "machine", "config", "recorded_at"] + GRID_KEYS + ["run_time"])
+    return pd.read_json(path, lines=True, dtype={"revision": str, "machine": str, "config": str})
+
+def revisions(history: pd.DataFrame) -> list:
+    """Revisions in the order they were first recorded."""
+    return history.sort_values("recorded_at")["revision"].drop_duplicates().tolist()
+
+def candidate_machine(history: pd.DataFrame, revision: str) -> Optional[str]:
+    """Machine fingerprint of the latest runs of a revision, None if it has none."""
+    rows = history[history["revision"] == revision]
+    return rows.sort_values("recorded_at")["machine"].iloc[-1] if len(rows) else None
+
+def summarize_revision(history: pd.DataFrame, revision: str, metric: str = "run_time", keys=GRID_KEYS) -> pd.DataFrame:
+    rows = history[history["revision"] == revision]
+    out = rows.groupby(keys)[metric].agg(["count", "mean", "std"]).reset_index()
+    out["ci95"] = [ci95(std, count) for std, count in zip(out["std"], out["count"])]
+    return out
+
+def compare_revisions(history: pd.DataFrame, baseline: str, candidate: str, metric: str = "run_time",
+                      machine: Optional[str] = None, config: Optional[str] = None, min_count: int = 2) -> pd.DataFrame:
+    """
+    Compares the per grid cell means of two revisions, cell by cell of the same machine and config
+    fingerprint, so runs of different configs (e.g. with memory tracking) are never pooled. A cell is
+    flagged as regression (or improvement) when the 95% confidence intervals of both means do not overlap
+    and both revisions have at least min_count runs of it, a single run has no interval.
+    machine/config restrict the comparison to runs with that fingerprint.
+    """
+    if machine is not None:
+        history = history[history["machine"] == machine]
+    if config is not None:
+        history = history[history["config"] == config]
+    base = summarize_revision(history, baseline, metric, COMPARE_KEYS)
+    cand = summarize_revision(history, candidate, metric, COMPARE_KEYS)
+    out = base.merge(cand, on=COMPARE_KEYS, suffixes=("_baseline", "_candidate"))
+    out["change"] = (out["mean_candidate"] - out["mean_baseline"]) / out["mean_baseline"]
+    repeated = (out["count_baseline"] >= min_count) & (out["count_candidate"] >= min_count)
+    out["regression"] = repeated & (out["mean_candidate"] - out["ci95_candidate"] > out["mean_baseline"] + out["ci95_baseline"])
+    out["improvement"] = repeated & (out["mean_candidate"] + out["ci95_candidate"] < out["mean_baseline"] - out["ci95_baseline"])
+    return out
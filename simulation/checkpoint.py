@@ -0,0 +1,114 @@
+import gzip
+import importlib
+import os
+import pickle
+import shutil
+import types
+
+import numpy as np
+
+from . import OCEL_FormatGenerator, ocel_records
+
+CHECKPOINT_VERSION = 1
+# subdirectories of a run with the CSV logs written next to each order file
+CSV_DIRECTORIES = ["div_items", "div_order", "conv"]
+
+# id(function) -> (module, mapping name, key) of functions that can be pickled by reference
+_named_functions = {}
+
+def register_functions(module_name, mapping_name, mapping):
+    """
+    Registers a module level dict of (lambda) functions, e.g. the delivery functions of the UI,
+    so checkpoints can store them by name instead of by code.
+    """
+    for key, func in mapping.items():
+        _named_functions[id(func)] = (module_name, mapping_name, key)
+
+def _resolve_function(module_name, mapping_name, key):
+    return getattr(importlib.import_module(module_name), mapping_name)[key]
+
+
+class _CheckpointPickler(pickle.Pickler):
+    def reducer_override(self, obj):
+        if isinstance(obj, types.FunctionType) and id(obj) in _named_functions:
+            return _resolve_function, _named_functions[id(obj)]
+        return NotImplemented
+
+
+def save_checkpoint(simulation, path):
+    """
+    Serializes the full simulation state (warehouse, open orders, shipment schedule, histories,
+    RNG state and ID counters) to a gzip compressed pickle.
+    """
+    state = {
+        "version": CHECKPOINT_VERSION,
+        "simulation": simulation,
+        "np_random_state": np.random.get_state(),
+        "used_ids": OCEL_FormatGenerator.used_ids,
+        "vocabularies": {
+            "activities": ocel_records.ACTIVITIES,
+            "qualifiers": ocel_records.QUALIFIERS,
+            "resources": ocel_records.RESOURCES,
+            "object_types": ocel_records.OBJECT_TYPES,
+            "attribute_names": ocel_records.ATTRIBUTE_NAMES,
+        },
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with gzip.open(path, "wb", compresslevel=6) as f:
+        try:
+            _CheckpointPickler(f, protocol=pickle.HIGHEST_PROTOCOL).dump(state)
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            raise ValueError(f"Simulation state cannot be checkpointed, register lambdas (e.g. delivery functions) with register_functions: {e}")
+    return path
+
+def _fork_output(simulation, output):
+    """
+    Copies the order files (and their CSV logs) written before the checkpoint into the fork's directory, so its
+    stats and relation index describe the files in it. Files the original run no longer has are dropped from both.
+    """
+    source = simulation.output
+    os.makedirs(output, exist_ok=True)
+    for filename in list(simulation.ocel_stats.files):
+        if os.path.exists(os.path.join(source, filename)):
+            shutil.copy2(os.path.join(source, filename), os.path.join(output, filename))
+            # the CSV logs are named after the order's start time, e.g. OrderProcess_2024-01-01 08:00:00_conv.csv
+            prefix = os.path.splitext(filename)[0]
+            for directory in CSV_DIRECTORIES:
+                if not os.path.isdir(os.path.join(source, directory)):
+                    continue
+                for name in os.listdir(os.path.join(source, directory)):
+                    if name.startswith(prefix + " ") or name.startswith(prefix + "_"):
+                        os.makedirs(os.path.join(output, directory), exist_ok=True)
+                        shutil.copy2(os.path.join(source, directory, name), os.path.join(output, directory, name))
+        else:
+            del simulation.ocel_stats.files[filename]
+            simulation.relation_index.files.pop(filename, None)
+    simulation.output = output
+
+def load_checkpoint(path, output=None):
+    """
+    Restores a simulation saved with save_checkpoint, including the global RNG and ID state.
+    Passing output forks the run into a new output directory, which starts with a copy of the order files
+    written before the checkpoint; otherwise it continues in the original one.
+    """
+    with gzip.open(path, "rb") as f:
+        state = pickle.load(f)
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {state.get('version')}")
+
+    np.random.set_state(state["np_random_state"])
+    for obj_type, ids in state["used_ids"].items():
+        OCEL_FormatGenerator.used_ids.setdefault(obj_type, set()).clear()
+        OCEL_FormatGenerator.used_ids[obj_type].update(ids)
+    for name, vocabulary in state["vocabularies"].items():
+        target = getattr(ocel_records, name.upper())
+        target.codes = vocabulary.codes
+        target.values = vocabulary.values
+
+    simulation = state["simulation"]
+    if output is not None and os.path.abspath(output) != os.path.abspath(simulation.output):
+        _fork_output(simulation, output)
+    os.makedirs(simulation.output, exist_ok=True)
+    return simulation
@@ -1,3 +1,9 @@
+import atexit
+import math
+import multiprocessing
+import queue
+import time
+from collections import OrderedDict
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.stats import (
@@ -6,6 +12,7 @@ from scipy.stats import (
 from scipy.optimize import curve_fit
 from sklearn.metrics import r2_score, mean_squared_error
 from scipy.integrate import quad
+from scipy.special import ndtr, stdtr, betainc, gammainc, gammaincc, gammaln, exp1
 
 # def gaussian_model(x, amplitude, mean, std_dev): return amplitude * norm.pdf(x, loc=mean, scale=std_dev)
 # def gamma_model(x, amplitude, a, loc, scale): return amplitude * gamma.pdf(x, a, loc=loc, scale=scale)
@@ -41,42 +48,207 @@ def get_model(dist, num_shapes):
         return amplitude * dist.pdf(x, *shape_params, loc=loc, scale=scale)
     return model
 
-def fit_distribution(x,y):
-    results = {}
-    best_model = None
-    best_r2 = -np.inf
+def fit_candidate(name, x, y, p0, maxfev):
+    """
+    Fits a single candidate distribution, module level so it can be shipped to worker processes.
+    """
+    dist, num_shapes = distributions[name]
+    model = get_model(dist, num_shapes)
+    params, _ = curve_fit(model, x, y, p0=p0, maxfev=maxfev)
+    y_pred = model(x, *params)
+    return params, r2_score(y, y_pred), mean_squared_error(y, y_pred)
+
+def r2_upper_bound(x, y):
+    """
+    Highest R² any curve of x reaches on (x, y). Shipments on the same day with different quantities leave an error
+    no candidate can remove (the spread of y around its mean per distinct x), so no fit can beat 1 - that / total.
+    """
+    total = np.sum((y - y.mean()) ** 2)
+    if total == 0:
+        return 1.0
+    _, groups = np.unique(x, return_inverse=True)
+    group_means = np.bincount(groups, weights=y) / np.bincount(groups)
+    return 1.0 - np.sum((y - group_means[groups]) ** 2) / total
+
+
+# Memoized fits keyed on the (dates, quantities) tuple, shared by all fitters
+_fit_cache = OrderedDict()
+_pools = {}
+
+def _get_pool(workers):
+    if workers not in _pools:
+        _pools[workers] = multiprocessing.Pool(processes=workers)
+    return _pools[workers]
+
+def _terminate_pool(workers):
+    """Kills the pool of fits that ran over their time budget, the next concurrent fit starts a new one."""
+    pool = _pools.pop(workers, None)
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+
+@atexit.register
+def _shutdown_pools():
+    while _pools:
+        _terminate_pool(next(iter(_pools)))
+
+
+class DistributionFitter:
+    """
+    Fits the candidate distributions of one SKU and returns the truncated mean of the best fit.
 
-    for name, (dist, num_shapes) in distributions.items():
-        try:
-            model = get_model(dist, num_shapes)
-            p0 = [1.0] + [1.5] * num_shapes + [0.0, 1.0]  # initial guess
+    workers: number of processes fitting candidates concurrently (1 fits sequentially)
+    maxfev: iteration budget per candidate passed to curve_fit
+    time_budget: seconds after which no further candidates are started/awaited (None for no limit),
+                 concurrent fits still running then are stopped
+    r2_tolerance: remaining candidates are skipped once the best R² is within this of r2_upper_bound, the ceiling
+                  no candidate can exceed, so a skipped one could have improved R² by less than r2_tolerance
+                  (0 skips only when a fit reaches the ceiling)
+    cache_size: maximum number of memoized (dates, quantities) fits
+    """
+    def __init__(self, workers=1, maxfev=2000, time_budget=None, r2_tolerance=1e-4, cache_size=4096):
+        self.workers = workers
+        self.maxfev = maxfev
+        self.time_budget = time_budget
+        self.r2_tolerance = r2_tolerance
+        self.cache_size = cache_size
+        # Parameters of the previous order's fits, used as initial guess for the next order
+        self.warm_starts = {}
+        self.last_best = None
 
-            params, _ = curve_fit(model, x, y, p0=p0, maxfev=1000000)
-            y_pred = model(x, *params)
+    def initial_guess(self, name):
+        if name in self.warm_starts:
+            return list(self.warm_starts[name])
+        _, num_shapes = distributions[name]
+        return [1.0] + [1.5] * num_shapes + [0.0, 1.0]
 
-            r2 = r2_score(y, y_pred)
-            rmse = mean_squared_error(y, y_pred)
+    def candidates(self, n_points):
+        # Previous best first, so a good fit can prune the others early
+        names = list(distributions.keys())
+        if self.last_best in names:
+            names.remove(self.last_best)
+            names.insert(0, self.last_best)
+        # curve_fit cannot fit more parameters than data points
+        return [name for name in names if distributions[name][1] + 3 <= n_points]
 
-            results[name] = {
-                "R²": r2,
-                "RMSE": rmse,
-                "Params": params
-            }
+    def fit(self, x, y):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        names = self.candidates(len(x))
+        unbeatable = r2_upper_bound(x, y) - self.r2_tolerance
+        if self.workers > 1 and len(names) > 1:
+            results = self._fit_concurrent(names, x, y, unbeatable)
+        else:
+            results = self._fit_sequential(names, x, y, unbeatable)
 
+        best_model = None
+        best_r2 = -np.inf
+        for name, (params, r2, rmse) in results.items():
+            self.warm_starts[name] = params
             if r2 > best_r2:
                 best_r2 = r2
                 best_model = (name, params)
+        if best_model is not None:
+            self.last_best = best_model[0]
+        return best_model
 
-        except Exception as e:
-            results[name] = {"Error": str(e)}
+    def _fit_sequential(self, names, x, y, unbeatable):
+        results = {}
+        start = time.perf_counter()
+        best_r2 = -np.inf
+        for name in names:
+            if best_r2 >= unbeatable:
+                break
+            if self.time_budget is not None and time.perf_counter() - start > self.time_budget:
+                break
+            try:
+                results[name] = fit_candidate(name, x, y, self.initial_guess(name), self.maxfev)
+            except Exception:
+                continue
+            best_r2 = max(best_r2, results[name][1])
+        return results
 
-    # Print results
-    # for name, res in results.items():
-    #     print(f"{name}: R² = {res['R²']:.4f}, RMSE = {res['RMSE']:.4f}")
+    def _fit_concurrent(self, names, x, y, unbeatable):
+        results = {}
+        best_r2 = -np.inf
+        pool = _get_pool(self.workers)
+        done = queue.SimpleQueue()
+        deadline = None if self.time_budget is None else time.perf_counter() + self.time_budget
+        pending = list(names)
+
+        def submit():
+            name = pending.pop(0)
+            pool.apply_async(fit_candidate, (name, x, y, self.initial_guess(name), self.maxfev),
+                             callback=lambda result: done.put((name, result)),
+                             error_callback=lambda error: done.put((name, None)))
+
+        # at most one candidate per worker in flight, so stopping early leaves nothing queued in the pool
+        running = min(self.workers, len(pending))
+        for _ in range(running):
+            submit()
+        while running:
+            timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            try:
+                name, result = done.get(timeout=timeout)
+            except queue.Empty:
+                # over the time budget, the fits still running are killed with their pool
+                _terminate_pool(self.workers)
+                break
+            running -= 1
+            if result is not None:
+                results[name] = result
+                best_r2 = max(best_r2, result[1])
+            if best_r2 >= unbeatable:
+                break
+            if pending and (deadline is None or time.perf_counter() < deadline):
+                submit()
+                running += 1
+        return results
+
+    def expected_value(self, x, y):
+        key = (tuple(x), tuple(y))
+        if key in _fit_cache:
+            _fit_cache.move_to_end(key)
+            return _fit_cache[key]
+
+        best_model = self.fit(x, y)
+        if best_model is None:
+            # Too few shipments or no candidate converged: quantity weighted mean delivery day
+            value = float(np.average(x, weights=y))
+        else:
+            value = truncated_mean(best_model[0], best_model[1], np.min(x), np.max(x))
+
+        _fit_cache[key] = value
+        if len(_fit_cache) > self.cache_size:
+            _fit_cache.popitem(last=False)
+        return value
+
+
+_default_fitter = DistributionFitter()
+
+def weighted_delay_moments(delays, quantities, trim=0.0):
+    """
+    Quantity weighted mean and standard deviation of shipment delays, a cheap alternative to fit_distribution.
+    With trim > 0 that share of the delivered quantity is cut from each tail before computing the moments.
+    """
+    delays = np.asarray(delays, dtype=float)
+    weights = np.asarray(quantities, dtype=float)
+    if trim > 0:
+        order = np.argsort(delays, kind="stable")
+        delays = delays[order]
+        weights = weights[order]
+        total = weights.sum()
+        upper = np.cumsum(weights)
+        lower = upper - weights
+        # quantity of each shipment that lies inside [trim, 1 - trim] of the cumulative delivered quantity
+        weights = np.clip(np.minimum(upper, (1 - trim) * total) - np.maximum(lower, trim * total), 0, None)
+    mean = np.average(delays, weights=weights)
+    std = np.sqrt(np.average((delays - mean) ** 2, weights=weights))
+    return float(mean), float(std)
+
+def fit_distribution(x, y, fitter=None):
+    return (fitter or _default_fitter).expected_value(x, y)
 
-    # Best model selection
-    return expected_value_over_range_cdf(best_model[0], best_model[1], np.min(x), np.max(x))
-    
 def get_expected_value(dist_name, params):
     dist_obj, num_shape_params = distributions[dist_name]
     shape_params = params[1 : 1 + num_shape_params]
@@ -131,4 +303,106 @@ def expected_value_over_range_cdf(dist_name, params, x_min, x_max):
     # Numerator: ∫ x f(x) dx from x_min to x_max
     numerator, _ = quad(x_pdf, x_min, x_max)
 
-    return numerator / denominator
\ No newline at end of file
+    return numerator / denominator
+
+
+# Closed forms of the standardized distributions (loc=0, scale=1).
+# Each entry returns (F(z), M(z)) where F is the CDF and M an antiderivative of z * f(z),
+# so that E[Z | za <= Z <= zb] = (M(zb) - M(za)) / (F(zb) - F(za)).
+# Returning None signals that no closed form exists for the given shape parameters.
+
+def _norm_moments(z):
+    return ndtr(z), -math.exp(-0.5 * z * z) / math.sqrt(2 * math.pi)
+
+def _laplace_moments(z):
+    if z < 0:
+        e = math.exp(z)
+        return 0.5 * e, 0.5 * e * (z - 1)
+    e = math.exp(-z)
+    return 1 - 0.5 * e, -0.5 * e * (z + 1)
+
+def _uniform_moments(z):
+    z = min(max(z, 0.0), 1.0)
+    return z, 0.5 * z * z
+
+def _gumbel_moments(z):
+    u = math.exp(-z) if z > -700 else math.inf
+    cdf = math.exp(-u)
+    return cdf, z * cdf - exp1(u)
+
+def _cauchy_moments(z):
+    return 0.5 + math.atan(z) / math.pi, math.log1p(z * z) / (2 * math.pi)
+
+def _t_moments(z, df):
+    if df <= 0:
+        return None
+    if abs(df - 1) < 1e-9:
+        return _cauchy_moments(z)
+    if df > 1e7:
+        return _norm_moments(z)
+    pdf = math.exp(gammaln((df + 1) / 2) - gammaln(df / 2)) / math.sqrt(df * math.pi) * (1 + z * z / df) ** (-(df + 1) / 2)
+    return stdtr(df, z), -(df + z * z) / (df - 1) * pdf
+
+def _beta_moments(z, a, b):
+    if a <= 0 or b <= 0:
+        return None
+    z = min(max(z, 0.0), 1.0)
+    return betainc(a, b, z), a / (a + b) * betainc(a + 1, b, z)
+
+def _gengamma_moments(z, a, c):
+    if a <= 0 or c == 0 or a + 1 / c <= 0:
+        return None
+    ratio = math.exp(gammaln(a + 1 / c) - gammaln(a))
+    if z <= 0:
+        return 0.0, 0.0
+    zc = z ** c
+    if c > 0:
+        return gammainc(a, zc), ratio * gammainc(a + 1 / c, zc)
+    return gammaincc(a, zc), ratio * gammaincc(a + 1 / c, zc)
+
+standardized_moments = {
+    "Generalized Gamma": _gengamma_moments,
+    "Normal": _norm_moments,
+    "Laplace": _laplace_moments,
+    "Student t": _t_moments,
+    "Cauchy": _cauchy_moments,
+    "Beta": _beta_moments,
+    "Uniform": _uniform_moments,
+    "Gumbel": _gumbel_moments
+}
+
+symmetric_distributions = {"Normal", "Laplace", "Student t", "Cauchy"}
+
+def truncated_mean(dist_name, params, x_min, x_max):
+    """
+    Closed-form E[X | X ∈ [x_min, x_max]] for the fitted distribution.
+    Falls back to numeric integration (expected_value_over_range_cdf) only where no closed form exists.
+    """
+    _, num_shape_params = distributions[dist_name]
+    shape_params = [float(p) for p in params[1 : 1 + num_shape_params]]
+    loc = float(params[1 + num_shape_params])
+    scale = float(params[2 + num_shape_params])
+    if not scale > 0:
+        return expected_value_over_range_cdf(dist_name, params, x_min, x_max)
+
+    moments = standardized_moments[dist_name]
+    z_min = (x_min - loc) / scale
+    z_max = (x_max - loc) / scale
+    # Mirror ranges in the upper tail of symmetric distributions, where 1 - F(z) would lose precision
+    sign = 1.0
+    if dist_name in symmetric_distributions and z_min > 0:
+        z_min, z_max, sign = -z_max, -z_min, -1.0
+
+    lower = moments(z_min, *shape_params)
+    upper = moments(z_max, *shape_params)
+    if lower is None or upper is None:
+        return expected_value_over_range_cdf(dist_name, params, x_min, x_max)
+
+    denominator = upper[0] - lower[0]
+    if denominator == 0:
+        return float('nan')
+    mean = loc + sign * scale * (upper[1] - lower[1]) / denominator
+    # A truncated mean always lies inside the range, anything else is cancellation in the closed form
+    if not x_min <= mean <= x_max:
+        return expected_value_over_range_cdf(dist_name, params, x_min, x_max)
+    return mean
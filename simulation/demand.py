@@ -0,0 +1,276 @@
+# demand.py
+import json, os
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+# days of demand fetched from a source at once
+BLOCK_DAYS = 365
+
+
+def _sku_id(value):
+    """SKU id of a column name or metadata entry, '3' and 3 are the same SKU."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+def _meta_path(path):
+    return f"{path}.json"
+
+def _npy_path(path):
+    """Replay files end with .npy, np.save would add it behind the caller's back."""
+    path = os.fspath(path)
+    return path if path.endswith(".npy") else f"{path}.npy"
+
+
+class DemandSource:
+    """
+    Daily demand of the SKUs of a run, produced in blocks of days. bind() is called with the SKUs of the warehouse
+    ({id: Warehouse_SKU}), the seed of the run and its number of days, block(start, n_days) then returns an (n_days x SKUs) matrix of the
+    days start..start+n_days of the run, columns in the order of the bound SKUs. A block may be shorter than requested,
+    never empty.
+    """
+    def bind(self, skus: Dict, seed=None, days=None):
+        self.sku_ids = list(skus)
+        return self
+
+    def block(self, start: int, n_days: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def mean_demand(self, days: int) -> np.ndarray:
+        """Mean daily demand of the bound SKUs over the first `days` days of the run, e.g. for the output estimate."""
+        total, start = np.zeros(len(self.sku_ids)), 0
+        while start < days:
+            demand = self.block(start, min(BLOCK_DAYS, days - start))
+            total += demand.sum(axis=0)
+            start += len(demand)
+        return total / max(days, 1)
+
+
+class ReplayDemand(DemandSource):
+    """
+    Replays a days x SKUs demand matrix from a .npy file (see save_replay, convert_csv), memory-mapped so only
+    the rows of the requested days are read. Day 0 of the run is row `offset`, with loop=True the history
+    repeats after its last day, otherwise running past it raises an IndexError.
+    """
+    def __init__(self, path, offset=0, loop=False):
+        self.path, self.offset, self.loop = path, offset, loop
+        self._open()
+
+    def _open(self):
+        self.data = np.load(self.path, mmap_mode="r")
+        if self.data.ndim != 2:
+            raise ValueError(f"replay demand {self.path} is not a days x SKUs matrix")
+        meta = read_replay_meta(self.path)
+        self.columns = [_sku_id(sku) for sku in meta.get("skus", range(self.data.shape[1]))]
+        self.start_date = meta.get("start_date")
+
+    def __len__(self):
+        return len(self.data)
+
+    def bind(self, skus, seed=None, days=None):
+        super().bind(skus)
+        # fail before the run instead of when it reaches the end of the history
+        if days is not None and not self.loop and len(self.data) - self.offset < days:
+            raise ValueError(f"replay demand {self.path} has {len(self.data) - self.offset} days from offset {self.offset}, "
+                             f"the run needs {days} (or loop=True)")
+        position = {sku: column for column, sku in enumerate(self.columns)}
+        missing = [sku for sku in self.sku_ids if _sku_id(sku) not in position]
+        if missing:
+            raise KeyError(f"SKUs {missing} have no demand in {self.path}")
+        self._columns = np.array([position[_sku_id(sku)] for sku in self.sku_ids], dtype=np.int64)
+        return self
+
+    def block(self, start, n_days):
+        first = start + self.offset
+        if self.loop:
+            rows = np.take(self.data, np.arange(first, first + n_days) % len(self.data), axis=0)
+        else:
+            if not 0 <= first < len(self.data):
+                raise IndexError(f"replay demand {self.path} has {len(self.data)} days, day {first} was requested")
+            rows = self.data[first:first + n_days]
+        return np.maximum(rows[:, self._columns], 0)
+
+    def __getstate__(self):
+        # checkpoints keep the path, the memory map is opened again when restored
+        state = self.__dict__.copy()
+        del state["data"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+
+class NormalDemand(DemandSource):
+    """
+    Normal daily demand drawn for all SKUs and a whole block of days in one call. mean and std default to the
+    mean_daily_demand and std_daily_demand of the SKUs and may be given as a number, a per SKU sequence or a
+    {sku id: value} dict. correlation (a number for all pairs of SKUs or a SKUs x SKUs matrix) correlates the SKUs
+    through the Cholesky factor of the matrix. Demand is truncated to whole non-negative units like the per SKU draws.
+    Draws come from the model's own generator (seeded with `seed`, or the seed of the run), independent of the
+    random numbers of the order process.
+    """
+    def __init__(self, mean=None, std=None, correlation=None, seed=None):
+        self.mean, self.std, self.correlation, self.seed = mean, std, correlation, seed
+
+    def _per_sku(self, value, skus, attribute):
+        if value is None:
+            return np.array([float(getattr(sku, attribute) or 0) for sku in skus.values()])
+        if isinstance(value, dict):
+            return np.array([float(value[sku]) for sku in skus])
+        return np.broadcast_to(np.asarray(value, dtype=float), (len(skus),)).copy()
+
+    def bind(self, skus, seed=None, days=None):
+        super().bind(skus)
+        self.rng = np.random.default_rng(self.seed if self.seed is not None else seed)
+        self.mean_ = self._per_sku(self.mean, skus, "mean_daily_demand")
+        self.std_ = self._per_sku(self.std, skus, "std_daily_demand")
+        self.cholesky = None
+        if self.correlation is not None and len(skus) > 1:
+            matrix = np.asarray(self.correlation, dtype=float)
+            if matrix.ndim == 0:
+                matrix = np.full((len(skus), len(skus)), float(matrix))
+                np.fill_diagonal(matrix, 1.0)
+            if matrix.shape != (len(skus), len(skus)):
+                raise ValueError(f"correlation matrix of shape {matrix.shape} for {len(skus)} SKUs")
+            try:
+                self.cholesky = np.linalg.cholesky(matrix)
+            except np.linalg.LinAlgError:
+                raise ValueError("correlation matrix is not positive definite")
+        return self
+
+    def standard_normal(self, n_days):
+        """(n_days x SKUs) standard normal draws, correlated across the SKUs if the model has a correlation."""
+        z = self.rng.standard_normal((n_days, len(self.sku_ids)))
+        return z if self.cholesky is None else z @ self.cholesky.T
+
+    def level(self, days):
+        """Expected demand (days x SKUs) of the given days of the run."""
+        return np.broadcast_to(self.mean_, (len(days), len(self.mean_)))
+
+    def mean_demand(self, days):
+        # the expected level, drawing blocks would advance the generator of the run
+        total = np.zeros(len(self.sku_ids))
+        for start in range(0, days, BLOCK_DAYS):
+            total += self.level(np.arange(start, min(start + BLOCK_DAYS, days))).sum(axis=0)
+        return total / max(days, 1)
+
+    def block(self, start, n_days):
+        days = np.arange(start, start + n_days)
+        return self._units(self.level(days) + self.std_ * self.standard_normal(n_days))
+
+    @staticmethod
+    def _units(demand):
+        return np.floor(np.maximum(demand, 0)).astype(np.int64)
+
+
+class TrendDemand(NormalDemand):
+    """Normal demand around a mean that grows by `growth` (a fraction of the mean) per year of the run."""
+    def __init__(self, growth=0.1, **kwargs):
+        super().__init__(**kwargs)
+        self.growth = growth
+
+    def level(self, days):
+        return np.outer(1 + self.growth * days / 365, self.mean_)
+
+
+class SeasonalDemand(TrendDemand):
+    """
+    Normal demand around a mean scaled by 1 + amplitude * sin(2 pi (day + phase) / period), optionally with a trend.
+    period and phase are days, e.g. period=7 for a weekly pattern.
+    """
+    def __init__(self, amplitude=0.2, period=365, phase=0, growth=0.0, **kwargs):
+        super().__init__(growth=growth, **kwargs)
+        self.amplitude, self.period, self.phase = amplitude, period, phase
+
+    def level(self, days):
+        season = 1 + self.amplitude * np.sin(2 * np.pi * (days + self.phase) / self.period)
+        return super().level(days) * season[:, None]
+
+
+class CrostonDemand(NormalDemand):
+    """
+    Intermittent demand as in Croston's model: demand occurs on a day with probability 1 / interval, its size is
+    normal with the demand of `interval` days, N(mean * interval, std * sqrt(interval)), so the mean daily demand is kept.
+    With a correlation the occurrences of the SKUs are correlated (Gaussian copula), the sizes are independent.
+    """
+    def __init__(self, interval=4, **kwargs):
+        super().__init__(**kwargs)
+        self.interval = interval
+
+    def bind(self, skus, seed=None, days=None):
+        super().bind(skus, seed)
+        self.interval_ = np.maximum(self._per_sku(self.interval, skus, None), 1)
+        return self
+
+    def block(self, start, n_days):
+        occurs = norm.cdf(self.standard_normal(n_days)) < 1 / self.interval_
+        sizes = self.mean_ * self.interval_ + self.std_ * np.sqrt(self.interval_) * self.rng.standard_normal((n_days, len(self.sku_ids)))
+        return self._units(np.where(occurs, sizes, 0))
+
+
+# demand models by name, e.g. for the UI; None keeps the per SKU normal draws of the simulation
+DEMAND_MODELS = {
+    "normal": NormalDemand,
+    "trend": TrendDemand,
+    "seasonal": SeasonalDemand,
+    "intermittent": CrostonDemand,
+}
+
+def make_demand(name, **params) -> Optional[DemandSource]:
+    if not name:
+        return None
+    if name not in DEMAND_MODELS:
+        raise ValueError(f"unknown demand model {name!r}, expected one of {list(DEMAND_MODELS)}")
+    return DEMAND_MODELS[name](**params)
+
+
+def read_replay_meta(path) -> Dict:
+    """SKU ids of the columns and start date written next to a replay file, empty if there are none."""
+    if not os.path.exists(_meta_path(path)):
+        return {}
+    with open(_meta_path(path)) as f:
+        return json.load(f)
+
+def _write_meta(path, skus, start_date, **extra):
+    meta = {"skus": [_sku_id(sku) for sku in skus], **extra}
+    if start_date is not None:
+        meta["start_date"] = str(pd.Timestamp(start_date).date())
+    with open(_meta_path(path), "w") as f:
+        json.dump(meta, f)
+
+def save_replay(path, demand, skus: Optional[Sequence] = None, start_date=None, **extra):
+    """Writes a days x SKUs demand matrix as a replay file, with the SKU id of every column and the date of the first row."""
+    path = _npy_path(path)
+    demand = np.asarray(demand)
+    np.save(path, demand)
+    _write_meta(path, range(demand.shape[1]) if skus is None else skus, start_date, **extra)
+    return path
+
+def convert_csv(csv_path, path, date_column=0, dtype="float32", chunksize=100_000):
+    """
+    Converts a wide CSV of daily demand (a date column and one column per SKU id, one row per day) into a replay file,
+    chunk by chunk into a memory-mapped .npy, so the CSV never has to fit into memory. Missing values are no demand.
+    """
+    path = _npy_path(path)
+    header = pd.read_csv(csv_path, nrows=0).columns
+    date_name = header[date_column] if date_column is not None else None
+    skus = [column for column in header if column != date_name]
+    with open(csv_path, "rb") as f:
+        n_days = sum(1 for line in f if line.strip()) - 1
+
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(n_days, len(skus)))
+    start_date, row = None, 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        if start_date is None and date_name is not None and len(chunk):
+            start_date = chunk[date_name].iloc[0]
+        out[row:row + len(chunk)] = chunk[skus].fillna(0).to_numpy(dtype=dtype)
+        row += len(chunk)
+    out.flush()
+    del out
+    _write_meta(path, skus, start_date)
+    return path
@@ -0,0 +1,133 @@
+# dfg.py
+import glob, os
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+# flat logs written by the generator, one CSV per order in <output>/<kind>
+FLAT_LOGS = ("div_items", "div_order", "conv")
+
+
+class EventArrays:
+    """
+    Event log as int-coded arrays sorted by case and timestamp: case and activity codes index
+    case_labels and activity_labels, timestamps are int64 nanoseconds. Ties keep the input order.
+    """
+    def __init__(self, case, activity, timestamp, case_labels, activity_labels):
+        order = np.lexsort((timestamp, case))
+        self.case = np.asarray(case)[order]
+        self.activity = np.asarray(activity)[order]
+        self.timestamp = np.asarray(timestamp, dtype=np.int64)[order]
+        self.case_labels = np.asarray(case_labels)
+        self.activity_labels = np.asarray(activity_labels)
+
+    def __len__(self):
+        return len(self.case)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, case="CaseId", activity="Activity", timestamp="Timestamp"):
+        case_codes, case_labels = pd.factorize(df[case])
+        activity_codes, activity_labels = pd.factorize(df[activity])
+        times = pd.to_datetime(df[timestamp], format="ISO8601", utc=True)
+        return cls(case_codes.astype(np.int32), activity_codes.astype(np.int32), times.to_numpy(dtype="datetime64[ns]").view(np.int64),
+                   case_labels, activity_labels)
+
+def read_flat_log(output, kind="div_items") -> EventArrays:
+    """Concatenates the per order CSVs of one of the generator's flat logs (div_items, div_order, conv)."""
+    if kind not in FLAT_LOGS:
+        raise ValueError(f"unknown flat log {kind!r}, expected one of {FLAT_LOGS}")
+    files = sorted(glob.glob(os.path.join(output, kind, "*.csv")))
+    if not files:
+        raise FileNotFoundError(f"no {kind} logs in {output}")
+    df = pd.concat((pd.read_csv(f, usecols=["CaseId", "Activity", "Timestamp"]) for f in files), ignore_index=True)
+    return EventArrays.from_frame(df)
+
+def flatten_ocel(ocel, object_type) -> EventArrays:
+    """Per object type flattening of a pm4py OCEL: every event becomes an event of each related object of the type."""
+    relations = ocel.relations
+    relations = relations.loc[relations["ocel:type"] == object_type, ["ocel:eid", "ocel:oid", "ocel:activity", "ocel:timestamp"]]
+    relations = relations.drop_duplicates(["ocel:eid", "ocel:oid"])
+    return EventArrays.from_frame(relations, case="ocel:oid", activity="ocel:activity", timestamp="ocel:timestamp")
+
+def _pairs(log: EventArrays):
+    """Source and target activity codes and waiting times (seconds) of all directly-follows pairs."""
+    same_case = log.case[1:] == log.case[:-1]
+    source = log.activity[:-1][same_case]
+    target = log.activity[1:][same_case]
+    wait = np.diff(log.timestamp)[same_case] / 1e9
+    return source, target, wait
+
+def directly_follows(log: EventArrays) -> pd.DataFrame:
+    """
+    Directly-follows relation of the log: frequency and waiting time statistics (seconds) per activity pair,
+    most frequent pairs first. Everything but the median is a single pass over the pairs, medians partition
+    the waiting times grouped by a (radix) sort of the pair codes.
+    """
+    source, target, wait = _pairs(log)
+    n_activities = len(log.activity_labels)
+    n_pairs = n_activities * n_activities
+    pair = source.astype(np.int64) * n_activities + target
+
+    counts = np.bincount(pair, minlength=n_pairs)
+    sums = np.bincount(pair, weights=wait, minlength=n_pairs)
+    mins, maxs = np.full(n_pairs, np.inf), np.full(n_pairs, -np.inf)
+    np.minimum.at(mins, pair, wait)
+    np.maximum.at(maxs, pair, wait)
+
+    # numpy sorts 16 bit integers with a radix sort
+    order = np.argsort(pair.astype(np.uint16) if n_pairs <= 2**16 else pair, kind="stable")
+    grouped = wait[order]
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    codes = np.flatnonzero(counts)
+
+    dfg = pd.DataFrame({
+        "source": log.activity_labels[codes // n_activities],
+        "target": log.activity_labels[codes % n_activities],
+        "frequency": counts[codes],
+        "mean_wait": sums[codes] / counts[codes],
+        "median_wait": [np.median(grouped[bounds[code]:bounds[code + 1]]) for code in codes],
+        "min_wait": mins[codes],
+        "max_wait": maxs[codes],
+    })
+    return dfg.sort_values(["frequency", "source", "target"], ascending=[False, True, True], ignore_index=True)
+
+def start_end_activities(log: EventArrays):
+    """Number of cases starting and ending with each activity, as two {activity: count} dicts."""
+    if not len(log):
+        return {}, {}
+    boundary = np.flatnonzero(log.case[1:] != log.case[:-1])
+    first = log.activity[np.concatenate([[0], boundary + 1])]
+    last = log.activity[np.append(boundary, len(log) - 1)]
+    counts = lambda codes: {log.activity_labels[code]: int(n) for code, n in enumerate(np.bincount(codes, minlength=len(log.activity_labels))) if n}
+    return counts(first), counts(last)
+
+def activity_frequencies(log: EventArrays) -> dict:
+    return {log.activity_labels[code]: int(n) for code, n in enumerate(np.bincount(log.activity, minlength=len(log.activity_labels))) if n}
+
+def performance_spectrum(log: EventArrays, activities: Sequence[str]) -> pd.DataFrame:
+    """
+    Performance spectrum of a sequence of activities: one row per occurrence of the activities as consecutive
+    events of a case, with the case, the timestamp of every step and the total duration in seconds.
+    """
+    codes = []
+    for activity in activities:
+        match = np.flatnonzero(log.activity_labels == activity)
+        if not len(match):
+            raise ValueError(f"activity {activity!r} does not occur in the log")
+        codes.append(match[0])
+    k = len(codes)
+    n = len(log) - k + 1
+    if k < 2 or n <= 0:
+        raise ValueError("a performance spectrum needs at least two activities and as many events")
+
+    match = log.activity[:n] == codes[0]
+    for step in range(1, k):
+        match &= (log.activity[step:step + n] == codes[step]) & (log.case[step:step + n] == log.case[:n])
+    starts = np.flatnonzero(match)
+
+    spectrum = pd.DataFrame({"case": log.case_labels[log.case[starts]]})
+    for step, activity in enumerate(activities):
+        spectrum[f"{step}:{activity}"] = pd.to_datetime(log.timestamp[starts + step], utc=True)
+    spectrum["duration"] = (log.timestamp[starts + k - 1] - log.timestamp[starts]) / 1e9
+    return spectrum
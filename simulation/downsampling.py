@@ -0,0 +1,110 @@
+# downsampling.py
+import math
+
+import numpy as np
+
+
+def minmax_indices(y, n_buckets, start=0, stop=None):
+    """
+    Indices of the minimum and maximum of y[start:stop] in each of n_buckets equal buckets,
+    plus the first and last point. Keeps every spike of the series at 2 points per bucket.
+    """
+    y = np.asarray(y)
+    stop = len(y) if stop is None else stop
+    n = stop - start
+    if n <= 2 * n_buckets:
+        return np.arange(start, stop)
+    size = math.ceil(n / n_buckets)
+    n_buckets = math.ceil(n / size)
+    padded = np.pad(y[start:stop], (0, size * n_buckets - n), mode="edge").reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size + start
+    idx = np.concatenate([[start], padded.argmin(axis=1) + offsets, padded.argmax(axis=1) + offsets, [stop - 1]])
+    return np.unique(np.minimum(idx, stop - 1))
+
+def lttb_indices(y, n_out, x=None):
+    """
+    Largest-Triangle-Three-Buckets: indices of n_out points that keep the visual shape of (x, y).
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    idx = np.empty(n_out, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # average of the next bucket (or the last point) is the third corner of the triangle
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        idx[i + 1] = a
+    return idx
+
+def lttb(x, y, n_out):
+    idx = lttb_indices(y, n_out, x)
+    return np.asarray(x)[idx], np.asarray(y)[idx]
+
+
+class MultiResolutionSeries:
+    """
+    Min/max downsampled levels of one or more series over a shared x axis. Level 0 is the raw data,
+    every further level has `factor` times fewer buckets, down to about `base_points` points.
+    series_for_range() serves the finest level that shows a given x range with at most max_points points.
+    """
+    def __init__(self, x, series: dict, base_points=2000, factor=4):
+        self.x = np.asarray(x)
+        self.series = {name: np.asarray(values) for name, values in series.items()}
+        self.levels = {name: [np.arange(len(self.x))] for name in self.series}
+        n = len(self.x)
+        buckets = n // (2 * factor)
+        while buckets * 2 >= base_points:
+            for name, values in self.series.items():
+                self.levels[name].append(minmax_indices(values, buckets))
+            buckets //= factor
+        for name, values in self.series.items():
+            if len(self.levels[name][-1]) > base_points:
+                self.levels[name].append(minmax_indices(values, base_points // 2))
+
+    def series_for_range(self, name, x_min=None, x_max=None, max_points=2000):
+        values = self.series[name]
+        # raw index bounds of the range, the level indices are sorted raw indices
+        first = 0 if x_min is None else np.searchsorted(self.x, x_min, side="left")
+        last = len(self.x) if x_max is None else np.searchsorted(self.x, x_max, side="right")
+        for idx in self.levels[name]:
+            lo, hi = np.searchsorted(idx, first, side="left"), np.searchsorted(idx, last, side="left")
+            # one extra point on both sides so lines reach the edges of the view
+            lo, hi = max(lo - 1, 0), min(hi + 1, len(idx))
+            if hi - lo <= max_points or idx is self.levels[name][-1]:
+                selected = idx[lo:hi]
+                return self.x[selected], values[selected]
+
+    def save(self, path):
+        arrays = {"x": self.x}
+        for name, values in self.series.items():
+            arrays[f"series__{name}"] = values
+            for level, idx in enumerate(self.levels[name]):
+                if level:
+                    arrays[f"level__{name}__{level}"] = idx.astype(np.int32)
+        np.savez_compressed(path, **arrays)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        self = cls.__new__(cls)
+        self.x = data["x"]
+        self.series, self.levels = {}, {}
+        for key in data.files:
+            if key.startswith("series__"):
+                name = key[len("series__"):]
+                self.series[name] = data[key]
+                self.levels[name] = [np.arange(len(self.x))]
+        for key in sorted((k for k in data.files if k.startswith("level__")), key=lambda k: int(k.rsplit("__", 1)[1])):
+            name = key[len("level__"):].rsplit("__", 1)[0]
+            self.levels[name].append(data[key])
+        return self
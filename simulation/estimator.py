@@ -0,0 +1,229 @@
+# estimator.py
+import copy, math, os, shutil, tempfile, warnings
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy.stats import norm
+
+from . import OCEL_FormatGenerator
+
+# default limits used by the UI, keys are keys of the estimate
+DEFAULT_BUDGET = {"events": 5_000_000, "objects": 2_500_000, "output_mb": 2048}
+
+# calendar days from placing an order to its last delivery: fixed part (invoice, payment, first check)
+# and days per split (1-6 days between availability checks plus working hour and weekend shifts)
+LEAD_TIME_BASE = 5.5
+LEAD_TIME_PER_SPLIT = 4.8
+
+# bytes written per order as  c + per_line * n + per_split * S + per_package * D + per_split_sq * Q
+# with n SKUs in the order, S = sum and Q = sum of squares of their split days and D = max split days
+# (least squares over generated orders, within ~5%)
+BYTES_PER_ORDER = {
+    "ocel_json": (4850, -1545, 3584, 2197, 0),
+    "div_items": (0, 139, 315, 7, 0),
+    "div_order": (153, -32, 135, 189, 0),
+    "conv": (0, 6, 440, 12, 56),
+}
+
+SKU_CONFIG_KEYS = ['id', 'rop', 'eoq', 'z_score', 'order_base_cost', 'holding_cost', 'inventory', 'kpi',
+                   'mean_daily_demand', 'std_daily_demand', 'delivery_split_centre', 'delivery_split_std',
+                   'delivery_split_hist', 'delivery_func', 'verbose']
+
+class BudgetExceeded(ValueError):
+    """Raised by enforce_budget when a run is refused for exceeding its output budget."""
+
+def sku_configs_of(warehouse) -> List[Dict]:
+    """Rebuilds the SKU configs of a (fresh) Warehouse."""
+    return [{key: getattr(sku, key) for key in SKU_CONFIG_KEYS} for sku in warehouse.SKUs.values()]
+
+def with_demand(sku_configs: List[Dict], demand, days: int, seed=None) -> List[Dict]:
+    """SKU configs with the mean daily demand of a DemandSource over the run instead of their own."""
+    from .warehouse import Warehouse
+
+    if not hasattr(demand, "sku_ids"):
+        demand.bind(Warehouse(copy.deepcopy(sku_configs)).SKUs, seed=seed, days=days)
+    means = dict(zip(demand.sku_ids, demand.mean_demand(days)))
+    return [{**sku, 'mean_daily_demand': float(means[sku['id']])} for sku in sku_configs]
+
+def split_day_distribution(centre, std, max_days=None):
+    """
+    Probabilities of the number of delivery days max(1, int(N(centre, std))) drawn by Simulation.simulate_order,
+    as (days, probabilities) over the support 1..max_days.
+    """
+    centre, std = float(centre or 0), float(std or 0)
+    if std <= 0:
+        days = max(1, int(centre))
+        return np.array([days]), np.array([1.0])
+    max_days = max_days or max(2, int(math.ceil(centre + 6 * std)) + 1)
+    days = np.arange(1, max_days + 1)
+    cdf = norm.cdf(days + 1, centre, std)
+    # int() truncates towards zero, so everything below 2 ends up as one day
+    probs = np.diff(np.concatenate([[0.0], cdf]))
+    probs[-1] += 1 - cdf[-1]
+    return days, probs
+
+def sku_split_days(sku):
+    """split_day_distribution of a SKU config, or its empirical delivery_split_hist if it has one."""
+    hist = sku.get('delivery_split_hist')
+    if not hist:
+        return split_day_distribution(sku['delivery_split_centre'], sku['delivery_split_std'])
+    hist = np.asarray(hist, dtype=float)
+    days = np.arange(1, max(len(hist), 2))
+    probs = np.zeros(len(days))
+    # zero delivery days are drawn as one day
+    np.add.at(probs, np.maximum(np.arange(len(hist)), 1) - 1, hist / hist.sum())
+    return days, probs
+
+def expected_max(days, probs, m=1.0):
+    """E[max] of m (possibly fractional) independent draws from a discrete distribution on 1..max(days)."""
+    cdf_max = np.cumsum(probs) ** m
+    # E[max] = sum_j P(max >= j) = 1 + sum_j>1 1 - P(max <= j - 1)
+    return float(days[0] + np.sum(1 - cdf_max[:-1]))
+
+def _order_cycle(sku, expected_split_days):
+    """Expected days between two orders of a SKU: EOQ coverage, or the lead time if the SKU waits longer for its order."""
+    mean_demand = max(float(sku['mean_daily_demand']), 1e-9)
+    eoq = math.sqrt((2 * 365 * mean_demand * sku['order_base_cost']) / sku['holding_cost'])
+    lead_time = LEAD_TIME_BASE + LEAD_TIME_PER_SPLIT * expected_split_days
+    return max(eoq / mean_demand, lead_time, 1.0)
+
+def _mixture(distributions, weights):
+    """Weighted mixture of (days, probabilities) distributions on the common support 1..max days."""
+    support = np.arange(1, max(days[-1] for days, _ in distributions) + 1)
+    mixed = np.zeros(len(support))
+    for (days, probs), weight in zip(distributions, weights):
+        mixed[days - 1] += weight * probs
+    return support, mixed / mixed.sum()
+
+def estimate_analytic(days: int, sku_configs: List[Dict]) -> Dict:
+    """
+    Closed form estimate from demand vs. EOQ/ROP and the delivery split distribution.
+    An order is placed on every day any SKU reaches its ROP. SKUs are assumed to reorder independently,
+    which overestimates the orders (not the order lines) of many similar SKUs that tend to reorder together;
+    use estimate_pilot for a measured number.
+    """
+    lines, split_days, split_days_sq = 0.0, 0.0, 0.0
+    max_orders, no_order_prob, distributions, weights = 0.0, 1.0, [], []
+    for sku in sku_configs:
+        values, probs = sku_split_days(sku)
+        mean_split = float(values @ probs)
+        first_order = max(0.0, (sku['inventory'] - sku['rop']) / max(float(sku['mean_daily_demand']), 1e-9))
+        n_orders = 0.0 if first_order >= days else 1 + (days - first_order - 1) / _order_cycle(sku, mean_split)
+        max_orders = max(max_orders, n_orders)
+        no_order_prob *= 1 - n_orders / days
+        lines += n_orders
+        split_days += n_orders * mean_split
+        split_days_sq += n_orders * float(values ** 2 @ probs)
+        distributions.append((values, probs))
+        weights.append(n_orders)
+
+    orders = min(max(days * (1 - no_order_prob), max_orders), lines)
+    packages = 0.0
+    if orders > 0:
+        # packages per order are set by the SKU of the order with the most split days
+        support, mixed = _mixture(distributions, weights)
+        packages = orders * expected_max(support, mixed, lines / orders)
+    n, S, D, Q = lines, split_days, packages, split_days_sq
+
+    output_bytes = sum(c * orders + per_line * n + per_split * S + per_package * D + per_split_sq * Q
+                       for c, per_line, per_split, per_package, per_split_sq in BYTES_PER_ORDER.values())
+    return {
+        "orders": orders,
+        "order_lines": lines,
+        "split_days": split_days,
+        "packages": packages,
+        "events": 3 * orders + 3 * S - n + 4 * D,
+        "objects": orders + 2 * S - n + D,
+        "flat_log_rows": (3 * orders - n + 3 * S + 4 * D) + (2 * n + 7 * S) + (9 * S - n + Q),
+        "output_mb": output_bytes / 2**20,
+    }
+
+def _count_output(path) -> Dict:
+    import json
+    counts = {"events": 0, "objects": 0, "flat_log_rows": 0, "output_mb": 0.0}
+    for root, _, files in os.walk(path):
+        for name in files:
+            file_path = os.path.join(root, name)
+            counts["output_mb"] += os.path.getsize(file_path) / 2**20
+            if name.startswith("OrderProcess_") and name.endswith(".json"):
+                with open(file_path) as f:
+                    log = json.load(f)
+                counts["events"] += len(log["events"])
+                counts["objects"] += len(log["objects"])
+            elif name.endswith(".csv"):
+                with open(file_path) as f:
+                    counts["flat_log_rows"] += sum(1 for _ in f) - 1
+    return counts
+
+def estimate_pilot(days: int, config: Dict, sku_configs: List[Dict], pilot_days: int = 90) -> Dict:
+    """
+    Runs the first pilot_days of the simulation into a temporary directory and extrapolates the counts
+    with the rate of the second half of the pilot, which skips the initial orders of the warm-up.
+    The global RNG and ID state are restored afterwards.
+    """
+    from .simulation import Simulation
+    from .warehouse import Warehouse
+
+    pilot_days = min(days, pilot_days)
+    half = pilot_days // 2
+    output = tempfile.mkdtemp(prefix="frog_pilot_")
+    rng_state = np.random.get_state()
+    ids = {obj_type: set(values) for obj_type, values in OCEL_FormatGenerator.used_ids.items()}
+    try:
+        warehouse = Warehouse(copy.deepcopy(sku_configs))
+        # a copy of the demand source, the pilot must not advance the generator of the run it estimates
+        pilot_config = {**config, "warehouse": warehouse, "days": pilot_days, "output": output,
+                        "verbose": False, "budget": None, "demand": copy.deepcopy(config.get("demand"))}
+        simulation = Simulation(pilot_config)
+        measured = []
+        for until in (half, pilot_days):
+            simulation.run(until=until)
+            counts = _count_output(output)
+            counts["orders"] = warehouse.orders_placed
+            measured.append(counts)
+    finally:
+        shutil.rmtree(output, ignore_errors=True)
+        np.random.set_state(rng_state)
+        for obj_type, values in ids.items():
+            OCEL_FormatGenerator.used_ids[obj_type].clear()
+            OCEL_FormatGenerator.used_ids[obj_type].update(values)
+
+    first, full = measured
+    if half == 0 or pilot_days == days:
+        return full
+    return {key: full[key] + (full[key] - first[key]) / (pilot_days - half) * (days - pilot_days) for key in full}
+
+def estimate_run(config: Dict, sku_configs: Optional[List[Dict]] = None, pilot_days: int = 0) -> Dict:
+    """
+    Predicts orders, split days, events, objects, flat log rows and output size of a Simulation config.
+    sku_configs default to the configs of config['warehouse']. A config['demand'] source replaces their mean
+    daily demand. With pilot_days > 0 the analytic estimate is replaced by the scaled counts of a short pilot
+    run where it measured them.
+    """
+    if sku_configs is None:
+        sku_configs = sku_configs_of(config['warehouse'])
+    days = int(config['days'])
+    demanded = sku_configs
+    if config.get('demand') is not None:
+        demanded = with_demand(sku_configs, config['demand'], days, config.get('seed'))
+    estimate = estimate_analytic(days, demanded)
+    estimate["method"] = "analytic"
+    if pilot_days:
+        estimate.update(estimate_pilot(days, config, sku_configs, pilot_days))
+        estimate["method"] = f"pilot ({min(days, pilot_days)} days)"
+    return estimate
+
+def over_budget(estimate: Dict, budget: Dict) -> List[str]:
+    """Messages for every budget key the estimate exceeds."""
+    return [f"estimated {key.replace('_', ' ')} {estimate[key]:,.0f} exceed the budget of {limit:,.0f}"
+            for key, limit in (budget or {}).items()
+            if limit is not None and key in estimate and estimate[key] > limit]
+
+def enforce_budget(estimate: Dict, budget: Dict, refuse: bool = False) -> List[str]:
+    """Warns about (or with refuse=True raises BudgetExceeded for) an estimate over budget."""
+    messages = over_budget(estimate, budget)
+    if messages and refuse:
+        raise BudgetExceeded("Simulation refused: " + "; ".join(messages))
+    for message in messages:
+        warnings.warn(message)
+    return messages
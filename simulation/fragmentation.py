@@ -0,0 +1,181 @@
+# fragmentation.py
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from .relation_index import RelationIndex, LINEAGE_QUALIFIERS, load_index
+
+DAY_NS = 86400 * 10**9
+
+
+def _edges(index: RelationIndex, qualifiers):
+    """(source, target) object codes of the object to object relations with one of the qualifiers."""
+    keep = np.isin(index.o2o_qualifier, index._qualifier_codes(qualifiers))
+    source = np.repeat(np.arange(len(index.object_ids)), np.diff(index.o2o_indptr))
+    return source[keep], index.o2o_indices[keep]
+
+def _event_objects(index: RelationIndex, activity):
+    """(event, object) codes of the event to object relations of all events of an activity."""
+    codes = np.flatnonzero(index.activities == activity)
+    events = np.repeat(np.arange(len(index.event_ids)), np.diff(index.e2o_indptr))
+    keep = np.isin(index.event_activity[events], codes)
+    return events[keep], index.e2o_indices[keep]
+
+def _type_mask(index: RelationIndex, object_type):
+    return np.isin(index.object_type, np.flatnonzero(index.object_types == object_type))
+
+def item_lineage(index: RelationIndex):
+    """
+    Order and depth in the split tree of every object: initial items of an order have depth 0, items split
+    off an item one more than it. Objects outside of any order get order -1. Resolved one tree level per step
+    for all orders at once.
+    """
+    n = len(index.object_ids)
+    order_of = np.full(n, -1, dtype=np.int64)
+    depth = np.full(n, -1, dtype=np.int64)
+    orders, items = _edges(index, ("Item of Order",))
+    keep = _type_mask(index, "Order")[orders]
+    order_of[items[keep]], depth[items[keep]] = orders[keep], 0
+
+    parents, children = _edges(index, LINEAGE_QUALIFIERS)
+    while True:
+        new = (order_of[parents] >= 0) & (order_of[children] < 0)
+        if not new.any():
+            return order_of, depth, parents
+        order_of[children[new]] = order_of[parents[new]]
+        depth[children[new]] = depth[parents[new]] + 1
+
+def order_placement(index: RelationIndex):
+    """Time (ns) of the Place Order event of every order object, -1 for other objects."""
+    placed = np.full(len(index.object_ids), -1, dtype=np.int64)
+    events, objects = _event_objects(index, "Place Order")
+    keep = _type_mask(index, "Order")[objects]
+    np.maximum.at(placed, objects[keep], index.event_time[events[keep]].view(np.int64))
+    return placed
+
+def item_deliveries(index: RelationIndex):
+    """
+    Delivery time (ns, -1 if not delivered) of every object packed into a package. Packages of the same day
+    share their id, so an item is delivered with the Deliver Package event of its package that was written
+    together with its Pack Items event (same order).
+    """
+    n = len(index.object_ids)
+    packed_group = np.full(n, -1, dtype=np.int64)
+    events, objects = _event_objects(index, "Pack Items")
+    packed_group[objects] = index.event_group[events]
+
+    packages, items = _edges(index, ("Package of item",))
+    keep = packed_group[items] >= 0
+    packages, items = packages[keep], items[keep]
+    events, delivered_packages = _event_objects(index, "Deliver Package")
+    delivered_at = np.full(n, -1, dtype=np.int64)
+    if not len(events) or not len(items):
+        return delivered_at
+
+    # exact match of (package, group) keys with one searchsorted
+    n_groups = int(index.event_group.max()) + 1
+    keys = delivered_packages.astype(np.int64) * n_groups + index.event_group[events]
+    order = np.argsort(keys)
+    keys, times = keys[order], index.event_time[events[order]].view(np.int64)
+    query = packages.astype(np.int64) * n_groups + packed_group[items]
+    pos = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+    found = keys[pos] == query
+    delivered_at[items[found]] = times[pos[found]]
+    return delivered_at
+
+def order_fragmentation(index: RelationIndex) -> pd.DataFrame:
+    """
+    Fragmentation metrics per order: number of splits, depth of the split tree, shipments (packed items) and delivered quantity,
+    days from placing the order to its first and last delivery and the quantity weighted delivery delay in days.
+    """
+    n = len(index.object_ids)
+    is_order = _type_mask(index, "Order")
+    order_codes = np.flatnonzero(is_order)
+    order_of, depth, parents = item_lineage(index)
+    placed = order_placement(index)
+
+    # every split item is the parent of the two items it was split into
+    split_orders = order_of[np.unique(parents)]
+    splits = np.bincount(split_orders[split_orders >= 0], minlength=n)
+    tree_depth = np.zeros(n, dtype=np.int64)
+    in_order = order_of >= 0
+    np.maximum.at(tree_depth, order_of[in_order], depth[in_order])
+
+    delivered_at = item_deliveries(index)
+    delivered = (delivered_at >= 0) & in_order
+    items = np.flatnonzero(delivered)
+    item_order = order_of[items]
+    amount = np.nan_to_num(index.object_amount[items])
+    delay = (delivered_at[items] - placed[item_order]) / DAY_NS
+
+    first = np.full(n, np.iinfo(np.int64).max)
+    last = np.full(n, -1, dtype=np.int64)
+    np.minimum.at(first, item_order, delivered_at[items])
+    np.maximum.at(last, item_order, delivered_at[items])
+    quantity = np.bincount(item_order, weights=amount, minlength=n)
+    weighted = np.bincount(item_order, weights=amount * delay, minlength=n)
+    shipments = np.bincount(item_order, minlength=n)
+
+    has_delivery = last[order_codes] >= 0
+    placed_days = placed[order_codes]
+    return pd.DataFrame({
+        "order": index.object_ids[order_codes],
+        # the smallest int64 is NaT
+        "placed": np.where(placed_days >= 0, placed_days, np.iinfo(np.int64).min).view("datetime64[ns]"),
+        "splits": splits[order_codes],
+        "split_depth": tree_depth[order_codes],
+        "shipments": shipments[order_codes],
+        "delivered_quantity": quantity[order_codes],
+        "days_to_first_delivery": np.where(has_delivery, (first[order_codes] - placed_days) / DAY_NS, np.nan),
+        "days_to_last_delivery": np.where(has_delivery, (last[order_codes] - placed_days) / DAY_NS, np.nan),
+        "weighted_delay_days": np.where(quantity[order_codes] > 0, weighted[order_codes] / np.maximum(quantity[order_codes], 1e-12), np.nan),
+    })
+
+def material_delays(index: RelationIndex) -> pd.DataFrame:
+    """Delivered quantity, shipments and quantity weighted delivery delay in days per material."""
+    order_of, _, _ = item_lineage(index)
+    placed = order_placement(index)
+
+    delivered_at = item_deliveries(index)
+    items = np.flatnonzero((delivered_at >= 0) & (order_of >= 0) & (index.object_material >= 0))
+    material = index.object_material[items]
+    amount = np.nan_to_num(index.object_amount[items])
+    delay = (delivered_at[items] - placed[order_of[items]]) / DAY_NS
+
+    materials, codes = np.unique(material, return_inverse=True)
+    quantity = np.bincount(codes, weights=amount, minlength=len(materials))
+    max_delay = np.full(len(materials), -np.inf)
+    np.maximum.at(max_delay, codes, delay)
+    return pd.DataFrame({
+        "material_id": materials,
+        "shipments": np.bincount(codes, minlength=len(materials)),
+        "delivered_quantity": quantity,
+        "weighted_delay_days": np.bincount(codes, weights=amount * delay, minlength=len(materials)) / np.maximum(quantity, 1e-12),
+        "max_delay_days": max_delay,
+    })
+
+def summarize_orders(orders: pd.DataFrame) -> Dict:
+    """Run level aggregates of order_fragmentation."""
+    quantity = orders["delivered_quantity"].sum()
+    return {
+        "orders": len(orders),
+        "split_orders": int((orders["splits"] > 0).sum()),
+        "mean_splits": orders["splits"].mean(),
+        "max_split_depth": int(orders["split_depth"].max()) if len(orders) else 0,
+        "mean_shipments": orders["shipments"].mean(),
+        "mean_days_to_first_delivery": orders["days_to_first_delivery"].mean(),
+        "mean_days_to_last_delivery": orders["days_to_last_delivery"].mean(),
+        "p90_days_to_last_delivery": orders["days_to_last_delivery"].quantile(0.9),
+        "weighted_delay_days": (orders["weighted_delay_days"] * orders["delivered_quantity"]).sum() / quantity if quantity else np.nan,
+    }
+
+def compare_runs(outputs: Dict[str, str]) -> pd.DataFrame:
+    """summarize_orders of several runs, one row per run label, from the relation indexes saved with the runs."""
+    rows = []
+    for label, output in outputs.items():
+        index = load_index(output)
+        if index is None:
+            raise FileNotFoundError(f"no relation index in {output}")
+        rows.append({"run": label, **summarize_orders(order_fragmentation(index))})
+    return pd.DataFrame(rows)
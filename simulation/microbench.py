@@ -0,0 +1,208 @@
+# microbench.py
+import argparse, itertools, json, os, platform, shutil, statistics as st, tempfile, time, warnings
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+import pm4py as pm
+
+from . import OCEL_FormatGenerator as generator
+from . import curve_fitting
+from .benchmark import DELIVERY_FUNCS, build_ocel, make_sku_configs
+from .order import Order
+from .simulation import Simulation
+from .warehouse import Warehouse
+
+START = datetime(2025, 4, 7, 9, 0, 0)
+
+@dataclass
+class Case:
+    """
+    A parameterized micro-benchmark. setup() runs once before timing and returns
+    the zero-argument callable that is timed.
+    """
+    name: str
+    setup: Callable[[], Callable[[], object]]
+    params: Dict = field(default_factory=dict)
+
+def _order_items(n_skus, del_days, amount=500, func="constant"):
+    return {sku: {"amount": amount, "del_days": del_days, "func": DELIVERY_FUNCS[func]} for sku in range(n_skus)}
+
+def _fresh_dir(name):
+    path = os.path.join(tempfile.gettempdir(), f"frog_microbench_{name}")
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    return path
+
+# --- cases -------------------------------------------------------------------
+
+def distribute_values_cases():
+    for time_slots in [2, 10, 50]:
+        for func in ["constant", "quadratic"]:
+            yield Case("distribute_values",
+                       lambda time_slots=time_slots, func=func: lambda: generator.distribute_values(DELIVERY_FUNCS[func], time_slots, 1000),
+                       {"time_slots": time_slots, "func": func})
+
+def deterministic_event_time_cases():
+    for noise in [0, 10]:
+        yield Case("deterministic_event_time",
+                   lambda noise=noise: lambda: generator.deterministic_event_time(START, "Pick Item", 15, 60, START, noise),
+                   {"extra_noise_min": noise})
+
+def adjust_to_working_hours_cases():
+    for label, ts in [("working_hours", START), ("evening", START.replace(hour=19)), ("weekend", datetime(2025, 4, 5, 10))]:
+        yield Case("adjust_to_working_hours", lambda ts=ts: lambda: generator.adjust_to_working_hours(ts), {"timestamp": label})
+
+def generate_unique_id_cases():
+    for used in [0, 5000]:
+        def setup(used=used):
+            generator.used_ids["item"].clear()
+            for i in range(used):
+                generator.generate_unique_id("item", 0, i % 7)
+            # a fresh material per call, one (iteration, material) key only has 8999 ids
+            calls = itertools.count()
+            return lambda: generator.generate_unique_id("item", 1, next(calls))
+        yield Case("generate_unique_id", setup, {"used_ids": used})
+
+def generate_ocel_event_log_cases():
+    for n_skus in [1, 5]:
+        for del_days in [1, 5, 20]:
+            def setup(n_skus=n_skus, del_days=del_days):
+                out = _fresh_dir(f"gen_{n_skus}_{del_days}")
+                return lambda: generator.generate_ocel_event_log(START, _order_items(n_skus, del_days), 1, out)
+            yield Case("generate_ocel_event_log", setup, {"n_skus": n_skus, "del_days": del_days})
+
+def fit_distribution_cases():
+    rng = np.random.default_rng(1)
+    for n_points in [4, 8, 16]:
+        x = np.sort(rng.choice(np.arange(1, 60), n_points, replace=False)).tolist()
+        y = rng.integers(10, 200, n_points).tolist()
+        def setup(x=x, y=y):
+            def fit():
+                curve_fitting._fit_cache.clear()
+                return curve_fitting.DistributionFitter().expected_value(x, y)
+            return fit
+        yield Case("fit_distribution", setup, {"n_points": n_points, "memoized": False})
+        yield Case("fit_distribution", lambda x=x, y=y: lambda: curve_fitting.fit_distribution(x, y),
+                   {"n_points": n_points, "memoized": True})
+
+def build_ocel_cases():
+    for n_orders in [10, 100]:
+        def setup(n_orders=n_orders):
+            out = _fresh_dir(f"build_{n_orders}")
+            for i in range(n_orders):
+                generator.generate_ocel_event_log(START + pd.Timedelta(days=7 * i).to_pytimedelta(), _order_items(2, 3), i, out)
+            return lambda: build_ocel(out)
+        yield Case("build_ocel", setup, {"n_orders": n_orders})
+
+def extract_shipments_cases():
+    for n_skus in [1, 5]:
+        for del_days in [2, 10]:
+            def setup(n_skus=n_skus, del_days=del_days):
+                out = _fresh_dir(f"extract_{n_skus}_{del_days}")
+                configs = make_sku_configs(n_skus, "constant", 50, 1, del_days, 0)
+                sim = Simulation({"warehouse": Warehouse(configs), "start_date": START, "days": 1, "seed": 1, "output": out})
+                order = Order(id=1, order_placed=START, sku_configs={c["id"]: {"quantity": 500} for c in configs})
+                generator.generate_ocel_event_log(START, _order_items(n_skus, del_days), order.id, out)
+                ocel = pm.read_ocel2_json(os.path.join(out, f"OrderProcess_{START.strftime('%Y-%m-%d')}.json"))
+                def extract():
+                    sim.shipment_schedule.clear()
+                    sim.extract_shipments(ocel, order)
+                return extract
+            yield Case("extract_shipments", setup, {"n_skus": n_skus, "del_days": del_days})
+
+SUITES = {
+    "distribute_values": distribute_values_cases,
+    "deterministic_event_time": deterministic_event_time_cases,
+    "adjust_to_working_hours": adjust_to_working_hours_cases,
+    "generate_unique_id": generate_unique_id_cases,
+    "generate_ocel_event_log": generate_ocel_event_log_cases,
+    "fit_distribution": fit_distribution_cases,
+    "build_ocel": build_ocel_cases,
+    "extract_shipments": extract_shipments_cases,
+}
+
+# --- runner ------------------------------------------------------------------
+
+def bench(case: Case, warmup: int = 3, repeats: int = 20, min_time: float = 0.005) -> Dict:
+    """
+    Times one case: a few warmup calls, then `repeats` samples. Each sample loops the callable
+    `number` times, chosen so that a sample takes at least `min_time` seconds. Stats are per call.
+    """
+    func = case.setup()
+    for _ in range(warmup):
+        func()
+
+    t0 = time.perf_counter()
+    func()
+    single = max(time.perf_counter() - t0, 1e-9)
+    number = max(1, int(min_time / single))
+
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - t0) / number)
+
+    std = st.stdev(samples) if len(samples) > 1 else 0.0
+    return {
+        "name": case.name,
+        "params": case.params,
+        "repeats": repeats,
+        "number": number,
+        "mean": st.mean(samples),
+        "std": std,
+        "min": min(samples),
+        "median": st.median(samples),
+        "ci95": 1.96 * std / len(samples) ** 0.5 if len(samples) > 1 else 0.0,
+    }
+
+def run_suite(names: List[str] = None, warmup: int = 3, repeats: int = 20, min_time: float = 0.005,
+              verbose: bool = True) -> Dict:
+    np.random.seed(1)
+    results = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for suite_name, cases in SUITES.items():
+            if names and suite_name not in names:
+                continue
+            for case in cases():
+                res = bench(case, warmup=warmup, repeats=repeats, min_time=min_time)
+                results.append(res)
+                if verbose:
+                    print(f"{res['name']} {res['params']}: {res['mean'] * 1e6:.1f}us "
+                          f"± {res['ci95'] * 1e6:.1f}us (min {res['min'] * 1e6:.1f}us, n={res['number']}x{res['repeats']})")
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "warmup": warmup,
+            "repeats": repeats,
+        },
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the FrOG generator hot paths")
+    parser.add_argument("cases", nargs="*", help=f"suites to run (default: all): {', '.join(SUITES)}")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--min-time", type=float, default=0.005, help="minimum seconds per sample")
+    parser.add_argument("--output", default="microbench_results.json")
+    args = parser.parse_args()
+    unknown = set(args.cases) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+
+    report = run_suite(args.cases, warmup=args.warmup, repeats=args.repeats, min_time=args.min_time)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
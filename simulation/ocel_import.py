@@ -0,0 +1,494 @@
+# ocel_import.py
+import gzip, hashlib, json, math, os, sqlite3
+import xml.etree.ElementTree as ET
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from .demand import ReplayDemand, save_replay
+
+# which parts of a log carry the demand and the deliveries, the defaults match the logs written by the generator
+DEFAULT_MAPPING = {
+    "demand_activity": "Place Order",
+    "delivery_activity": "Deliver Package",
+    "item_type": "Item",
+    "material_attribute": "material_id",
+    "quantity_attribute": "amount",
+}
+
+JSON_EXTENSIONS = (".json", ".jsonocel", ".json.gz", ".jsonocel.gz")
+XML_EXTENSIONS = (".xml", ".xmlocel", ".xml.gz", ".xmlocel.gz")
+SQLITE_EXTENSIONS = (".sqlite", ".sqlite3", ".db")
+# arrays extracted by cached_import, never written next to the logs
+IMPORT_CACHE_DIR = "./cache/imports"
+
+_DEMAND, _DELIVERY = 0, 1
+
+
+def _label(value):
+    """Material label of an attribute value, numbers written as 2, 2.0 or '2.0' all become 2."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    return int(number) if number.is_integer() else number
+
+def _open_text(path):
+    return gzip.open(path, "rt", encoding="utf-8") if path.endswith(".gz") else open(path, encoding="utf-8")
+
+
+class _Collector:
+    """
+    Compact state of a streamed log: object ids interned to int codes with their type, material and first/last
+    quantity, the item to item relations and the objects related to demand and delivery events. Nothing else is kept.
+    """
+    def __init__(self, mapping):
+        self.mapping = {**DEFAULT_MAPPING, **(mapping or {})}
+        self.kinds = {self.mapping["demand_activity"]: _DEMAND, self.mapping["delivery_activity"]: _DELIVERY}
+        self.codes = {}
+        self.types = {}
+        self.object_type = array("i")
+        self.material = array("q")
+        self.first_quantity, self.last_quantity = array("d"), array("d")
+        self.first_time, self.last_time = [], []
+        self.materials = {}
+        self.o2o_source, self.o2o_target = array("q"), array("q")
+        self.event_kind = array("b")
+        self.event_day = []
+        self.e2o_event, self.e2o_object = array("q"), array("q")
+        self.events = {}
+
+    def _code(self, object_id):
+        code = self.codes.get(object_id)
+        if code is None:
+            code = self.codes[object_id] = len(self.codes)
+            self.object_type.append(-1)
+            self.material.append(-1)
+            self.first_quantity.append(math.nan)
+            self.last_quantity.append(math.nan)
+            self.first_time.append(None)
+            self.last_time.append(None)
+        return code
+
+    def object(self, object_id, object_type, attributes=(), relationships=()):
+        """attributes: (name, value, time) with time an ISO string or None, relationships: target object ids."""
+        code = self._code(object_id)
+        self.object_type[code] = self.types.setdefault(object_type, len(self.types))
+        for name, value, time in attributes:
+            if value is None:
+                continue
+            if name == self.mapping["material_attribute"]:
+                self.material[code] = self.materials.setdefault(_label(value), len(self.materials))
+            elif name == self.mapping["quantity_attribute"]:
+                time = time or ""
+                if self.first_time[code] is None or time < self.first_time[code]:
+                    self.first_quantity[code], self.first_time[code] = float(value), time
+                if self.last_time[code] is None or time >= self.last_time[code]:
+                    self.last_quantity[code], self.last_time[code] = float(value), time
+        for target in relationships:
+            self.o2o(object_id, target)
+
+    def o2o(self, source_id, target_id):
+        self.o2o_source.append(self._code(source_id))
+        self.o2o_target.append(self._code(target_id))
+
+    def event(self, event_id, activity, time, objects=()):
+        """Keeps demand and delivery events only, returns whether the event was kept."""
+        kind = self.kinds.get(activity)
+        if kind is None:
+            return False
+        code = self.events[event_id] = len(self.event_kind)
+        self.event_kind.append(kind)
+        # calendar day of the wall clock time, as the simulation evaluates delays
+        self.event_day.append(str(time)[:10])
+        for object_id in objects:
+            self.e2o(code, object_id)
+        return True
+
+    def e2o(self, event_code, object_id):
+        self.e2o_event.append(event_code)
+        self.e2o_object.append(self._code(object_id))
+
+    def finish(self):
+        return ImportedLog.from_collector(self)
+
+
+def _read_json(path, collector, chunk_size=1 << 20):
+    """Streams the objects and events arrays of an OCEL 2.0 JSON file element by element."""
+    decoder = json.JSONDecoder()
+    with _open_text(path) as f:
+        buf, pos, eof = "", 0, False
+
+        def fill():
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            return not eof
+
+        def peek():
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos].isspace():
+                    pos += 1
+                if pos < len(buf) or not fill():
+                    return buf[pos] if pos < len(buf) else ""
+
+        def expect(char):
+            nonlocal pos
+            if peek() != char:
+                raise ValueError(f"malformed OCEL JSON in {path}: expected {char!r} at {pos}")
+            pos += 1
+
+        def value():
+            nonlocal pos
+            peek()
+            while True:
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                    # a number at the end of the buffer may continue in the next chunk
+                    if end < len(buf) or eof:
+                        pos = end
+                        return obj
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill()
+
+        expect("{")
+        while peek() != "}":
+            key = value()
+            expect(":")
+            if key in ("objects", "events"):
+                expect("[")
+                while peek() != "]":
+                    element = value()
+                    relationships = [rel["objectId"] for rel in element.get("relationships") or ()]
+                    if key == "objects":
+                        attributes = [(a["name"], a.get("value"), a.get("time")) for a in element.get("attributes") or ()]
+                        collector.object(element["id"], element["type"], attributes, relationships)
+                    else:
+                        collector.event(element["id"], element["type"], element["time"], relationships)
+                    if peek() == ",":
+                        pos += 1
+                expect("]")
+            else:
+                value()
+            if peek() == ",":
+                pos += 1
+        expect("}")
+
+def _read_xml(path, collector):
+    """Streams the object and event elements of an OCEL 2.0 XML file, every element is dropped once read."""
+    with (gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")) as f:
+        stack = []
+        for action, element in ET.iterparse(f, events=("start", "end")):
+            if action == "start":
+                stack.append(element)
+                continue
+            stack.pop()
+            # object and event elements are the children of the objects and events sections of the log
+            if len(stack) != 2 or element.tag not in ("object", "event"):
+                continue
+            attributes = [(a.get("name"), a.text, a.get("time")) for a in element.iterfind("attributes/attribute")]
+            relationships = [rel.get("object-id") for rel in element.iterfind("objects/relationship")]
+            if element.tag == "object":
+                collector.object(element.get("id"), element.get("type"), attributes, relationships)
+            else:
+                collector.event(element.get("id"), element.get("type"), element.get("time"), relationships)
+            stack[-1].remove(element)
+
+def _read_sqlite(path, collector, batch_size=100_000):
+    """Reads the tables of an OCEL 2.0 SQLite file with cursors, batch by batch."""
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        def rows(query):
+            cursor = connection.execute(query)
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    return
+                yield from batch
+
+        def columns(table):
+            return [row[1] for row in connection.execute(f'PRAGMA table_info("{table}")')]
+
+        mapping = collector.mapping
+        for object_type, table in list(rows("SELECT ocel_type, ocel_type_map FROM object_map_type")):
+            table = f"object_{table}"
+            names = columns(table)
+            fields = [name for name in (mapping["material_attribute"], mapping["quantity_attribute"]) if name in names]
+            time = "ocel_time" if "ocel_time" in names else "NULL"
+            select = ", ".join(f'"{name}"' for name in ["ocel_id", *fields]) + f", {time}"
+            for row in rows(f'SELECT {select} FROM "{table}"'):
+                collector.object(row[0], object_type, [(name, value, row[-1]) for name, value in zip(fields, row[1:-1])])
+        for source, target in rows("SELECT ocel_source_id, ocel_target_id FROM object_object"):
+            collector.o2o(source, target)
+
+        for activity, table in list(rows("SELECT ocel_type, ocel_type_map FROM event_map_type")):
+            if activity in collector.kinds:
+                for event_id, time in rows(f'SELECT ocel_id, ocel_time FROM "event_{table}"'):
+                    collector.event(event_id, activity, time)
+        for event_id, object_id in rows("SELECT ocel_event_id, ocel_object_id FROM event_object"):
+            code = collector.events.get(event_id)
+            if code is not None:
+                collector.e2o(code, object_id)
+    finally:
+        connection.close()
+
+def import_ocel(path, mapping=None) -> "ImportedLog":
+    """
+    Streams an OCEL 2.0 JSON, XML or SQLite log (by file extension, JSON and XML may be gzipped) into an ImportedLog.
+    mapping overrides entries of DEFAULT_MAPPING for logs with other activity, type or attribute names.
+    """
+    collector = _Collector(mapping)
+    name = path.lower()
+    if name.endswith(JSON_EXTENSIONS):
+        _read_json(path, collector)
+    elif name.endswith(XML_EXTENSIONS):
+        _read_xml(path, collector)
+    elif name.endswith(SQLITE_EXTENSIONS):
+        _read_sqlite(path, collector)
+    else:
+        raise ValueError(f"unknown OCEL format of {path}, expected one of {JSON_EXTENSIONS + XML_EXTENSIONS + SQLITE_EXTENSIONS}")
+    return collector.finish()
+
+
+def _expand(indptr, indices, rows):
+    """Positions into rows and neighbours of all CSR neighbourhoods of the given rows."""
+    counts = indptr[rows + 1] - indptr[rows]
+    position = np.repeat(np.arange(len(rows)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return position, indices[indptr[rows][position] + offsets]
+
+def _components(n, source, target):
+    """Smallest code of the connected component of every node of an undirected graph (label propagation)."""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[source], labels[target])
+        before = labels.copy()
+        np.minimum.at(labels, source, low)
+        np.minimum.at(labels, target, low)
+        labels = labels[labels]
+        if np.array_equal(labels, before):
+            return labels
+
+
+class ImportedLog:
+    """
+    Demand and delivery behaviour of an imported log as compact arrays:
+    demand: daily ordered quantity (days x materials) from the first to the last day with demand,
+    lines: one order line per item (and its split descendants) of a demand event, with material, placing day,
+    ordered quantity, number of delivery days and lead time (days to the last delivery),
+    shipments: one per delivered item, with its line, delay in days after placing and quantity.
+    """
+    ARRAYS = ("materials", "start_day", "demand",
+              "line_material", "line_placed", "line_quantity", "line_splits", "line_lead_time",
+              "shipment_line", "shipment_delay", "shipment_quantity")
+
+    @classmethod
+    def from_collector(cls, c: _Collector):
+        self = cls.__new__(cls)
+        item_codes = [code for name, code in c.types.items() if name == c.mapping["item_type"]]
+        object_type = np.frombuffer(c.object_type, dtype=np.int32)
+        is_item = np.isin(object_type, item_codes)
+        material = np.frombuffer(c.material, dtype=np.int64)
+        first_quantity = np.frombuffer(c.first_quantity, dtype=np.float64)
+        last_quantity = np.frombuffer(c.last_quantity, dtype=np.float64)
+        n = len(object_type)
+
+        # items split off each other form one line
+        source, target = np.frombuffer(c.o2o_source, dtype=np.int64), np.frombuffer(c.o2o_target, dtype=np.int64)
+        split = is_item[source] & is_item[target]
+        root = _components(n, source[split], target[split])
+        group_material = np.full(n, -1, dtype=np.int64)
+        np.maximum.at(group_material, root, material)
+
+        # items related to an event directly or through one object (order -> items, package -> items)
+        order = np.argsort(source, kind="stable")
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(source, minlength=n), out=indptr[1:])
+        e2o_event, e2o_object = np.frombuffer(c.e2o_event, dtype=np.int64), np.frombuffer(c.e2o_object, dtype=np.int64)
+        position, hop = _expand(indptr, target[order], e2o_object)
+        event = np.concatenate([e2o_event, e2o_event[position]])
+        item = np.concatenate([e2o_object, hop])
+        keep = is_item[item]
+        event, item = event[keep], item[keep]
+
+        event_kind = np.frombuffer(c.event_kind, dtype=np.int8)
+        event_day = np.array(c.event_day, dtype="datetime64[D]").astype(np.int64)
+
+        # order lines: one per (demand event, item group), the initial item is the largest of the group
+        demand = event_kind[event] == _DEMAND
+        keys, line_of_pair = np.unique(event[demand] * n + root[item[demand]], return_inverse=True)
+        line_event, line_root = keys // n, keys % n
+        line_quantity = np.zeros(len(keys))
+        np.maximum.at(line_quantity, line_of_pair, np.nan_to_num(first_quantity[item[demand]]))
+        # an item group placed twice belongs to its first line
+        by_day = np.lexsort((np.arange(len(keys)), event_day[line_event]))
+        first = np.full(n, len(keys))
+        np.minimum.at(first, line_root[by_day], np.arange(len(keys)))
+        line_of_root = np.append(by_day, -1)[first]
+        line_placed = event_day[line_event]
+        line_material = group_material[line_root]
+
+        # shipments: every item is delivered once, with the first delivery event reaching it after its line was placed
+        delivery = event_kind[event] == _DELIVERY
+        ship_item, ship_day = item[delivery], event_day[event[delivery]]
+        ship_line = line_of_root[root[ship_item]]
+        keep = (ship_line >= 0) & (ship_day >= line_placed[np.maximum(ship_line, 0)])
+        delivered = np.full(n, np.iinfo(np.int64).max)
+        np.minimum.at(delivered, ship_item[keep], ship_day[keep])
+        ship_item = np.flatnonzero(delivered < np.iinfo(np.int64).max)
+        ship_line = line_of_root[root[ship_item]]
+        ship_day = delivered[ship_item]
+
+        n_lines = len(keys)
+        line_splits = np.bincount(np.unique(ship_line * (ship_day.max(initial=0) + 1) + ship_day) // (ship_day.max(initial=0) + 1),
+                                  minlength=n_lines) if len(ship_line) else np.zeros(n_lines, dtype=np.int64)
+        last = np.full(n_lines, -1, dtype=np.int64)
+        np.maximum.at(last, ship_line, ship_day)
+
+        # lines without a material can not be assigned to a SKU
+        valid = line_material >= 0
+        remap = np.cumsum(valid) - 1
+        keep = valid[ship_line]
+        # SKUs in the order of the material labels, numbers before text
+        labels = sorted(c.materials, key=lambda label: (isinstance(label, str), label))
+        sku_of = np.empty(max(len(labels), 1), dtype=np.int64)
+        sku_of[[c.materials[label] for label in labels]] = np.arange(len(labels))
+        used = np.unique(sku_of[line_material[valid]])
+        line_sku = np.searchsorted(used, sku_of[line_material[valid]])
+
+        self.materials = np.array([str(labels[sku]) for sku in used], dtype=str)
+        self.line_material = line_sku.astype(np.int32)
+        self.line_placed = line_placed[valid]
+        self.line_quantity = line_quantity[valid]
+        self.line_splits = line_splits[valid]
+        self.line_lead_time = np.where(last[valid] >= 0, last[valid] - line_placed[valid], -1)
+        self.shipment_line = remap[ship_line[keep]]
+        self.shipment_delay = ship_day[keep] - line_placed[ship_line[keep]]
+        self.shipment_quantity = np.nan_to_num(last_quantity[ship_item[keep]])
+
+        self.start_day = np.int64(self.line_placed.min() if len(self.line_placed) else 0)
+        n_days = int(self.line_placed.max() - self.start_day + 1) if len(self.line_placed) else 0
+        self.demand = np.zeros((n_days, len(self.materials)))
+        np.add.at(self.demand, (self.line_placed - self.start_day, self.line_material), self.line_quantity)
+        return self
+
+    def save(self, path):
+        np.savez_compressed(path, **{name: getattr(self, name) for name in self.ARRAYS})
+        return path
+
+    @classmethod
+    def load(cls, path):
+        self = cls.__new__(cls)
+        with np.load(path) as data:
+            for name in cls.ARRAYS:
+                setattr(self, name, data[name])
+        return self
+
+    @property
+    def days(self):
+        return np.datetime64(int(self.start_day), "D") + np.arange(len(self.demand))
+
+    def demand_series(self) -> pd.DataFrame:
+        """Daily demand per material, one column per material label."""
+        return pd.DataFrame(self.demand, index=pd.DatetimeIndex(self.days, name="day"), columns=self.materials)
+
+    def _material(self, material):
+        match = np.flatnonzero(self.materials == str(_label(material)))
+        if not len(match):
+            raise KeyError(material)
+        return match[0]
+
+    def split_distribution(self, material) -> np.ndarray:
+        """Number of delivered order lines of the material per number of delivery days."""
+        lines = (self.line_material == self._material(material)) & (self.line_splits > 0)
+        return np.bincount(self.line_splits[lines])
+
+    def delay_distribution(self, material, weighted=True) -> np.ndarray:
+        """Delivered quantity (or number of shipments) of the material per whole day of delay after placing."""
+        ships = self.line_material[self.shipment_line] == self._material(material)
+        return np.bincount(self.shipment_delay[ships], weights=self.shipment_quantity[ships] if weighted else None)
+
+    def sku_configs(self, z_score=1.65, order_base_cost=50, holding_cost=1, kpi="order_completion", delivery_func="constant"):
+        """
+        Warehouse_SKU configs, one per material (ids in the order of materials): demand moments of the daily series,
+        split moments and histogram of the delivery days per line, and a reorder point covering the mean lead time
+        as Warehouse_SKU.update_safety_stock would after observing the log.
+        """
+        configs = []
+        for sku, label in enumerate(self.materials):
+            series = self.demand[:, sku]
+            lines = self.line_material == sku
+            splits = self.line_splits[lines & (self.line_splits > 0)]
+            lead = self.line_lead_time[lines & (self.line_lead_time >= 0)]
+            mean, std = float(series.mean()), float(series.std(ddof=1)) if len(series) > 1 else 0.0
+            lead_mean = float(lead.mean()) if len(lead) else 0.0
+            lead_std = float(lead.std(ddof=1)) if len(lead) > 1 else 0.0
+            safety_stock = z_score * math.sqrt(lead_mean * std**2 + mean * lead_std**2)
+            rop = round(lead_mean * mean + safety_stock)
+            configs.append({
+                "id": sku,
+                "material": str(label),
+                "rop": rop,
+                "eoq": 0,
+                "z_score": z_score,
+                "order_base_cost": order_base_cost,
+                "holding_cost": holding_cost,
+                "inventory": rop,
+                "mean_daily_demand": mean,
+                "std_daily_demand": std,
+                "delivery_split_centre": float(splits.mean()) if len(splits) else 1.0,
+                "delivery_split_std": float(splits.std(ddof=1)) if len(splits) > 1 else 0.0,
+                "delivery_split_hist": np.bincount(splits).tolist() if len(splits) else None,
+                "delivery_func": delivery_func,
+                "kpi": kpi,
+                "verbose": False,
+            })
+        return configs
+
+    def save_replay(self, path):
+        """Writes the daily demand as a replay file, columns are the SKU ids of sku_configs."""
+        return save_replay(path, self.demand, skus=range(len(self.materials)), start_date=self.days[0] if len(self.demand) else None,
+                           materials=self.materials.tolist())
+
+    def simulation_config(self, warehouse, output, seed=1, days=None, replay=None, loop=False):
+        """
+        Simulation config over the period of the log (or `days` from its first day) for a warehouse of sku_configs.
+        With a replay path the run replays the demand of the log (written there by save_replay) instead of drawing it,
+        more days than the log has need loop=True to repeat it.
+        """
+        if replay is not None and days and days > len(self.demand) and not loop:
+            raise ValueError(f"the log has {len(self.demand)} days of demand to replay, {days} were requested (or loop=True)")
+        config = {
+            "warehouse": warehouse,
+            "start_date": pd.Timestamp(self.days[0]).to_pydatetime() if len(self.demand) else pd.Timestamp.today().normalize().to_pydatetime(),
+            "days": days or len(self.demand),
+            "seed": seed,
+            "output": output,
+        }
+        if replay is not None:
+            config["demand"] = ReplayDemand(self.save_replay(replay), loop=loop)
+        return config
+
+
+def cached_import(path, mapping=None, cache_dir=IMPORT_CACHE_DIR):
+    """import_ocel, reusing the arrays saved in cache_dir while the log is unchanged."""
+    # logs of the same name in different directories get their own cache files
+    location = hashlib.sha1(os.path.realpath(path).encode()).hexdigest()[:8]
+    base = os.path.join(cache_dir, f"{os.path.basename(path)}.{location}")
+    suffix = f".{hashlib.sha1(json.dumps(mapping, sort_keys=True).encode()).hexdigest()[:8]}" if mapping else ""
+    cache = f"{base}{suffix}.import.npz"
+    if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+        return ImportedLog.load(cache)
+    imported = import_ocel(path, mapping)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        imported.save(cache)
+    except OSError:
+        # read-only location, the next import streams the log again
+        pass
+    return imported
@@ -0,0 +1,131 @@
+from datetime import datetime
+
+
+class Vocabulary:
+    """
+    Interns repeated strings (activities, qualifiers, resources, ...) as small integer codes.
+    Records only hold the codes, the strings are looked up again when serializing to OCEL JSON.
+    """
+    __slots__ = ("codes", "values")
+
+    def __init__(self, values=()):
+        self.codes = {}
+        self.values = []
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        value = str(value)
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+    def __len__(self):
+        return len(self.values)
+
+
+# Shared vocabularies of a run, the codes stay stable across orders
+ACTIVITIES = Vocabulary()
+QUALIFIERS = Vocabulary()
+RESOURCES = Vocabulary()
+OBJECT_TYPES = Vocabulary()
+ATTRIBUTE_NAMES = Vocabulary()
+
+
+class Relationship:
+    __slots__ = ("object_id", "qualifier")
+
+    def __init__(self, object_id, qualifier):
+        self.object_id = object_id
+        self.qualifier = QUALIFIERS.code(qualifier)
+
+    def to_json(self):
+        return {"objectId": self.object_id, "qualifier": QUALIFIERS[self.qualifier]}
+
+
+class Attribute:
+    """
+    Event attributes (time is None) hold an interned resource code as value,
+    object attributes keep their raw value together with the time it was set.
+    """
+    __slots__ = ("name", "value", "time")
+
+    def __init__(self, name, value, time=None):
+        self.name = ATTRIBUTE_NAMES.code(name)
+        self.time = time
+        self.value = RESOURCES.code(value) if time is None else value
+
+    def to_json(self):
+        if self.time is None:
+            return {"name": ATTRIBUTE_NAMES[self.name], "value": RESOURCES[self.value]}
+        return {"name": ATTRIBUTE_NAMES[self.name], "time": format_time(self.time), "value": self.value}
+
+
+class EventRecord:
+    __slots__ = ("id", "activity", "time", "attributes", "relationships")
+
+    def __init__(self, id, activity, time, attributes=(), relationships=()):
+        self.id = id
+        self.activity = ACTIVITIES.code(activity)
+        self.time = time
+        self.attributes = [Attribute(name, value) for name, value in attributes]
+        self.relationships = [Relationship(object_id, qualifier) for object_id, qualifier in relationships]
+
+    @property
+    def type(self):
+        return ACTIVITIES[self.activity]
+
+    def to_json(self):
+        return {
+            "id": self.id,
+            "type": ACTIVITIES[self.activity],
+            "time": format_time(self.time),
+            "attributes": [attr.to_json() for attr in self.attributes],
+            "relationships": [rel.to_json() for rel in self.relationships],
+        }
+
+
+class ObjectRecord:
+    __slots__ = ("id", "type_code", "attributes", "relationships")
+
+    def __init__(self, id, type, attributes=(), relationships=()):
+        self.id = id
+        self.type_code = OBJECT_TYPES.code(type)
+        self.attributes = [Attribute(name, value, time) for name, value, time in attributes]
+        self.relationships = [Relationship(object_id, qualifier) for object_id, qualifier in relationships]
+
+    @property
+    def type(self):
+        return OBJECT_TYPES[self.type_code]
+
+    def to_json(self):
+        return {
+            "id": self.id,
+            "type": OBJECT_TYPES[self.type_code],
+            "attributes": [attr.to_json() for attr in self.attributes],
+            "relationships": [rel.to_json() for rel in self.relationships],
+        }
+
+
+def format_time(timestamp):
+    if isinstance(timestamp, datetime):
+        return timestamp.strftime("%Y-%m-%dT%H:%M:%S")
+    return timestamp
+
+
+def records_to_ocel_json(object_types, event_types, objects, events):
+    """
+    Converts the compact records of an order into the OCEL 2.0 JSON layout.
+    """
+    return {
+        "objectTypes": object_types,
+        "eventTypes": event_types,
+        "objects": [obj.to_json() for obj in objects],
+        "events": [event.to_json() for event in events],
+    }
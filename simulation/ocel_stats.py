@@ -0,0 +1,82 @@
+import json
+import os
+
+from .ocel_records import ACTIVITIES, OBJECT_TYPES
+
+STATS_FILENAME = "ocel_stats.json"
+
+
+class OcelFileStats:
+    """Aggregates of the records written to one OCEL file."""
+    __slots__ = ("events", "relations", "activities", "object_ids", "type_activities")
+
+    def __init__(self, objects, events):
+        self.events = len(events)
+        self.relations = 0
+        self.activities = {}
+        # object ids per type code, ids can repeat (packages share the id of their date)
+        self.object_ids = {}
+        for obj in objects:
+            self.object_ids.setdefault(obj.type_code, set()).add(obj.id)
+        type_of = {oid: type_code for type_code, ids in self.object_ids.items() for oid in ids}
+        # (object type code, activity code) pairs connected by an event to object relationship
+        self.type_activities = set()
+        for event in events:
+            self.activities[event.activity] = self.activities.get(event.activity, 0) + 1
+            self.relations += len(event.relationships)
+            for rel in event.relationships:
+                type_code = type_of.get(rel.object_id)
+                if type_code is not None:
+                    self.type_activities.add((type_code, event.activity))
+
+
+class OcelStats:
+    """
+    Summary statistics of the OCEL of a run, maintained while the generator writes the order files,
+    so the Analysis page does not have to load the log. Stats are kept per file, a file that is written
+    again (orders placed on the same working day) replaces its previous stats like it replaces the file.
+    """
+    def __init__(self):
+        self.files = {}
+
+    def add(self, filename, objects, events):
+        self.files[filename] = OcelFileStats(objects, events)
+
+    def summary(self):
+        activities, object_ids, type_activities = {}, {}, set()
+        events = relations = 0
+        for stats in self.files.values():
+            events += stats.events
+            relations += stats.relations
+            for activity, count in stats.activities.items():
+                activities[activity] = activities.get(activity, 0) + count
+            for type_code, ids in stats.object_ids.items():
+                object_ids.setdefault(type_code, set()).update(ids)
+            type_activities |= stats.type_activities
+
+        activities_per_type = {}
+        for type_code, _ in type_activities:
+            activities_per_type[OBJECT_TYPES[type_code]] = activities_per_type.get(OBJECT_TYPES[type_code], 0) + 1
+        return {
+            "events": events,
+            "objects": sum(len(ids) for ids in object_ids.values()),
+            "relations": relations,
+            "activities": {ACTIVITIES[code]: count for code, count in activities.items()},
+            "object_types": {OBJECT_TYPES[code]: len(ids) for code, ids in object_ids.items()},
+            "activities_per_object_type": activities_per_type,
+        }
+
+    def save(self, output):
+        path = os.path.join(output, STATS_FILENAME)
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=4)
+        return path
+
+
+def load_stats(output):
+    """Summary written by OcelStats.save, None if the run has none."""
+    path = os.path.join(output, STATS_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
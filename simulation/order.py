@@ -1,21 +1,27 @@
 from datetime import datetime
 
 class Order_SKU: 
+    __slots__ = ('id', 'placed', 'quantity', 'delivery_split_centre', 'delivery_split_std', 'delivery_split_hist', 'delivery_func',
+                 'delivered_quantity', 'shipment_dates', 'shipment_quantities', 'complete', 'completed', 'verbose')
+
     def __init__(self, sku_id,  order_placed, config:dict, verbose=False ):
 
-        keys={'quantity', 'delivery_split_centre', 'delivery_split_std','delivery_func' }
+        keys={'quantity', 'delivery_split_centre', 'delivery_split_std', 'delivery_split_hist', 'delivery_func' }
         for key in keys:
             setattr(self, key, config.get(key))
 
         self.id = sku_id
         self.placed = order_placed
         self.delivered_quantity = 0
-        self.shipments = []
+        # delivery dates and quantities of the shipments of this line, the Shipment objects are not kept
+        self.shipment_dates = []
+        self.shipment_quantities = []
         self.complete = False
         self.verbose = verbose
 
     def update(self, shipment):
-        self.shipments.append(shipment)
+        self.shipment_dates.append(shipment.delivery_date)
+        self.shipment_quantities.append(shipment.SKUs[self.id])
         self.delivered_quantity += shipment.SKUs[self.id]
 
         if self.quantity == self.delivered_quantity:
@@ -23,6 +29,8 @@ class Order_SKU:
             self.completed = shipment.delivery_date
 
 class Order:
+    __slots__ = ('id', 'placed', 'complete', 'SKUs')
+
     def __init__(self, id, order_placed, sku_configs):
         self.id = id
         self.placed = order_placed
@@ -42,6 +50,8 @@ class Order:
         
         
 class Shipment:
+    __slots__ = ('ship_id', 'order_id', 'SKUs', 'delivery_date')
+
     def __init__(self,ship_id, order_id, goods, delivery_date):
         self.ship_id = ship_id
         self.order_id = order_id
@@ -0,0 +1,57 @@
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class PhaseProfiler:
+    """
+    Collects wall time and call counts per named phase with perf_counter spans.
+    Nested spans are reported exclusively, i.e. the time of an inner span is not counted for the outer one,
+    so the phase times add up to the instrumented total.
+    """
+    def __init__(self):
+        self.times = {}
+        self.calls = {}
+        self.counters = {}
+        self._children = []
+
+    @contextmanager
+    def span(self, name):
+        self._children.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            child_time = self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+            self.times[name] = self.times.get(name, 0.0) + elapsed - child_time
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self):
+        return {
+            "phase_times": dict(self.times),
+            "phase_calls": dict(self.calls),
+            "counters": dict(self.counters),
+        }
+
+
+class NullProfiler:
+    """Drop-in replacement used when profiling is disabled."""
+    _context = nullcontext()
+
+    def span(self, name):
+        return self._context
+
+    def count(self, name, n=1):
+        pass
+
+    def report(self):
+        return {"phase_times": {}, "phase_calls": {}, "counters": {}}
+
+
+def make_profiler(enabled):
+    return PhaseProfiler() if enabled else NullProfiler()
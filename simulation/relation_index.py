@@ -0,0 +1,236 @@
+# relation_index.py
+import os
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from .ocel_records import ACTIVITIES, OBJECT_TYPES, QUALIFIERS, ATTRIBUTE_NAMES
+
+INDEX_FILENAME = "relation_index.npz"
+
+# object to object qualifiers pointing from a split item to the items it was split into
+LINEAGE_QUALIFIERS = ("Split item out stock", "Split item deliver")
+
+
+def _csr(src, n_src):
+    """indptr and edge order of a CSR adjacency of edges with the given source rows, stable within a row."""
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(n_src + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n_src), out=indptr[1:])
+    return indptr, order
+
+def _lookup(sorted_ids, values):
+    """Codes of the values in sorted_ids, -1 for values that are not in it."""
+    values = np.asarray(values, dtype=sorted_ids.dtype if len(sorted_ids) else str)
+    if not len(sorted_ids):
+        return np.full(len(values), -1)
+    pos = np.minimum(np.searchsorted(sorted_ids, values), len(sorted_ids) - 1)
+    return np.where(sorted_ids[pos] == values, pos, -1)
+
+
+class RelationIndexBuilder:
+    """
+    Collects the event to object and object to object relations of the OCEL files written by the generator.
+    Like OcelStats it keeps them per file, so a file written again replaces its relations.
+    """
+    def __init__(self):
+        self.files = {}
+
+    def add(self, filename, objects, events):
+        e2o = [(event.id, rel.object_id, rel.qualifier) for event in events for rel in event.relationships]
+        o2o = [(obj.id, rel.object_id, rel.qualifier) for obj in objects for rel in obj.relationships]
+        self.files[filename] = (
+            [(event.id, event.activity, event.time) for event in events],
+            [(obj.id, obj.type_code, *self._quantities(obj)) for obj in objects],
+            e2o,
+            o2o,
+        )
+
+    @staticmethod
+    def _quantities(obj):
+        """Last amount and material id of an object record, NaN and -1 if it has none."""
+        values = {ATTRIBUTE_NAMES[attr.name]: attr.value for attr in obj.attributes}
+        return float(values.get("amount", np.nan)), int(values.get("material_id", -1))
+
+    def build(self):
+        # events are grouped by the file (order) that wrote them
+        events = [(*event, group) for group, file in enumerate(self.files.values()) for event in file[0]]
+        objects = [obj for file in self.files.values() for obj in file[1]]
+        e2o = [rel for file in self.files.values() for rel in file[2]]
+        o2o = [rel for file in self.files.values() for rel in file[3]]
+        return RelationIndex.from_relations(events, objects, e2o, o2o)
+
+    def save(self, output):
+        return self.build().save(os.path.join(output, INDEX_FILENAME))
+
+
+class RelationIndex:
+    """
+    Event <-> object and object <-> object (split lineage, items of orders and packages) relations of a run
+    as CSR adjacency arrays over integer ids. Event and object ids are sorted, so an id is found by
+    binary search and every neighbourhood query is a slice of the adjacency, O(log n + degree).
+    Relations to objects that are not in the log are dropped and duplicate relations are merged. Objects written
+    more than once (packages of the same day share their id) keep the relations of all their records,
+    where pm4py keeps the object to object relations of one of them.
+    """
+    ARRAYS = ("event_ids", "event_activity", "event_time", "event_group", "object_ids", "object_type", "object_amount", "object_material",
+              "e2o_indptr", "e2o_indices", "e2o_qualifier", "o2e_indptr", "o2e_indices",
+              "o2o_indptr", "o2o_indices", "o2o_qualifier", "o2o_in_indptr", "o2o_in_indices", "o2o_in_qualifier",
+              "activities", "object_types", "qualifiers")
+
+    @classmethod
+    def from_relations(cls, events, objects, e2o, o2o):
+        """
+        events: (id, activity code, time, group), objects: (id, type code, amount, material id),
+        e2o: (event id, object id, qualifier code), o2o: (object id, object id, qualifier code).
+        """
+        self = cls.__new__(cls)
+        event_ids, first = np.unique(np.array([e[0] for e in events], dtype=str), return_index=True)
+        self.event_ids = event_ids
+        self.event_activity = np.array([events[i][1] for i in first], dtype=np.int32)
+        self.event_time = np.array([events[i][2] for i in first], dtype="datetime64[ns]")
+        # events written by the same generator call (one order), tells apart orders sharing a package id
+        self.event_group = np.array([events[i][3] for i in first], dtype=np.int32)
+        object_ids, first = np.unique(np.array([o[0] for o in objects], dtype=str), return_index=True)
+        self.object_ids = object_ids
+        self.object_type = np.array([objects[i][1] for i in first], dtype=np.int32)
+        # quantities of the last record of an object that has any
+        self.object_amount = np.full(len(object_ids), np.nan)
+        self.object_material = np.full(len(object_ids), -1, dtype=np.int64)
+        if objects:
+            codes = _lookup(object_ids, [o[0] for o in objects])
+            amount = np.array([o[2] for o in objects], dtype=float)
+            material = np.array([o[3] for o in objects], dtype=np.int64)
+            has_amount, has_material = ~np.isnan(amount), material >= 0
+            self.object_amount[codes[has_amount]] = amount[has_amount]
+            self.object_material[codes[has_material]] = material[has_material]
+        n_events, n_objects = len(self.event_ids), len(self.object_ids)
+
+        def edges(relations, src_ids, dst_ids):
+            src = _lookup(src_ids, [r[0] for r in relations])
+            dst = _lookup(dst_ids, [r[1] for r in relations])
+            qualifier = np.array([r[2] for r in relations], dtype=np.int32)
+            keep = (src >= 0) & (dst >= 0)
+            src, dst, qualifier = src[keep], dst[keep], qualifier[keep]
+            # one relation per pair, the first qualifier wins
+            _, unique = np.unique(src.astype(np.int64) * max(len(dst_ids), 1) + dst, return_index=True)
+            unique.sort()
+            return src[unique], dst[unique], qualifier[unique]
+
+        src, dst, qualifier = edges(e2o, self.event_ids, self.object_ids)
+        self.e2o_indptr, order = _csr(src, n_events)
+        self.e2o_indices, self.e2o_qualifier = dst[order], qualifier[order]
+        self.o2e_indptr, order = _csr(dst, n_objects)
+        self.o2e_indices = src[order]
+
+        src, dst, qualifier = edges(o2o, self.object_ids, self.object_ids)
+        self.o2o_indptr, order = _csr(src, n_objects)
+        self.o2o_indices, self.o2o_qualifier = dst[order], qualifier[order]
+        self.o2o_in_indptr, order = _csr(dst, n_objects)
+        self.o2o_in_indices, self.o2o_in_qualifier = src[order], qualifier[order]
+
+        self.activities = np.array(ACTIVITIES.values, dtype=str)
+        self.object_types = np.array(OBJECT_TYPES.values, dtype=str)
+        self.qualifiers = np.array(QUALIFIERS.values, dtype=str)
+        return self
+
+    def save(self, path):
+        np.savez_compressed(path, **{name: getattr(self, name) for name in self.ARRAYS})
+        return path
+
+    @classmethod
+    def load(cls, path):
+        self = cls.__new__(cls)
+        with np.load(path) as data:
+            for name in cls.ARRAYS:
+                setattr(self, name, data[name])
+        return self
+
+    def _object(self, object_id):
+        code = _lookup(self.object_ids, [object_id])[0]
+        if code < 0:
+            raise KeyError(object_id)
+        return code
+
+    def _event(self, event_id):
+        code = _lookup(self.event_ids, [event_id])[0]
+        if code < 0:
+            raise KeyError(event_id)
+        return code
+
+    def events_of(self, object_id):
+        """Ids of the events related to an object, in time order."""
+        code = self._object(object_id)
+        events = self.o2e_indices[self.o2e_indptr[code]:self.o2e_indptr[code + 1]]
+        return self.event_ids[events[np.argsort(self.event_time[events], kind="stable")]]
+
+    def objects_of(self, event_id):
+        code = self._event(event_id)
+        return self.object_ids[self.e2o_indices[self.e2o_indptr[code]:self.e2o_indptr[code + 1]]]
+
+    def related(self, object_id, qualifiers=None, reverse=False):
+        """
+        Objects the object points to (or with reverse=True, that point to it) in the object to object relations,
+        optionally only over relations with one of the given qualifiers.
+        """
+        return self.object_ids[self._related(self._object(object_id), qualifiers, reverse)]
+
+    def _related(self, code, qualifiers=None, reverse=False):
+        indptr, indices, qualifier = ((self.o2o_in_indptr, self.o2o_in_indices, self.o2o_in_qualifier) if reverse
+                                      else (self.o2o_indptr, self.o2o_indices, self.o2o_qualifier))
+        neighbours = indices[indptr[code]:indptr[code + 1]]
+        if qualifiers is not None:
+            neighbours = neighbours[np.isin(qualifier[indptr[code]:indptr[code + 1]], self._qualifier_codes(qualifiers))]
+        return neighbours
+
+    def _qualifier_codes(self, qualifiers):
+        return np.flatnonzero(np.isin(self.qualifiers, list(qualifiers)))
+
+    def _lineage(self, code):
+        seen, queue = {code}, deque([code])
+        while queue:
+            for child in self._related(queue.popleft(), LINEAGE_QUALIFIERS):
+                if child not in seen:
+                    seen.add(child)
+                    queue.append(child)
+        return np.array(sorted(seen), dtype=np.int64)
+
+    def lineage(self, object_id):
+        """The object and all items split off it, transitively."""
+        return self.object_ids[self._lineage(self._object(object_id))]
+
+    def lineage_events(self, object_id):
+        """Ids of all events touching the object or one of its split descendants, in time order."""
+        objects = self._lineage(self._object(object_id))
+        events = np.unique(np.concatenate([self.o2e_indices[self.o2e_indptr[o]:self.o2e_indptr[o + 1]] for o in objects]))
+        return self.event_ids[events[np.argsort(self.event_time[events], kind="stable")]]
+
+    def objects_of_type(self, object_ids, object_type):
+        codes = np.flatnonzero(self.object_types == object_type)
+        return np.asarray(object_ids)[np.isin(self.object_type[_lookup(self.object_ids, object_ids)], codes)]
+
+    def packages_of(self, order_id):
+        """Packages that ship the items of an order or any of their split descendants."""
+        items = self._related(self._object(order_id))
+        lineage = np.unique(np.concatenate([self._lineage(item) for item in items])) if len(items) else items
+        packages = np.unique(np.concatenate([self._related(item, reverse=True) for item in lineage])) if len(lineage) else lineage
+        return self.objects_of_type(self.object_ids[packages], "Package")
+
+    def describe_events(self, event_ids):
+        """Activity and time of the given events as a DataFrame."""
+        codes = _lookup(self.event_ids, event_ids)
+        return pd.DataFrame({"event": self.event_ids[codes], "activity": self.activities[self.event_activity[codes]],
+                             "time": self.event_time[codes]})
+
+    def degree(self):
+        """Number of related objects per event and related events per object."""
+        return np.diff(self.e2o_indptr), np.diff(self.o2e_indptr)
+
+
+def load_index(output):
+    """Index written with the run, None if the run has none."""
+    path = os.path.join(output, INDEX_FILENAME)
+    if not os.path.exists(path):
+        return None
+    return RelationIndex.load(path)
@@ -0,0 +1,130 @@
+# scaling.py
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ["days", "n_skus", "split_centre"]
+
+# candidate complexity classes, y = a + b * f(x)
+MODELS = {
+    "linear": lambda x: x,
+    "n log n": lambda x: x * np.log(x),
+    "quadratic": lambda x: x ** 2,
+}
+
+def _scale(dimension, values):
+    """
+    split_centre 0 still means one delivery day, so the split dimension is measured in delivery days
+    (split_centre + 1) to keep it positive for the log and the n log n model.
+    """
+    values = np.asarray(values, dtype=float)
+    return values + 1 if dimension == "split_centre" else values
+
+def fit_exponent(x, y) -> float:
+    """Slope of the least squares line through (log x, log y), i.e. k of y ~ x^k."""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    mask = (x > 0) & (y > 0)
+    if np.unique(x[mask]).size < 2:
+        return np.nan
+    return float(np.polyfit(np.log(x[mask]), np.log(y[mask]), 1)[0])
+
+def fit_complexity(x, y) -> Dict:
+    """
+    Fits every model of MODELS and returns the one with the smallest residual sum of squares
+    (ties go to the simpler model) together with its r2.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if np.unique(x).size < 3:
+        return {"model": None, "r2": np.nan}
+    best = {"model": None, "r2": np.nan, "sse": np.inf}
+    sst = float(((y - y.mean()) ** 2).sum())
+    for name, f in MODELS.items():
+        A = np.column_stack([np.ones_like(x), f(x)])
+        coef, *_ = np.linalg.lstsq(A, y, rcond=None)
+        if coef[1] < 0:
+            continue
+        sse = float(((A @ coef - y) ** 2).sum())
+        if sse < best["sse"] * 0.95:
+            best = {"model": name, "r2": 1 - sse / sst if sst > 0 else 1.0, "sse": sse}
+    best.pop("sse")
+    return best
+
+def scaling_report(summary: pd.DataFrame, metrics: Iterable[str] = ("mean", "output_mb", "peak_traced_mb")) -> pd.DataFrame:
+    """
+    Per metric and dimension: the median log-log exponent and the best fitting complexity class over all
+    slices of the grid where the other two dimensions are held fixed.
+    """
+    rows = []
+    for metric in metrics:
+        if metric not in summary.columns:
+            continue
+        for dim in DIMENSIONS:
+            others = [d for d in DIMENSIONS if d != dim]
+            exponents, models, r2s = [], [], []
+            for _, group in summary.groupby(others):
+                group = group.sort_values(dim)
+                x = _scale(dim, group[dim])
+                exponents.append(fit_exponent(x, group[metric]))
+                fit = fit_complexity(x, group[metric])
+                if fit["model"] is not None:
+                    models.append(fit["model"])
+                    r2s.append(fit["r2"])
+            exponents = [e for e in exponents if e == e]
+            if not exponents:
+                continue
+            rows.append({
+                "metric": metric,
+                "dimension": dim,
+                "exponent": float(np.median(exponents)),
+                "model": max(set(models), key=models.count) if models else None,
+                "r2": float(np.median(r2s)) if r2s else np.nan,
+                "slices": len(exponents),
+            })
+    return pd.DataFrame(rows, columns=["metric", "dimension", "exponent", "model", "r2", "slices"])
+
+class ScalingModel:
+    """
+    Multiplicative power law  y = c * days^a * n_skus^b * (split_centre + 1)^g  fitted in log space over the
+    whole grid, used to extrapolate a metric to configs that were not benchmarked.
+    Dimensions with a single value in the grid get exponent 0.
+    """
+    def __init__(self, metric: str = "mean"):
+        self.metric = metric
+        self.coef = None
+        self.exponents = {}
+        self.r2 = np.nan
+
+    def fit(self, summary: pd.DataFrame):
+        data = summary[summary[self.metric] > 0]
+        dims = [d for d in DIMENSIONS if data[d].nunique() > 1 and (_scale(d, data[d]) > 0).all()]
+        A = np.column_stack([np.ones(len(data))] + [np.log(_scale(d, data[d])) for d in dims])
+        y = np.log(data[self.metric].to_numpy(dtype=float))
+        if len(data) < A.shape[1]:
+            raise ValueError(f"Not enough benchmark configs to fit {self.metric}")
+        coef, *_ = np.linalg.lstsq(A, y, rcond=None)
+        self.coef = coef[0]
+        self.exponents = {d: 0.0 for d in DIMENSIONS}
+        self.exponents.update(dict(zip(dims, coef[1:])))
+        residuals = y - A @ coef
+        sst = ((y - y.mean()) ** 2).sum()
+        self.r2 = float(1 - (residuals ** 2).sum() / sst) if sst > 0 else 1.0
+        return self
+
+    def predict(self, days, n_skus, split_centre):
+        if self.coef is None:
+            raise ValueError("ScalingModel has not been fitted")
+        log_y = self.coef
+        for dim, value in zip(DIMENSIONS, (days, n_skus, split_centre)):
+            log_y = log_y + self.exponents[dim] * np.log(_scale(dim, value))
+        return np.exp(log_y)
+
+def predict_configs(summary: pd.DataFrame, configs: List[Dict], metrics: Iterable[str] = ("mean", "output_mb")) -> pd.DataFrame:
+    """Extrapolates each metric to the given configs (dicts with days, n_skus and split_centre)."""
+    out = pd.DataFrame(configs, columns=DIMENSIONS)
+    for metric in metrics:
+        if metric not in summary.columns:
+            continue
+        model = ScalingModel(metric).fit(summary)
+        out[f"predicted_{metric}"] = model.predict(out["days"], out["n_skus"], out["split_centre"])
+    return out
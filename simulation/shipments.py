@@ -0,0 +1,139 @@
+# shipments.py
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+DAY_NS = 86400 * 10**9
+PERCENTILES = (50, 90, 95, 99)
+
+
+class _Columns:
+    """Append-only numpy columns that double their capacity when full."""
+    def __init__(self, dtypes: Dict[str, str], capacity=1024):
+        self._data = {name: np.empty(capacity, dtype=dtype) for name, dtype in dtypes.items()}
+        self.size = 0
+
+    def append(self, **values):
+        if self.size == len(next(iter(self._data.values()))):
+            for name, column in self._data.items():
+                self._data[name] = np.concatenate([column, np.empty_like(column)])
+        for name, value in values.items():
+            self._data[name][self.size] = value
+        self.size += 1
+        return self.size - 1
+
+    def __getitem__(self, name):
+        return self._data[name][:self.size]
+
+    def __len__(self):
+        return self.size
+
+
+def _ns(timestamp):
+    # delivery dates parsed from the OCEL are UTC aware, placing dates are naive with the same wall clock
+    return pd.Timestamp(timestamp).value
+
+
+class ShipmentTable:
+    """
+    Columnar record of the order lines (order id, SKU, placed, ordered quantity) and of the shipments
+    delivered for them (line, delivered, quantity) of a run. Lead times are derived from the columns
+    in bulk, no per shipment objects are kept.
+    """
+    def __init__(self):
+        self.lines = _Columns({"order_id": "int64", "sku": "int64", "placed": "int64", "ordered": "float64"})
+        self.shipments = _Columns({"line": "int64", "delivered": "int64", "quantity": "float64"})
+        self._line_of = {}
+
+    def add_order_line(self, order_id, sku, placed, quantity):
+        line = self.lines.append(order_id=order_id, sku=sku, placed=_ns(placed), ordered=quantity)
+        self._line_of[(order_id, sku)] = line
+        return line
+
+    def add_shipment(self, order_id, sku, delivered, quantity):
+        return self.shipments.append(line=self._line_of[(order_id, sku)], delivered=_ns(delivered), quantity=quantity)
+
+    def frame(self) -> pd.DataFrame:
+        """One row per shipment with the order id, SKU, placed and delivered timestamps and quantity."""
+        line = self.shipments["line"]
+        return pd.DataFrame({
+            "order_id": self.lines["order_id"][line],
+            "sku": self.lines["sku"][line],
+            "placed": self.lines["placed"][line].view("datetime64[ns]"),
+            "delivered": self.shipments["delivered"].view("datetime64[ns]"),
+            "quantity": self.shipments["quantity"],
+        })
+
+    def order_lines(self) -> pd.DataFrame:
+        """
+        Lead time metrics per order line, delays in days between the calendar days of placing and delivery
+        as in Warehouse_SKU.evaluate_order: lead_time (order completion, last delivery), mean_delay
+        (item completion, mean over shipments) and weighted_delay (mean over the delivered quantity).
+        """
+        n = len(self.lines)
+        line, quantity = self.shipments["line"], self.shipments["quantity"]
+        placed_day = self.lines["placed"] // DAY_NS
+        delay = (self.shipments["delivered"] // DAY_NS - placed_day[line]).astype(float)
+
+        shipments = np.bincount(line, minlength=n)
+        delivered = np.bincount(line, weights=quantity, minlength=n)
+        last = np.full(n, -np.inf)
+        np.maximum.at(last, line, delay)
+        first = np.full(n, np.inf)
+        np.minimum.at(first, line, delay)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_delay = np.bincount(line, weights=delay, minlength=n) / shipments
+            weighted_delay = np.bincount(line, weights=delay * quantity, minlength=n) / delivered
+        has_shipment = shipments > 0
+        return pd.DataFrame({
+            "order_id": self.lines["order_id"],
+            "sku": self.lines["sku"],
+            "placed": self.lines["placed"].view("datetime64[ns]"),
+            "ordered": self.lines["ordered"],
+            "delivered": delivered,
+            "shipments": shipments,
+            "complete": delivered >= self.lines["ordered"],
+            "first_delay": np.where(has_shipment, first, np.nan),
+            "lead_time": np.where(has_shipment, last, np.nan),
+            "mean_delay": np.where(has_shipment, mean_delay, np.nan),
+            "weighted_delay": np.where(has_shipment, weighted_delay, np.nan),
+        })
+
+    def summary(self, by_sku=True, percentiles: Sequence[int] = PERCENTILES) -> pd.DataFrame:
+        """
+        Lead time distribution statistics of the completed order lines, globally (sku 'all') and per SKU.
+        weighted_delay is the quantity weighted delay over all delivered shipments.
+        """
+        lines = self.order_lines()
+        lines["weighted_days"] = lines["weighted_delay"].fillna(0) * lines["delivered"]
+        lines["done_lead_time"] = lines["lead_time"].where(lines["complete"])
+        lines["done_shipments"] = lines["shipments"].where(lines["complete"])
+        keys = [pd.Series("all", index=lines.index, name="sku")] + ([lines["sku"].astype(object)] if by_sku else [])
+
+        frames = []
+        for key in keys:
+            grouped = lines.groupby(key, sort=True)
+            lead_time = grouped["done_lead_time"]
+            frame = pd.DataFrame({
+                "order_lines": grouped.size(),
+                "completed": lead_time.count(),
+                "mean_lead_time": lead_time.mean(),
+                "std_lead_time": lead_time.std(),
+                "max_lead_time": lead_time.max(),
+                "mean_order_size": grouped["ordered"].mean(),
+                "mean_shipments": grouped["done_shipments"].mean(),
+                "weighted_delay": grouped["weighted_days"].sum() / grouped["delivered"].sum().replace(0, np.nan),
+            })
+            for p in percentiles:
+                frame[f"p{p}_lead_time"] = lead_time.quantile(p / 100)
+            frames.append(frame)
+        return pd.concat(frames).rename_axis("sku").reset_index()
+
+    def distribution(self, sku: Optional[int] = None, metric="lead_time") -> pd.Series:
+        """Number of completed order lines per whole day of a metric of order_lines, optionally of one SKU."""
+        lines = self.order_lines()
+        lines = lines[lines["complete"] & ((lines["sku"] == sku) if sku is not None else True)]
+        days = np.floor(lines[metric].to_numpy()).astype(np.int64)
+        counts = np.bincount(days) if len(days) else np.array([], dtype=np.int64)
+        return pd.Series(counts, index=pd.RangeIndex(len(counts), name="days"), name="order_lines")
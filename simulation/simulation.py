@@ -4,19 +4,37 @@ from datetime import datetime, date, time, timedelta
 import matplotlib.pyplot as plt
 import pm4py as pm 
 import time
+import os
 from .warehouse import Warehouse
 from .order import Order, Shipment
 from .OCEL_FormatGenerator import generate_ocel_event_log, adjust_to_working_hours
+from .checkpoint import save_checkpoint, load_checkpoint
+from .profiling import make_profiler
+from .estimator import estimate_run, enforce_budget
+from .ocel_stats import OcelStats
+from .relation_index import RelationIndexBuilder
+from .downsampling import MultiResolutionSeries, lttb
+from .demand import BLOCK_DAYS
+
+INVENTORY_FILENAME = "inventory_levels.npz"
 
 class Simulation:
     def __init__(
         self, config:dict ):
-        keys= ['start_date', 'days', 'warehouse', 'seed', 'mean_daily_demand','std_daily_demand', 'delivery_split_centre', 'delivery_split_std', 'output','verbose']
+        keys= ['start_date', 'days', 'warehouse', 'seed', 'mean_daily_demand','std_daily_demand', 'delivery_split_centre', 'delivery_split_std', 'output','verbose', 'profile', 'budget', 'budget_action', 'demand']
         for key in keys:
             setattr(self, key, config.get(key))
+        # per phase timings, a no-op unless the run is configured with 'profile': True
+        self.profiler = make_profiler(self.profile)
         
         self.current_date = self.start_date
+        # index of the next day to simulate, lets a restored run continue where it stopped
+        self.current_day = 0
         self.shipment_schedule = []
+        # summary of the generated OCEL, written next to the order files at the end of the run
+        self.ocel_stats = OcelStats()
+        # event/object relations of the generated OCEL, saved as a CSR index at the end of the run
+        self.relation_index = RelationIndexBuilder()
         self.global_backorders = 0
         self.global_fulfilled_demand = 0
         self.total_demand = 0
@@ -42,18 +60,35 @@ class Simulation:
                 'total_holding_costs' : 0,
             }
         self.sku_results={}
+        # optional DemandSource (e.g. ReplayDemand), the SKUs draw normal demand without one
+        if self.demand is not None:
+            self.demand.bind(self.warehouse.SKUs, seed=self.seed, days=self.days)
+        self.demand_block = None
+        self.demand_block_start = 0
     
     def simulate_order(self, order):
         if self.verbose:
             print(f"generate order {order.id} with quantity {order.quantity}")
         ocel_config = {}
         for sku_id, sku in order.SKUs.items():
-            delivery_days = max(1, int(np.random.normal(sku.delivery_split_centre, sku.delivery_split_std)))
+            if sku.delivery_split_hist:
+                # empirical number of delivery days, e.g. of an imported log
+                hist = np.asarray(sku.delivery_split_hist, dtype=float)
+                delivery_days = max(1, int(np.random.choice(len(hist), p=hist / hist.sum())))
+            else:
+                delivery_days = max(1, int(np.random.normal(sku.delivery_split_centre, sku.delivery_split_std)))
             ocel_config[sku_id] = {'amount': sku.quantity, 'del_days': delivery_days, 'func':  sku.delivery_func}
-        generate_ocel_event_log(start_date=self.current_date, items=ocel_config, iteration=order.id, output=self.output)
+        with self.profiler.span("generate_ocel_event_log"):
+            generate_ocel_event_log(start_date=self.current_date, items=ocel_config, iteration=order.id, output=self.output, profiler=self.profiler, stats=self.ocel_stats, index=self.relation_index)
         
         date_str = adjust_to_working_hours(self.current_date).strftime("%Y-%m-%d")
-        ocel = pm.read_ocel2_json(f"{self.output}/OrderProcess_{date_str}.json")
+        with self.profiler.span("read_ocel"):
+            ocel = pm.read_ocel2_json(f"{self.output}/OrderProcess_{date_str}.json")
+        self.profiler.count("orders")
+        with self.profiler.span("extract_shipments"):
+            self.extract_shipments(ocel, order)
+
+    def extract_shipments(self, ocel, order):
         filtered_ocel = pm.filter_ocel_event_attribute(ocel,'ocel:activity',['Deliver Package'])
 
         relations_with_timestamps = filtered_ocel.events.merge(filtered_ocel.relations, on="ocel:eid", ).drop(columns=['company',
@@ -70,6 +105,7 @@ class Simulation:
                 goods[int(item_obj['material_id'].values[0])] = item_obj["amount"].values[0]
 
             self.shipment_schedule.append(Shipment(ship_id=id, order_id=order.id, goods=goods, delivery_date=shipment["ocel:timestamp_x"].to_pydatetime()))
+            self.profiler.count("shipments")
     
     def simulate_deliveries(self):
         # 1. receive any delivereies
@@ -81,16 +117,30 @@ class Simulation:
 
     def simulate_demand(self):
         demands = {}
-        for sku_id,sku in self.warehouse.SKUs.items():
-            demands[sku_id] = max(0, int(np.random.normal(sku.mean_daily_demand, sku.std_daily_demand))) 
-        demand_today = sum(demands.values())
-        fulfilled_demand_today, backorders_today = self.warehouse.consume_inventory(self.current_date, demands)
+        with self.profiler.span("demand_draw"):
+            if self.demand is not None:
+                demands = self.demand_of_day(self.current_day - 1)
+            else:
+                for sku_id,sku in self.warehouse.SKUs.items():
+                    demands[sku_id] = max(0, int(np.random.normal(sku.mean_daily_demand, sku.std_daily_demand))) 
+            demand_today = sum(demands.values())
+        with self.profiler.span("consume_inventory"):
+            fulfilled_demand_today, backorders_today = self.warehouse.consume_inventory(self.current_date, demands)
         
-        order = self.warehouse.monitor_inventory(self.current_date)
+        with self.profiler.span("monitor_inventory"):
+            order = self.warehouse.monitor_inventory(self.current_date)
         if order:
             self.simulate_order(order)
         return demand_today, fulfilled_demand_today, backorders_today       
     
+    def demand_of_day(self, day):
+        """Demand per SKU of a day of the run from the demand source, fetched BLOCK_DAYS days at a time."""
+        offset = day - self.demand_block_start
+        if self.demand_block is None or not 0 <= offset < len(self.demand_block):
+            self.demand_block = self.demand.block(day, BLOCK_DAYS)
+            self.demand_block_start, offset = day, 0
+        return dict(zip(self.warehouse.SKUs.keys(), self.demand_block[offset].tolist()))
+
     def collect_global_data(self, demand_today, fulfilled_demand_today, backorders_today):
         self.total_demand += demand_today
         self.global_fulfilled_demand += fulfilled_demand_today
@@ -114,22 +164,69 @@ class Simulation:
         self.sku_data[sku]['past_eoqs'].append(self.warehouse.SKUs[sku].eoq)
         self.sku_data[sku]['past_safety_stock'].append(self.warehouse.SKUs[sku].safety_stock)
             
-    def run(self):
-        np.random.seed(self.seed)
+    def run(self, until=None, on_progress=None, progress_every=1):
+        """
+        Simulates from the current day up to (excluding) day `until`, by default the configured `days`.
+        Calling run again, e.g. after restore() or after raising `days`, continues the run.
+        on_progress(simulation) is called every `progress_every` days and after the last day.
+        """
+        if self.current_day == 0:
+            # 'budget' limits the estimated output (e.g. {'events': 1e6}); 'budget_action': 'refuse' raises instead of warning
+            if self.budget:
+                enforce_budget(self.estimate(), self.budget, refuse=self.budget_action == "refuse")
+            np.random.seed(self.seed)
         if self.verbose:
             print(f'start sim at {self.current_date}')
-        for day in range(self.days):
+        end = self.days if until is None else min(until, self.days)
+        for day in range(self.current_day, end):
+            self.current_day = day + 1
             self.current_date = self.start_date + timedelta(days=day)
 
-            self.simulate_deliveries()
+            with self.profiler.span("simulate_deliveries"):
+                self.simulate_deliveries()
             demand_today, fulfilled_demand_today, backorders_today = self.simulate_demand()
             
-            self.collect_global_data(demand_today, fulfilled_demand_today, backorders_today)
-            for sku in self.warehouse.SKUs.keys():
-                self.collect_sku_data(sku)
+            with self.profiler.span("collect_data"):
+                self.collect_global_data(demand_today, fulfilled_demand_today, backorders_today)
+                for sku in self.warehouse.SKUs.keys():
+                    self.collect_sku_data(sku)
+
+            if on_progress is not None and (self.current_day % progress_every == 0 or self.current_day == end):
+                on_progress(self)
+
+        if self.current_day == self.days:
+            self.ocel_stats.save(self.output)
+            self.relation_index.save(self.output)
+            self.inventory_levels().save(os.path.join(self.output, INVENTORY_FILENAME))
 
             
 
+    def inventory_levels(self, base_points=2000):
+        """Multi-resolution (min/max downsampled) global and per SKU inventory histories, x is the day index."""
+        series = {
+            'on_hand': self.global_inventory_history_on_hand,
+            'in_transit': self.global_inventory_history_in_transit,
+            'total': self.global_inventory_history_total,
+        }
+        for sku, data in self.sku_data.items():
+            series[f'sku_{sku}_on_hand'] = data['inventory_history_on_hand']
+            series[f'sku_{sku}_total'] = data['inventory_history_total']
+        return MultiResolutionSeries(np.arange(len(self.global_inventory_history_on_hand)), series, base_points=base_points)
+
+    def estimate(self, pilot_days=0):
+        """Predicted orders, events, objects, flat log rows and output size of the configured run."""
+        return estimate_run({'start_date': self.start_date, 'days': self.days, 'seed': self.seed,
+                             'warehouse': self.warehouse, 'demand': self.demand}, pilot_days=pilot_days)
+
+    def snapshot(self, path):
+        """Writes the full state of the run to a compressed checkpoint file."""
+        return save_checkpoint(self, path)
+
+    @staticmethod
+    def restore(path, output=None):
+        """Loads a checkpoint written by snapshot(), optionally forking it into a new output directory."""
+        return load_checkpoint(path, output=output)
+
     def evaluate_globally(self,report=False):
         # --- Results ---
         results = {
@@ -141,8 +238,7 @@ class Simulation:
             'orders_placed' : self.warehouse.orders_placed,
             'total_holding_costs' : self.global_total_holding_costs,
             'total_inventory_on_hand' : sum(self.global_inventory_history_on_hand),
-            # 'mean_lead_time' : st.mean(self.warehouse.order_performances),
-            # 'mean_order_size' : st.mean(self.warehouse.order_sizes)
+            **self._lead_time_results('all'),
         }
         if report == True:
             for key, value in results.items():
@@ -150,6 +246,38 @@ class Simulation:
         self.results = results
         return results
     
+    def live_kpis(self):
+        """KPIs of the days simulated so far, cheap enough to be polled while the run is in progress."""
+        return {
+            'day' : self.current_day,
+            'service_level' : self.global_fulfilled_demand / self.total_demand if self.total_demand else 1.0,
+            'total_demand' : self.total_demand,
+            'backorders' : self.global_backorders,
+            'stock_outs' : self.global_out_of_stock,
+            'orders_placed' : self.warehouse.orders_placed,
+            'inventory_on_hand' : self.warehouse.inventory,
+            'inventory_in_transit' : self.warehouse.inventory_in_transit,
+        }
+
+    def evaluate_phases(self, report=False):
+        """Per phase time breakdown of the run, empty unless the simulation was configured with 'profile': True."""
+        phases = self.profiler.report()
+        if report == True:
+            for key, value in phases["phase_times"].items():
+                print(f"{key}: {value:.4f}s ({phases['phase_calls'][key]} calls)")
+        return phases
+
+    def evaluate_lead_times(self, by_sku=True):
+        """Lead time distribution (mean, std, percentiles, max) of the completed order lines, per SKU and globally."""
+        return self.warehouse.shipment_table.summary(by_sku=by_sku)
+
+    def _lead_time_results(self, sku):
+        summary = self.evaluate_lead_times()
+        row = summary[summary['sku'].astype(str) == str(sku)]
+        if row.empty:
+            return {'mean_lead_time': float('nan'), 'mean_order_size': float('nan')}
+        return {'mean_lead_time': row['mean_lead_time'].iloc[0], 'mean_order_size': row['mean_order_size'].iloc[0]}
+
     def evaluate_skus(self, sku, report=False):
         sku_results = {
             'service_level' : self.warehouse.SKUs[sku].fulfilled_demand / self.warehouse.SKUs[sku].total_demand,
@@ -159,8 +287,7 @@ class Simulation:
             'stock_outs' : self.warehouse.SKUs[sku].out_of_stock,
             'total_holding_costs' : self.warehouse.SKUs[sku].total_holding_costs,
             'total_inventory_on_hand' : sum(self.sku_data[sku]['inventory_history_on_hand']),
-            # 'mean_lead_time' : st.mean(self.warehouse.order_performances),
-            # 'mean_order_size' : st.mean(self.warehouse.order_sizes)
+            **self._lead_time_results(sku),
         }
         if report == True:
             for key, value in sku_results.items():
@@ -169,12 +296,14 @@ class Simulation:
         return sku_results
 
 
-    def visualize(self):
+    def visualize(self, max_points=2000):
         # --- Visualization ---
+        # long runs are drawn from max_points LTTB points per line, enough for the figure width
+        days = np.arange(len(self.global_inventory_history_on_hand))
         plt.figure(figsize=(12, 6))
-        plt.plot(self.global_inventory_history_on_hand, label='Inventory On hand')
+        plt.plot(*lttb(days, self.global_inventory_history_on_hand, max_points), label='Inventory On hand')
         #plt.plot(self.global_inventory_history_in_transit, label='Inventory in transit')
-        plt.plot(self.global_inventory_history_total, label='Total Inventory')
+        plt.plot(*lttb(days, self.global_inventory_history_total, max_points), label='Total Inventory')
         # plt.plot(self.past_rops, color='r', linestyle='--', label='Reorder Point')
         # plt.plot(self.past_eoqs, color='y', linestyle='--', label='EOQ')
         # plt.plot(self.past_safety_stock, color='g', linestyle='--', label='safety stock')
@@ -1,14 +1,28 @@
 
 import statistics as st
 import math
-from .curve_fitting import fit_distribution
+import numpy as np
+from .curve_fitting import fit_distribution, DistributionFitter, weighted_delay_moments
 from .order import Order 
+from .shipments import ShipmentTable
 
 
 class Warehouse_SKU:
+    __slots__ = ('id', 'rop', 'eoq', 'z_score', 'order_base_cost', 'holding_cost', 'inventory', 'kpi',
+                 'mean_daily_demand', 'std_daily_demand', 'delivery_split_centre', 'delivery_split_std',
+                 'delivery_split_hist', 'delivery_func', 'verbose', 'inventory_in_transit', 'safety_stock', 'wait_for_order',
+                 'order_performances', 'order_sizes', 'past_demand', 'fulfilled_demand', 'backorders',
+                 'total_demand', 'out_of_stock', 'total_holding_costs', 'fitter', 'kpi_estimator', 'kpi_trim')
+
     def __init__(self, config:dict ):
         
-        keys={'id','rop', 'eoq','z_score', 'order_base_cost', 'holding_cost', 'inventory', 'kpi', 'mean_daily_demand','std_daily_demand', 'delivery_split_centre', 'delivery_split_std','delivery_func', 'verbose' }
+        keys={'id','rop', 'eoq','z_score', 'order_base_cost', 'holding_cost', 'inventory', 'kpi', 'mean_daily_demand','std_daily_demand', 'delivery_split_centre', 'delivery_split_std', 'delivery_split_hist', 'delivery_func', 'verbose' }
+        # estimator for the item_distribution_mean KPI: 'curve_fit' (default), 'moments' or 'trimmed_moments'
+        self.kpi_estimator = config.get('kpi_estimator') or 'curve_fit'
+        self.kpi_trim = config.get('kpi_trim', 0.1)
+        # a share of 0.5 or more cut from each tail leaves no quantity to average
+        if not 0 <= self.kpi_trim < 0.5:
+            raise ValueError(f"kpi_trim of SKU {config.get('id')} must be in [0, 0.5), got {self.kpi_trim}")
         # z-score based on idea that lead times are normal distributed
         for key in keys:
             setattr(self, key, config.get(key))
@@ -24,6 +38,8 @@ class Warehouse_SKU:
         self.total_demand = 0
         self.out_of_stock = 0
         self.total_holding_costs = 0
+        # per SKU fitter so consecutive orders warm-start from this SKU's previous fit
+        self.fitter = DistributionFitter(workers=config.get('fit_workers') or 1, time_budget=config.get('fit_time_budget'))
        
     @property
     def current_holding_cost(self):
@@ -31,12 +47,15 @@ class Warehouse_SKU:
     
     def monitor_inventory(self):
         if self.inventory <= self.rop and self.wait_for_order==False:
-            self.wait_for_order = True
             self.update_eoq()
+            # no demand seen yet (e.g. intermittent demand), an order of 0 units would never complete
+            if self.eoq <= 0:
+                return False
+            self.wait_for_order = True
             self.order_sizes.append(self.eoq)
             
             self.inventory_in_transit = self.eoq
-            return {"quantity":self.eoq, "delivery_func":self.delivery_func, "delivery_split_centre": self.delivery_split_centre, "delivery_split_std": self.delivery_split_std}
+            return {"quantity":self.eoq, "delivery_func":self.delivery_func, "delivery_split_centre": self.delivery_split_centre, "delivery_split_std": self.delivery_split_std, "delivery_split_hist": self.delivery_split_hist}
         else:
             return False
     
@@ -77,16 +96,19 @@ class Warehouse_SKU:
             order_performance  = (order_sku.completed.date() - order_sku.placed.date()).days
         if self.kpi == "item_completion":
             shipment_performances = []
-            for ship in order_sku.shipments:
-                shipment_performances.append((ship.delivery_date.date() - order_sku.placed.date()).days )
+            for delivery_date in order_sku.shipment_dates:
+                shipment_performances.append((delivery_date.date() - order_sku.placed.date()).days )
             order_performance = st.mean(shipment_performances)
         if self.kpi == "item_distribution_mean":
-            shipment_dates = []
-            shipment_quantities = []
-            for ship in order_sku.shipments:
-                shipment_dates.append((ship.delivery_date.date() - order_sku.placed.date()).days )
-                shipment_quantities.append(ship.quantity)
-            order_performance = fit_distribution(shipment_dates,shipment_quantities)
+            shipment_dates = [delivery_date.date() for delivery_date in order_sku.shipment_dates]
+            shipment_quantities = order_sku.shipment_quantities
+            shipment_delays = (np.array(shipment_dates, dtype='datetime64[D]') - np.datetime64(order_sku.placed.date(), 'D')).astype(int)
+            if self.kpi_estimator == "moments":
+                order_performance, _ = weighted_delay_moments(shipment_delays, shipment_quantities)
+            elif self.kpi_estimator == "trimmed_moments":
+                order_performance, _ = weighted_delay_moments(shipment_delays, shipment_quantities, trim=self.kpi_trim)
+            else:
+                order_performance = fit_distribution(shipment_delays.tolist(),shipment_quantities, fitter=self.fitter)
         
         
         self.order_performances.append(order_performance)
@@ -114,6 +136,8 @@ class Warehouse:
     def __init__(self, SKU_configs ):
         self.open_orders=[]
         self.orders_placed = 0 
+        # order lines and delivered shipments of the run, for the lead time analytics
+        self.shipment_table = ShipmentTable()
         self.SKUs = {}
         
         for con in SKU_configs:
@@ -149,6 +173,8 @@ class Warehouse:
                 order_config[sku_id] = order_sku_config
         if len(order_config.values()) > 0:
             order = Order(id=self.orders_placed, order_placed=date,sku_configs=order_config)
+            for sku_id, order_sku_config in order_config.items():
+                self.shipment_table.add_order_line(order.id, sku_id, date, order_sku_config["quantity"])
             self.open_orders.append(order)
             self.orders_placed += 1
             return order
@@ -169,6 +195,8 @@ class Warehouse:
         for order in self.open_orders:
             if order.id == shipment.order_id:
                 order.update(shipment)
+                for sku, quantity in shipment.SKUs.items():
+                    self.shipment_table.add_shipment(order.id, sku, shipment.delivery_date, quantity)
                 for sku in shipment.SKUs.keys():
                     self.SKUs[sku].receive_shipment(shipment, order.SKUs[sku])
             if order.complete:
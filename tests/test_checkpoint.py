@@ -0,0 +1,61 @@
+import glob
+import json
+import os
+from datetime import datetime
+
+from simulation.ocel_stats import load_stats
+from simulation.simulation import Simulation
+from simulation.warehouse import Warehouse
+
+
+def constant_delivery(x):
+    return 1
+
+
+def make_simulation(output, days=120):
+    sku = {
+        "id": 1, "rop": 50, "eoq": 0, "z_score": 1.65, "order_base_cost": 60, "holding_cost": 1, "inventory": 50,
+        "delivery_func": constant_delivery, "kpi": "order_completion", "verbose": False,
+        "mean_daily_demand": 10, "std_daily_demand": 3, "delivery_split_centre": 2, "delivery_split_std": 1,
+    }
+    return Simulation({"warehouse": Warehouse([sku]), "start_date": datetime(2024, 1, 1), "days": days,
+                       "seed": 1, "output": str(output)})
+
+
+def events_in(output):
+    events = 0
+    for path in glob.glob(os.path.join(output, "OrderProcess_*.json")):
+        with open(path) as f:
+            events += len(json.load(f)["events"])
+    return events
+
+
+def test_fork_stats_match_fork_directory(tmp_path):
+    simulation = make_simulation(tmp_path / "original")
+    simulation.run(until=60)
+    checkpoint = simulation.snapshot(str(tmp_path / "day60.ckpt.gz"))
+    pre_fork = set(simulation.ocel_stats.files)
+    assert pre_fork
+
+    fork = Simulation.restore(checkpoint, output=str(tmp_path / "fork"))
+    fork.run()
+
+    stats = load_stats(str(tmp_path / "fork"))
+    assert stats["events"] == events_in(str(tmp_path / "fork"))
+    assert pre_fork <= set(os.listdir(tmp_path / "fork"))
+    assert set(fork.relation_index.files) == set(fork.ocel_stats.files)
+
+
+def test_fork_drops_order_files_missing_from_the_original(tmp_path):
+    simulation = make_simulation(tmp_path / "original")
+    simulation.run(until=60)
+    checkpoint = simulation.snapshot(str(tmp_path / "day60.ckpt.gz"))
+    removed = sorted(simulation.ocel_stats.files)[0]
+    os.remove(tmp_path / "original" / removed)
+
+    fork = Simulation.restore(checkpoint, output=str(tmp_path / "fork"))
+    fork.run()
+
+    assert removed not in fork.ocel_stats.files
+    assert removed not in fork.relation_index.files
+    assert load_stats(str(tmp_path / "fork"))["events"] == events_in(str(tmp_path / "fork"))